@@ -4,6 +4,7 @@ from .endpoints.place import router as place_router
 from .endpoints.authentication import router as auth_router
 from .endpoints.comment import router as comment_router
 from .endpoints.profile import router as profile_router
+from .endpoints.search import router as search_router
 from .endpoints.tag import router as tag_router
 from .endpoints.user import router as user_router
 from .endpoints.post import router as post_router
@@ -16,3 +17,4 @@ router.include_router(comment_router)
 router.include_router(place_router)
 router.include_router(tag_router)
 router.include_router(post_router)
+router.include_router(search_router)
@@ -4,9 +4,9 @@ from starlette.status import HTTP_201_CREATED, HTTP_204_NO_CONTENT
 from ....core.jwt import get_current_user_authorizer
 from ....core.utils import create_aliased_response
 from ....services.comment import create_comment, delete_comment, get_comments
-from ....services.post import get_post_by_slug
-from ....services.shortcuts import get_by_slug_or_404
+from ....services.shortcuts import check_by_slug_for_existence
 from ....db.mongodb import AsyncIOMotorClient, get_database
+from ....db.repositories.post_repository import get_post_row
 from ....models.comment import (
     CommentInCreate,
     CommentInResponse,
@@ -30,7 +30,7 @@ async def create_comment_for_post(
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    await get_by_slug_or_404(db, slug, user.username, fx=get_post_by_slug)
+    await check_by_slug_for_existence(db, slug, fx=get_post_row)
 
     dbcomment = await create_comment(db, slug, comment, user.username)
     return create_aliased_response(CommentInResponse(comment=dbcomment))
@@ -44,7 +44,7 @@ async def get_comment_from_post(
     user: User = Depends(get_current_user_authorizer(required=False)),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    await get_by_slug_or_404(db, slug, user.username if user else None, fx=get_post_by_slug)
+    await check_by_slug_for_existence(db, slug, fx=get_post_row)
 
     dbcomments = await get_comments(db, slug, user.username if user else False)
     return create_aliased_response(ManyCommentsInResponse(comments=dbcomments))
@@ -59,6 +59,6 @@ async def delete_comment_from_post(
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    await get_by_slug_or_404(db, slug, user.username, fx=get_post_by_slug)
+    await check_by_slug_for_existence(db, slug, fx=get_post_row)
 
     await delete_comment(db, id, user.username)
@@ -1,40 +1,56 @@
-from typing import Optional
+from typing import AsyncIterator, List, Optional
 
+from bson import ObjectId
 from fastapi import APIRouter, Body, Depends, Path, Query
-from slugify import slugify
 from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
 from starlette.status import (
     HTTP_201_CREATED,
     HTTP_204_NO_CONTENT,
     HTTP_400_BAD_REQUEST,
     HTTP_404_NOT_FOUND,
+    HTTP_409_CONFLICT,
     HTTP_422_UNPROCESSABLE_ENTITY,
 )
 
+from ....core.http_cache import cache_headers, is_not_modified, not_modified_response
+from ....core.config import MAX_BULK_SIZE, MAX_PAGE_SIZE, place_collection_name
 from ....core.jwt import get_current_user_authorizer
-from ....core.utils import create_aliased_response
+from ....core.utils import (
+    create_aliased_line,
+    create_aliased_response,
+    decode_cursor,
+    encode_cursor,
+)
 from ....services.place import (
     add_place_to_favorites,
     create_place_by_slug,
+    create_places_in_bulk,
     delete_place_by_slug,
+    export_places,
     get_place_by_slug,
     get_places_with_filters,
+    get_place_validators,
     get_user_places,
     remove_place_from_favorites,
     update_place_by_slug,
 )
+from ....services.trending import get_trending_places
 from ....services.shortcuts import (
     check_by_slug_for_existence_and_modifying_permissions,
-    get_by_slug_or_404,
 )
 from ....db.mongodb import AsyncIOMotorClient, get_database
+from ....db.view_buffer import view_buffer
 from ....models.place import (
     PlaceFilterParams,
     PlaceInCreate,
+    PlaceInDB,
     PlaceInResponse,
     PlaceInUpdate,
     ManyPlacesInResponse,
 )
+from ....models.bulk import BulkResultInResponse
 from ....models.user import User
 
 router = APIRouter()
@@ -45,7 +61,7 @@ async def get_places(
     tag: str = "",
     author: str = "",
     favorited: str = "",
-    limit: int = Query(20, gt=0),
+    limit: int = Query(20, gt=0, le=MAX_PAGE_SIZE),
     offset: int = Query(0, ge=0),
     user: User = Depends(get_current_user_authorizer(required=False)),
     db: AsyncIOMotorClient = Depends(get_database),
@@ -63,7 +79,7 @@ async def get_places(
 
 @router.get("/places/feed", response_model=ManyPlacesInResponse, tags=["places"])
 async def places_feed(
-    limit: int = Query(20, gt=0),
+    limit: int = Query(20, gt=0, le=MAX_PAGE_SIZE),
     offset: int = Query(0, ge=0),
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
@@ -74,20 +90,68 @@ async def places_feed(
     )
 
 
+@router.get("/places/trending", response_model=ManyPlacesInResponse, tags=["places"])
+async def trending_places(
+    limit: int = Query(20, gt=0, le=MAX_PAGE_SIZE),
+    user: User = Depends(get_current_user_authorizer(required=False)),
+    db: AsyncIOMotorClient = Depends(get_database),
+):
+    dbplaces = await get_trending_places(db, user.username if user else None, limit)
+    return create_aliased_response(
+        ManyPlacesInResponse(places=dbplaces, places_count=len(dbplaces))
+    )
+
+
+@router.get("/places/export", tags=["places"])
+async def export_all_places(
+    cursor: str = "",
+    user: User = Depends(get_current_user_authorizer(required=False)),
+    db: AsyncIOMotorClient = Depends(get_database),
+):
+    after = decode_cursor(cursor).get("after") if cursor else None
+    if after is not None and not isinstance(after, ObjectId):
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    chunks = export_places(db, after, user.username if user else None)
+    return StreamingResponse(_place_lines(chunks), media_type="application/x-ndjson")
+
+
+async def _place_lines(chunks: AsyncIterator[List[PlaceInDB]]) -> AsyncIterator[bytes]:
+    async for dbplaces in chunks:
+        for dbplace in dbplaces:
+            yield create_aliased_line(
+                PlaceInResponse(place=dbplace),
+                cursor=encode_cursor({"after": dbplace.id}),
+            )
+
+
 @router.get("/places/{slug}", response_model=PlaceInResponse, tags=["places"])
 async def get_place(
+    request: Request,
     slug: str = Path(..., min_length=1),
     user: Optional[User] = Depends(get_current_user_authorizer(required=False)),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    dbplace = await get_place_by_slug(db, slug, user.username if user else None)
+    username = user.username if user else None
+    validators = await get_place_validators(db, slug, username)
+    if validators and is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    # hydrated only now, as the validators describe it
+    dbplace = (
+        await get_place_by_slug(db, slug, username, validators) if validators else None
+    )
     if not dbplace:
         raise HTTPException(
             status_code=HTTP_404_NOT_FOUND,
             detail=f"Place with slug '{slug}' not found",
         )
 
-    return create_aliased_response(PlaceInResponse(place=dbplace))
+    # revalidations answered with 304 above are not counted
+    view_buffer.add(place_collection_name, dbplace.id)
+    return create_aliased_response(
+        PlaceInResponse(place=dbplace), headers=cache_headers(validators)
+    )
 
 
 @router.post(
@@ -101,15 +165,24 @@ async def create_new_place(
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    place_by_slug = await get_place_by_slug(db, slugify(place.title), user.username)
-    if place_by_slug:
+    dbplace = await create_place_by_slug(db, place, user.username)
+    return create_aliased_response(PlaceInResponse(place=dbplace))
+
+
+@router.post("/places/bulk", response_model=BulkResultInResponse, tags=["places"])
+async def import_places(
+    places: List[dict] = Body(..., embed=True),
+    user: User = Depends(get_current_user_authorizer()),
+    db: AsyncIOMotorClient = Depends(get_database),
+):
+    if len(places) > MAX_BULK_SIZE:
         raise HTTPException(
             status_code=HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"文章已存在 slug='{place_by_slug.slug}'",
+            detail=f"At most {MAX_BULK_SIZE} places can be imported at once",
         )
 
-    dbplace = await create_place_by_slug(db, place, user.username)
-    return create_aliased_response(PlaceInResponse(place=dbplace))
+    result = await create_places_in_bulk(db, places, user.username)
+    return create_aliased_response(result)
 
 
 @router.put("/places/{slug}", response_model=PlaceInResponse, tags=["places"])
@@ -119,9 +192,16 @@ async def update_place(
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    await check_by_slug_for_existence_and_modifying_permissions(db, slug, user.username)
-
     dbplace = await update_place_by_slug(db, slug, place, user.username)
+    if not dbplace:
+        # the update filter matched nothing, tell missing and foreign from stale
+        await check_by_slug_for_existence_and_modifying_permissions(
+            db, slug, user.username
+        )
+        raise HTTPException(
+            status_code=HTTP_409_CONFLICT,
+            detail=f"Place with slug '{slug}' was updated meanwhile, reload and retry",
+        )
     return create_aliased_response(PlaceInResponse(place=dbplace))
 
 
@@ -131,9 +211,11 @@ async def delete_place(
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    await check_by_slug_for_existence_and_modifying_permissions(db, slug, user.username)
-
-    await delete_place_by_slug(db, slug, user.username)
+    # the author is part of the delete filter, only a miss needs telling 404 from 403
+    if not await delete_place_by_slug(db, slug, user.username):
+        await check_by_slug_for_existence_and_modifying_permissions(
+            db, slug, user.username
+        )
 
 
 @router.post("/places/{slug}/favorite", response_model=PlaceInResponse, tags=["places"])
@@ -142,17 +224,13 @@ async def favorite_place(
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    dbplace = await get_by_slug_or_404(db, slug, user.username)
-    if dbplace.favorited:
+    # idempotent, adding twice answers with the same state
+    dbplace = await add_place_to_favorites(db, slug, user.username)
+    if not dbplace:
         raise HTTPException(
-            status_code=HTTP_400_BAD_REQUEST,
-            detail="You already added this place to favorites",
+            status_code=HTTP_404_NOT_FOUND,
+            detail=f"Place with slug '{slug}' not found",
         )
-
-    dbplace.favorited = True
-    dbplace.favorites_count += 1
-
-    await add_place_to_favorites(db, slug, user.username)
     return create_aliased_response(PlaceInResponse(place=dbplace))
 
 
@@ -164,16 +242,10 @@ async def delete_place_from_favorites(
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    dbplace = await get_by_slug_or_404(db, slug, user.username)
-
-    if not dbplace.favorited:
+    dbplace = await remove_place_from_favorites(db, slug, user.username)
+    if not dbplace:
         raise HTTPException(
-            status_code=HTTP_400_BAD_REQUEST,
-            detail="You don't have this place in favorites",
+            status_code=HTTP_404_NOT_FOUND,
+            detail=f"Place with slug '{slug}' not found",
         )
-
-    dbplace.favorited = False
-    dbplace.favorites_count -= 1
-
-    await remove_place_from_favorites(db, slug, user.username)
     return create_aliased_response(PlaceInResponse(place=dbplace))
@@ -1,40 +1,56 @@
-from typing import Optional
+from typing import AsyncIterator, List, Optional
 
+from bson import ObjectId
 from fastapi import APIRouter, Body, Depends, Path, Query
-from slugify import slugify
 from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
 from starlette.status import (
     HTTP_201_CREATED,
     HTTP_204_NO_CONTENT,
     HTTP_400_BAD_REQUEST,
     HTTP_404_NOT_FOUND,
+    HTTP_409_CONFLICT,
     HTTP_422_UNPROCESSABLE_ENTITY,
 )
 
+from ....core.http_cache import cache_headers, is_not_modified, not_modified_response
+from ....core.config import MAX_BULK_SIZE, MAX_PAGE_SIZE, post_collection_name
 from ....core.jwt import get_current_user_authorizer
-from ....core.utils import create_aliased_response
+from ....core.utils import (
+    create_aliased_line,
+    create_aliased_response,
+    decode_cursor,
+    encode_cursor,
+)
 from ....services.post import (
     add_post_to_likes,
     create_post_by_slug,
+    create_posts_in_bulk,
     delete_post_by_slug,
+    export_posts,
     get_post_by_slug,
     get_posts_with_filters,
+    get_post_validators,
     get_user_posts,
     remove_post_from_likes,
     update_post_by_slug,
 )
 from ....services.shortcuts import (
     check_by_slug_for_existence_and_modifying_permissions,
-    get_by_slug_or_404,
 )
 from ....db.mongodb import AsyncIOMotorClient, get_database
+from ....db.repositories.post_repository import get_post_row
+from ....db.view_buffer import view_buffer
 from ....models.post import (
     PostFilterParams,
     PostInCreate,
+    PostInDB,
     PostInResponse,
     PostInUpdate,
     ManyPostsInResponse,
 )
+from ....models.bulk import BulkResultInResponse
 from ....models.user import User
 
 router = APIRouter()
@@ -45,7 +61,7 @@ async def get_posts(
     tag: str = "",
     author: str = "",
     liked: str = "",
-    limit: int = Query(20, gt=0),
+    limit: int = Query(20, gt=0, le=MAX_PAGE_SIZE),
     offset: int = Query(0, ge=0),
     user: User = Depends(get_current_user_authorizer(required=False)),
     db: AsyncIOMotorClient = Depends(get_database),
@@ -63,7 +79,7 @@ async def get_posts(
 
 @router.get("/posts/feed", response_model=ManyPostsInResponse, tags=["posts"])
 async def posts_feed(
-    limit: int = Query(20, gt=0),
+    limit: int = Query(20, gt=0, le=MAX_PAGE_SIZE),
     offset: int = Query(0, ge=0),
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
@@ -74,20 +90,56 @@ async def posts_feed(
     )
 
 
+@router.get("/posts/export", tags=["posts"])
+async def export_all_posts(
+    cursor: str = "",
+    user: User = Depends(get_current_user_authorizer(required=False)),
+    db: AsyncIOMotorClient = Depends(get_database),
+):
+    after = decode_cursor(cursor).get("after") if cursor else None
+    if after is not None and not isinstance(after, ObjectId):
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    chunks = export_posts(db, after, user.username if user else None)
+    return StreamingResponse(_post_lines(chunks), media_type="application/x-ndjson")
+
+
+async def _post_lines(chunks: AsyncIterator[List[PostInDB]]) -> AsyncIterator[bytes]:
+    async for dbposts in chunks:
+        for dbpost in dbposts:
+            yield create_aliased_line(
+                PostInResponse(post=dbpost),
+                cursor=encode_cursor({"after": dbpost.id}),
+            )
+
+
 @router.get("/posts/{slug}", response_model=PostInResponse, tags=["posts"])
 async def get_post(
+    request: Request,
     slug: str = Path(..., min_length=1),
     user: Optional[User] = Depends(get_current_user_authorizer(required=False)),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    dbpost = await get_post_by_slug(db, slug, user.username if user else None)
+    username = user.username if user else None
+    validators = await get_post_validators(db, slug, username)
+    if validators and is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    # hydrated only now, as the validators describe it
+    dbpost = (
+        await get_post_by_slug(db, slug, username, validators) if validators else None
+    )
     if not dbpost:
         raise HTTPException(
             status_code=HTTP_404_NOT_FOUND,
             detail=f"Post with slug '{slug}' not found",
         )
 
-    return create_aliased_response(PostInResponse(post=dbpost))
+    # revalidations answered with 304 above are not counted
+    view_buffer.add(post_collection_name, dbpost.id)
+    return create_aliased_response(
+        PostInResponse(post=dbpost), headers=cache_headers(validators)
+    )
 
 
 @router.post(
@@ -101,15 +153,24 @@ async def create_new_post(
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    post_by_slug = await get_post_by_slug(db, slugify(post.title), user.username)
-    if post_by_slug:
+    dbpost = await create_post_by_slug(db, post, user.username)
+    return create_aliased_response(PostInResponse(post=dbpost))
+
+
+@router.post("/posts/bulk", response_model=BulkResultInResponse, tags=["posts"])
+async def import_posts(
+    posts: List[dict] = Body(..., embed=True),
+    user: User = Depends(get_current_user_authorizer()),
+    db: AsyncIOMotorClient = Depends(get_database),
+):
+    if len(posts) > MAX_BULK_SIZE:
         raise HTTPException(
             status_code=HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"文章已存在 slug='{post_by_slug.slug}'",
+            detail=f"At most {MAX_BULK_SIZE} posts can be imported at once",
         )
 
-    dbpost = await create_post_by_slug(db, post, user.username)
-    return create_aliased_response(PostInResponse(post=dbpost))
+    result = await create_posts_in_bulk(db, posts, user.username)
+    return create_aliased_response(result)
 
 
 @router.put("/posts/{slug}", response_model=PostInResponse, tags=["posts"])
@@ -119,9 +180,16 @@ async def update_post(
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    await check_by_slug_for_existence_and_modifying_permissions(db, slug, user.username, fx=get_post_by_slug)
-
     dbpost = await update_post_by_slug(db, slug, post, user.username)
+    if not dbpost:
+        # the update filter matched nothing, tell missing and foreign from stale
+        await check_by_slug_for_existence_and_modifying_permissions(
+            db, slug, user.username, fx=get_post_row
+        )
+        raise HTTPException(
+            status_code=HTTP_409_CONFLICT,
+            detail=f"Post with slug '{slug}' was updated meanwhile, reload and retry",
+        )
     return create_aliased_response(PostInResponse(post=dbpost))
 
 
@@ -131,9 +199,11 @@ async def delete_post(
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    await check_by_slug_for_existence_and_modifying_permissions(db, slug, user.username, fx=get_post_by_slug)
-
-    await delete_post_by_slug(db, slug, user.username)
+    # the author is part of the delete filter, only a miss needs telling 404 from 403
+    if not await delete_post_by_slug(db, slug, user.username):
+        await check_by_slug_for_existence_and_modifying_permissions(
+            db, slug, user.username, fx=get_post_row
+        )
 
 
 @router.post("/posts/{slug}/like", response_model=PostInResponse, tags=["posts"])
@@ -142,17 +212,13 @@ async def like_post(
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    dbpost = await get_by_slug_or_404(db, slug, user.username, fx=get_post_by_slug)
-    if dbpost.liked:
+    # idempotent, adding twice answers with the same state
+    dbpost = await add_post_to_likes(db, slug, user.username)
+    if not dbpost:
         raise HTTPException(
-            status_code=HTTP_400_BAD_REQUEST,
-            detail="You already added this post to likes",
+            status_code=HTTP_404_NOT_FOUND,
+            detail=f"Post with slug '{slug}' not found",
         )
-
-    dbpost.liked = True
-    dbpost.likes_count += 1
-
-    await add_post_to_likes(db, slug, user.username)
     return create_aliased_response(PostInResponse(post=dbpost))
 
 
@@ -164,16 +230,10 @@ async def delete_post_from_likes(
     user: User = Depends(get_current_user_authorizer()),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    dbpost = await get_by_slug_or_404(db, slug, user.username, fx=get_post_by_slug)
-
-    if not dbpost.liked:
+    dbpost = await remove_post_from_likes(db, slug, user.username)
+    if not dbpost:
         raise HTTPException(
-            status_code=HTTP_400_BAD_REQUEST,
-            detail="You don't have this post in likes",
+            status_code=HTTP_404_NOT_FOUND,
+            detail=f"Post with slug '{slug}' not found",
         )
-
-    dbpost.liked = False
-    dbpost.likes_count -= 1
-
-    await remove_post_from_likes(db, slug, user.username)
     return create_aliased_response(PostInResponse(post=dbpost))
@@ -1,9 +1,13 @@
 from typing import Optional
 
 from fastapi import APIRouter, Depends, Path
+from starlette.requests import Request
 
+from ....core.http_cache import cache_headers, is_not_modified, not_modified_response
 from ....core.jwt import get_current_user_authorizer
+from ....core.utils import create_aliased_response
 from ....db.mongodb import AsyncIOMotorClient, get_database
+from ....db.repositories.profile_repository import get_profile_validators
 from ....models.profile import ProfileInResponse, ProfilesInResponse
 from ....models.user import User
 from ....services.profile import (
@@ -18,11 +22,18 @@ router = APIRouter()
 
 @router.get("/profiles/{username}", response_model=ProfileInResponse, tags=["profiles"])
 async def retrieve_profile(
+    request: Request,
     username: str = Path(..., min_length=1),
     user: Optional[User] = Depends(get_current_user_authorizer(required=False)),
     db: AsyncIOMotorClient = Depends(get_database),
 ):
-    return await get_profile_service(current_user=user, username=username, conn=db)
+    # answers 404 for an unknown user; body and ETag come from this one read
+    profile = await get_profile_service(current_user=user, username=username, conn=db)
+    validators = get_profile_validators(profile.profile)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    return create_aliased_response(profile, headers=cache_headers(validators))
 
 
 @router.get("/profiles/{username}/followings", response_model=ProfilesInResponse, tags=["profiles"])
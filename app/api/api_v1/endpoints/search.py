@@ -0,0 +1,85 @@
+from typing import Optional, Union
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, Query
+from starlette.exceptions import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+from ....core.config import MAX_PAGE_SIZE
+from ....core.jwt import get_current_user_authorizer
+from ....core.utils import create_aliased_response, decode_cursor, encode_cursor
+from ....db.mongodb import AsyncIOMotorClient, get_database
+from ....models.search import PlaceSearchInResponse, PostSearchInResponse, SearchType
+from ....models.user import User
+from ....services.search import SearchPosition, search_places, search_posts
+
+router = APIRouter()
+
+
+def _decode_position(cursor: str) -> Optional[SearchPosition]:
+    if not cursor:
+        return None
+    position = decode_cursor(cursor)
+    score, after = position.get("score"), position.get("after")
+    if not isinstance(score, (int, float)) or not isinstance(after, ObjectId):
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return score, after
+
+
+def _encode_position(position: Optional[SearchPosition]) -> Optional[str]:
+    if position is None:
+        return None
+    score, after = position
+    return encode_cursor({"score": score, "after": after})
+
+
+@router.get(
+    "/search",
+    response_model=Union[PlaceSearchInResponse, PostSearchInResponse],
+    tags=["search"],
+)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: SearchType = SearchType.PLACES,
+    tag: str = "",
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    radius: float = Query(10, gt=0, le=1000, description="Kilometers around lng/lat"),
+    limit: int = Query(20, gt=0, le=MAX_PAGE_SIZE),
+    cursor: str = "",
+    user: User = Depends(get_current_user_authorizer(required=False)),
+    db: AsyncIOMotorClient = Depends(get_database),
+):
+    if (lng is None) != (lat is None):
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST, detail="lng and lat go together"
+        )
+    near = (lng, lat) if lng is not None else None
+    if near and type != SearchType.PLACES:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="Only places can be searched by location",
+        )
+
+    after = _decode_position(cursor)
+    username = user.username if user else None
+    if type == SearchType.PLACES:
+        dbplaces, next_position = await search_places(
+            db, q, tag, near, radius, after, limit, username
+        )
+        return create_aliased_response(
+            PlaceSearchInResponse(
+                places=dbplaces,
+                places_count=len(dbplaces),
+                next_cursor=_encode_position(next_position),
+            )
+        )
+
+    dbposts, next_position = await search_posts(db, q, tag, after, limit, username)
+    return create_aliased_response(
+        PostSearchInResponse(
+            posts=dbposts,
+            posts_count=len(dbposts),
+            next_cursor=_encode_position(next_position),
+        )
+    )
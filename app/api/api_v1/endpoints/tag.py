@@ -1,6 +1,15 @@
 from fastapi import APIRouter, Depends
+from starlette.requests import Request
 
-from ....services.tag import fetch_all_tags
+from ....core.http_cache import (
+    CacheValidators,
+    cache_headers,
+    is_not_modified,
+    make_etag,
+    not_modified_response,
+)
+from ....core.utils import create_aliased_response
+from ....services.tag import fetch_all_tag_names
 from ....db.mongodb import AsyncIOMotorClient, get_database
 from ....models.tag import TagsList
 
@@ -8,6 +17,14 @@ router = APIRouter()
 
 
 @router.get("/tags", response_model=TagsList, tags=["tags"])
-async def get_all_tags(db: AsyncIOMotorClient = Depends(get_database)):
-    tags = await fetch_all_tags(db)
-    return TagsList(tags=[tag.tag for tag in tags])
+async def get_all_tags(
+    request: Request, db: AsyncIOMotorClient = Depends(get_database)
+):
+    tags = await fetch_all_tag_names(db)
+    validators = CacheValidators(etag=make_etag(*tags))
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    return create_aliased_response(
+        TagsList(tags=tags), headers=cache_headers(validators)
+    )
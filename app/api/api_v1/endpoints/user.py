@@ -1,7 +1,14 @@
 from fastapi import APIRouter, Body, Depends
+from starlette.exceptions import HTTPException
+from starlette.status import (
+    HTTP_204_NO_CONTENT,
+    HTTP_409_CONFLICT,
+    HTTP_422_UNPROCESSABLE_ENTITY,
+)
 
 from ....core.jwt import get_current_user_authorizer
 from ....services.shortcuts import check_free_username_and_email
+from ....services.user import delete_user_service
 from ....db.repositories.user_repository import update_user
 from ....db.mongodb import AsyncIOMotorClient, get_database
 from ....models.user import User, UserInResponse, UserInUpdate
@@ -22,10 +29,29 @@ async def update_current_user(
 ):
     if user.username == current_user.username:
         user.username = None
+    if user.username:
+        # places, posts, follows, comments and the token all refer to it
+        raise HTTPException(
+            status_code=HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Username cannot be changed",
+        )
     if user.email == current_user.email:
         user.email = None
 
-    await check_free_username_and_email(db, user.username, user.email)
+    await check_free_username_and_email(db, None, user.email)
 
     dbuser = await update_user(db, current_user.username, user)
-    return UserInResponse(user=User(**dbuser.dict(), token=current_user.token))
+    if not dbuser:
+        raise HTTPException(
+            status_code=HTTP_409_CONFLICT,
+            detail="User was updated meanwhile, reload and retry",
+        )
+    return UserInResponse(user=User.from_db(dbuser.dict(), token=current_user.token))
+
+
+@router.delete("/user", tags=["users"], status_code=HTTP_204_NO_CONTENT)
+async def delete_current_user(
+    current_user: User = Depends(get_current_user_authorizer()),
+    db: AsyncIOMotorClient = Depends(get_database),
+):
+    await delete_user_service(db, current_user.username)
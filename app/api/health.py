@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from fastapi import APIRouter, Depends
+from pymongo.errors import ConnectionFailure, PyMongoError
+from starlette.responses import JSONResponse
+from starlette.status import HTTP_200_OK, HTTP_503_SERVICE_UNAVAILABLE
+
+from ..core.config import MAX_CONNECTIONS_COUNT, MIN_CONNECTIONS_COUNT
+from ..core.warmup import readiness
+from ..db.cache import caches
+from ..db.change_stream import invalidation_bus
+from ..db.indexes import blocked_indexes
+from ..db.mongodb import AsyncIOMotorClient, get_database
+from ..db.mongodb_utils import pool_metrics
+
+PING_TIMEOUT = 2.0
+
+router = APIRouter()
+
+
+@router.get("/health/live", tags=["health"])
+async def live():
+    return {"status": "alive"}
+
+
+@router.get("/health/ready", tags=["health"])
+async def ready(db: AsyncIOMotorClient = Depends(get_database)):
+    mongo = {"reachable": False}
+    started = time.perf_counter()
+    try:
+        if db is None:
+            raise ConnectionFailure("not connected")
+        await asyncio.wait_for(db.admin.command("ping"), PING_TIMEOUT)
+        mongo = {
+            "reachable": True,
+            "pingMs": round((time.perf_counter() - started) * 1000, 2),
+        }
+    except (PyMongoError, asyncio.TimeoutError) as exc:
+        mongo["error"] = str(exc) or type(exc).__name__
+
+    if not readiness.warm:
+        status = "warming"
+    elif not mongo["reachable"]:
+        status = "unavailable"
+    elif blocked_indexes:
+        # slugs, favorites, likes or follows would not be unique
+        status = "indexes missing"
+    else:
+        status = "ready"
+
+    return JSONResponse(
+        {
+            "status": status,
+            "warmUpMs": readiness.warm_up_ms,
+            "mongo": mongo,
+            "pool": {
+                "minSize": MIN_CONNECTIONS_COUNT,
+                "maxSize": MAX_CONNECTIONS_COUNT,
+                "servers": pool_metrics.stats(),
+            },
+            "changeStream": {"running": invalidation_bus.running},
+            "blockedIndexes": blocked_indexes,
+            "caches": {cache.name: cache.stats() for cache in caches},
+        },
+        status_code=HTTP_200_OK if status == "ready" else HTTP_503_SERVICE_UNAVAILABLE,
+    )
@@ -0,0 +1,40 @@
+"""
+Repair the counters of every user and the favorite and like counts of places and posts.
+
+    python -m app.commands.reconcile_counters
+
+The services keep the counters up to date with $inc next to each write, so they
+only drift when one of the two writes failed. This recounts everything from the
+collections and overwrites the counters that differ. Run it once after upgrading:
+places and posts written before favorites_count and likes_count were stored have
+neither.
+"""
+import argparse
+import asyncio
+import json
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from ..core.config import EXPORT_BATCH_SIZE, MONGODB_URL
+from ..services.counters import reconcile_counters
+
+
+async def reconcile(args: argparse.Namespace) -> int:
+    conn = AsyncIOMotorClient(str(MONGODB_URL))
+    try:
+        return await reconcile_counters(conn, args.batch_size)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    repaired = asyncio.run(reconcile(args))
+    print(json.dumps({"repaired": repaired}))
+
+
+if __name__ == "__main__":
+    main()
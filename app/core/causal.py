@@ -0,0 +1,84 @@
+import hashlib
+import hmac
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import AsyncIterator, Optional
+
+from bson import json_util
+from starlette.requests import Request
+from starlette.responses import Response
+
+from ..db.causal import CausalState, CausalToken, causal_state
+from ..db.singleflight import shared_loads
+from .config import CAUSAL_TOKEN_COOKIE, CAUSAL_TOKEN_HEADER, SECRET_KEY
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def _sign(payload: bytes) -> str:
+    digest = hmac.new(str(SECRET_KEY).encode(), payload, hashlib.sha256).digest()
+    return urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def encode_causal_token(token: CausalToken) -> str:
+    raw = json_util.dumps(
+        {"operationTime": token.operation_time, "clusterTime": token.cluster_time}
+    ).encode()
+    payload = urlsafe_b64encode(raw).rstrip(b"=")
+    return f"{payload.decode()}.{_sign(payload)}"
+
+
+def decode_causal_token(value: str) -> Optional[CausalToken]:
+    """
+    A missing, stale or tampered token only costs read-your-own-writes,
+    so it is dropped instead of failing the request.
+    """
+    payload, _, signature = value.partition(".")
+    if not hmac.compare_digest(_sign(payload.encode()), signature):
+        return None
+    try:
+        data = json_util.loads(urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return CausalToken(data["operationTime"], data["clusterTime"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def read_causal_token(request: Request) -> Optional[CausalToken]:
+    value = request.headers.get(CAUSAL_TOKEN_HEADER) or request.cookies.get(
+        CAUSAL_TOKEN_COOKIE
+    )
+    return decode_causal_token(value) if value else None
+
+
+async def causal_consistency_middleware(request: Request, call_next) -> Response:
+    state = CausalState(read_causal_token(request))
+    causal_state.set(state)
+
+    try:
+        response = await call_next(request)
+    except BaseException:
+        state.end_sessions()
+        raise
+    token = state.latest_token()
+    # a streamed body, like the exports, keeps reading after call_next returned
+    response.body_iterator = _ending_sessions(response.body_iterator, state)
+
+    if token and request.method not in SAFE_METHODS:
+        value = encode_causal_token(token)
+        response.headers[CAUSAL_TOKEN_HEADER] = value
+        response.set_cookie(CAUSAL_TOKEN_COOKIE, value, httponly=True)
+    return response
+
+
+async def _ending_sessions(
+    body: AsyncIterator[bytes], state: CausalState
+) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        state.end_sessions()
+
+
+async def shared_loads_middleware(request: Request, call_next) -> Response:
+    shared_loads.set(request.method in SAFE_METHODS)
+    return await call_next(request)
@@ -1,4 +1,5 @@
 import os
+import socket
 
 from dotenv import load_dotenv
 from starlette.datastructures import CommaSeparatedStrings, Secret
@@ -11,20 +12,87 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # one week
 
 load_dotenv(".env")
 
+DEBUG = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+TESTING = os.getenv("TESTING", "false").lower() in ("1", "true", "yes")
+
 MAX_CONNECTIONS_COUNT = int(os.getenv("MAX_CONNECTIONS_COUNT", 10))
 MIN_CONNECTIONS_COUNT = int(os.getenv("MIN_CONNECTIONS_COUNT", 10))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 100))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))
+MAX_BULK_SIZE = int(os.getenv("MAX_BULK_SIZE", 1000))
+
+LISTING_READ_PREFERENCE = os.getenv("LISTING_READ_PREFERENCE", "secondaryPreferred")
+QUERY_MAX_TIME_MS = int(os.getenv("QUERY_MAX_TIME_MS", 5000))
+# send GET reads to secondaries, read-your-own-writes through a causal token
+CAUSAL_READS = os.getenv("CAUSAL_READS", "false").lower() in ("1", "true", "yes")
+CAUSAL_TOKEN_HEADER = "X-Causal-Token"
+CAUSAL_TOKEN_COOKIE = "causal_token"
+# commands one request may issue, and how often the same query shape may repeat
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", 25))
+QUERY_REPEAT_LIMIT = int(os.getenv("QUERY_REPEAT_LIMIT", 5))
+QUERY_BUDGET_FAIL = TESTING
+# share of requests traced into a Server-Timing header, and where spans are exported
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0 if DEBUG else 0.01))
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "")  # "stdout" or "file"
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "traces.jsonl")
+# set when running several workers, each one writes its metrics into this directory
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+# in-process caches, only used while the change stream keeps them coherent
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", 300))
+LOCAL_CACHE_SIZE = int(os.getenv("LOCAL_CACHE_SIZE", 10000))
+# workers sharing a name resume the change stream from the same saved token
+CHANGE_STREAM_NAME = os.getenv("CHANGE_STREAM_NAME", socket.gethostname())
+# startup waits this long for the change stream, then preloads the caches
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", 10))
+WARMUP_PLACES = int(os.getenv("WARMUP_PLACES", 50))
+# per client budgets of the expensive routes, "memory" keeps them per worker and
+# "mongo" shares them between workers
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false" if TESTING else "true")
+RATE_LIMIT_ENABLED = RATE_LIMIT_ENABLED.lower() in ("1", "true", "yes")
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+# detail views are counted per worker and written every VIEW_FLUSH_INTERVAL seconds
+VIEW_FLUSH_INTERVAL = float(os.getenv("VIEW_FLUSH_INTERVAL", 5))
+VIEW_RETENTION_DAYS = int(os.getenv("VIEW_RETENTION_DAYS", 30))
+# trending places: views and favorites of the last TRENDING_WINDOW_DAYS, each one
+# worth half as much every TRENDING_HALF_LIFE_HOURS; one worker ranks them every
+# TRENDING_INTERVAL seconds, every worker reloads the ranking every
+# TRENDING_REFRESH_INTERVAL seconds
+TRENDING_INTERVAL = float(os.getenv("TRENDING_INTERVAL", 300))
+TRENDING_REFRESH_INTERVAL = float(os.getenv("TRENDING_REFRESH_INTERVAL", 60))
+TRENDING_WINDOW_DAYS = int(os.getenv("TRENDING_WINDOW_DAYS", 7))
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", 24))
+TRENDING_FAVORITE_WEIGHT = float(os.getenv("TRENDING_FAVORITE_WEIGHT", 5))
+TRENDING_SIZE = int(os.getenv("TRENDING_SIZE", 50))
+# deleted places, posts and users are only marked; every DELETION_INTERVAL seconds
+# a worker leases one for DELETION_LEASE seconds and removes what depends on it,
+# DELETION_BATCH_SIZE documents at a time with DELETION_BATCH_PAUSE seconds between
+DELETION_INTERVAL = float(os.getenv("DELETION_INTERVAL", 10))
+DELETION_LEASE = float(os.getenv("DELETION_LEASE", 600))
+DELETION_BATCH_SIZE = int(os.getenv("DELETION_BATCH_SIZE", 500))
+DELETION_BATCH_PAUSE = float(os.getenv("DELETION_BATCH_PAUSE", 0.05))
+# side effects run by JOB_WORKERS workers per process off the request path, a job is
+# leased for JOB_LEASE seconds and tried JOB_MAX_ATTEMPTS times, the n-th retry waits
+# JOB_RETRY_BACKOFF * 2**n seconds, at most JOB_RETRY_BACKOFF_MAX
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))
+JOB_LEASE = float(os.getenv("JOB_LEASE", 60))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", 5))
+JOB_RETRY_BACKOFF_MAX = float(os.getenv("JOB_RETRY_BACKOFF_MAX", 600))
+JOB_METRICS_INTERVAL = float(os.getenv("JOB_METRICS_INTERVAL", 15))
+JOB_STOP_TIMEOUT = float(os.getenv("JOB_STOP_TIMEOUT", 10))
 SECRET_KEY = Secret(os.getenv("SECRET_KEY", "secret key for project"))
 
 PROJECT_NAME = os.getenv("PROJECT_NAME", "FastAPI example application")
 ALLOWED_HOSTS = CommaSeparatedStrings(os.getenv("ALLOWED_HOSTS", ""))
 
+MONGO_DB = os.getenv("MONGO_DB", "hashtrip")
 MONGODB_URL = os.getenv("MONGODB_URL", "")  # deploying without docker-compose
 if not MONGODB_URL:
     MONGO_HOST = os.getenv("MONGO_HOST", "localhost")
     MONGO_PORT = int(os.getenv("MONGO_PORT", 27017))
     MONGO_USER = os.getenv("MONGO_USER", "admin")
     MONGO_PASS = os.getenv("MONGO_PASSWORD", "")
-    MONGO_DB = os.getenv("MONGO_DB", "hashtrip")
 
     MONGODB_URL = DatabaseURL(
         f"mongodb://{MONGO_USER}:{MONGO_PASS}@{MONGO_HOST}:{MONGO_PORT}/{MONGO_DB}"
@@ -41,3 +109,8 @@ tags_collection_name = "tags"
 users_collection_name = "users"
 comments_collection_name = "commentaries"
 followers_collection_name = "followers"
+change_stream_tokens_collection_name = "change_stream_tokens"
+rate_limits_collection_name = "rate_limits"
+views_collection_name = "views"
+trending_collection_name = "trending"
+jobs_collection_name = "jobs"
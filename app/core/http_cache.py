@@ -0,0 +1,72 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import NamedTuple, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.status import HTTP_304_NOT_MODIFIED
+
+
+class CacheValidators(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime] = None
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("\x1f".join(map(str, parts)).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def _as_utc(dt: datetime) -> datetime:
+    # naive datetimes coming from mongo are UTC
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def latest(*dates: Optional[datetime]) -> Optional[datetime]:
+    dates = [_as_utc(dt) for dt in dates if dt]
+    return max(dates) if dates else None
+
+
+def cache_headers(validators: CacheValidators) -> dict:
+    # the ETag covers the viewer's favorited and following flags, shared caches
+    # must not hand one user's response to another
+    headers = {
+        "ETag": validators.etag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization",
+    }
+    if validators.last_modified:
+        headers["Last-Modified"] = format_datetime(
+            _as_utc(validators.last_modified), usegmt=True
+        )
+    return headers
+
+
+def is_not_modified(request: Request, validators: CacheValidators) -> bool:
+    """
+    Evaluate If-None-Match / If-Modified-Since (RFC 7232, section 6).
+    If-Modified-Since is only considered when no If-None-Match was sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etags = {etag.strip() for etag in if_none_match.split(",")}
+        return bool(etags & {"*", validators.etag, "W/" + validators.etag})
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.last_modified:
+        try:
+            since = _as_utc(parsedate_to_datetime(if_modified_since))
+        except (TypeError, ValueError):
+            return False
+        return _as_utc(validators.last_modified).replace(microsecond=0) <= since
+
+    return False
+
+
+def not_modified_response(validators: CacheValidators) -> Response:
+    return Response(
+        status_code=HTTP_304_NOT_MODIFIED, headers=cache_headers(validators)
+    )
@@ -15,6 +15,7 @@ from ..models.token import TokenPayload
 from ..models.user import User
 
 from .config import JWT_TOKEN_PREFIX, SECRET_KEY
+from .tracing import traced
 
 ALGORITHM = "HS256"
 access_token_jwt_subject = "access"
@@ -39,6 +40,7 @@ class RWAPIKeyHeader(APIKeyHeader):
             return None
 
 
+@traced
 def _get_authorization_token(authorization: str = Depends(RWAPIKeyHeader())):
     token_prefix, token = authorization.split(" ")
     if token_prefix != JWT_TOKEN_PREFIX:
@@ -49,6 +51,7 @@ def _get_authorization_token(authorization: str = Depends(RWAPIKeyHeader())):
     return token
 
 
+@traced
 async def _get_current_user(
     db: AsyncIOMotorClient = Depends(get_database),
     token: str = Depends(_get_authorization_token),
@@ -65,16 +68,18 @@ async def _get_current_user(
     if not dbuser:
         raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="User not found")
 
-    user = User(**dbuser.dict(), token=token)
+    user = User.from_db(dbuser.dict(), token=token)
     return user
 
 
+@traced
 def _get_authorization_token_optional(authorization: str = Depends(RWAPIKeyHeader())):
     if authorization:
         return _get_authorization_token(authorization)
     return ""
 
 
+@traced
 async def _get_current_user_optional(
     db: AsyncIOMotorClient = Depends(get_database),
     token: str = Depends(_get_authorization_token_optional),
@@ -0,0 +1,133 @@
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+
+from .config import PROMETHEUS_MULTIPROC_DIR
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUESTS = Counter(
+    "http_requests_total", "Requests served.", ["method", "route", "status"]
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being served.",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response headers were ready.",
+    ["method", "route"],
+)
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "mongo_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the pool.",
+    ["address"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+POOL_CHECKOUT_FAILURES = Counter(
+    "mongo_pool_checkout_failures_total",
+    "Connection checkouts that failed.",
+    ["address", "reason"],
+)
+POOL_CONNECTIONS = Gauge(
+    "mongo_pool_connections",
+    "Open connections in the pool.",
+    ["address"],
+    multiprocess_mode="livesum",
+)
+POOL_CHECKED_OUT = Gauge(
+    "mongo_pool_checked_out_connections",
+    "Connections currently checked out of the pool.",
+    ["address"],
+    multiprocess_mode="livesum",
+)
+
+PURGED_DOCUMENTS = Counter(
+    "deletion_purged_documents_total",
+    "Documents removed after the place, post or user they depended on was deleted.",
+    ["collection"],
+)
+
+JOBS_PENDING = Gauge(
+    "jobs_pending",
+    "Jobs queued or running, by job name.",
+    ["name"],
+    multiprocess_mode="max",
+)
+JOB_WAIT = Histogram(
+    "job_wait_seconds",
+    "Time from when a job was due until a worker picked it up.",
+    ["name"],
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Time a job ran, failed runs included.", ["name"]
+)
+JOB_RUNS = Counter("job_runs_total", "Job runs by how they ended.", ["name", "outcome"])
+
+
+def route_template(request: Request) -> str:
+    """
+    Path of the route serving the request, `/api/places/{slug}` rather than
+    the raw path, so label values stay bounded.
+    """
+    # every middleware asks, they all see the same scope
+    template = request.scope.get("route_template")
+    if template is None:
+        template = request.scope["route_template"] = _match_route(request)
+    return template
+
+
+def _match_route(request: Request) -> str:
+    partial = None
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+async def metrics_middleware(request: Request, call_next) -> Response:
+    method = request.method
+    route = route_template(request)
+    in_progress = REQUESTS_IN_PROGRESS.labels(method, route)
+    in_progress.inc()
+    status_code = 500
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - start)
+        REQUESTS.labels(method, route, str(status_code)).inc()
+        in_progress.dec()
+
+
+def _registry() -> CollectorRegistry:
+    # every gunicorn worker writes its own files, collect them all on scrape
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=PROMETHEUS_MULTIPROC_DIR)
+    return registry
+
+
+async def metrics(request: Request) -> Response:
+    return Response(generate_latest(_registry()), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,40 @@
+import logging
+from typing import List
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from ..db.monitoring import QueryLog, query_log
+from .config import DEBUG, QUERY_BUDGET, QUERY_BUDGET_FAIL, QUERY_REPEAT_LIMIT
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def check_query_log(log: QueryLog) -> List[str]:
+    problems = []
+    if log.count > QUERY_BUDGET:
+        problems.append(f"{log.count} queries, budget is {QUERY_BUDGET}")
+    for shape, count in log.repeated_shapes(QUERY_REPEAT_LIMIT):
+        problems.append(f"`{shape}` ran {count} times")
+    return problems
+
+
+async def query_budget_middleware(request: Request, call_next) -> Response:
+    log = QueryLog()
+    query_log.set(log)
+
+    response = await call_next(request)
+
+    problems = check_query_log(log)
+    if problems:
+        message = f"{request.method} {request.url.path}: {'; '.join(problems)}"
+        if QUERY_BUDGET_FAIL:
+            raise QueryBudgetExceeded(message)
+        logging.warning(message)
+
+    if DEBUG:
+        response.headers["X-Query-Count"] = str(log.count)
+        response.headers["X-Query-Time"] = f"{log.duration_ms:.1f}"
+    return response
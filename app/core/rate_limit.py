@@ -0,0 +1,180 @@
+import asyncio
+import math
+import time
+from datetime import datetime
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import jwt
+from jwt import PyJWTError
+from pymongo.errors import PyMongoError
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.status import HTTP_429_TOO_MANY_REQUESTS
+
+from ..db.mongodb import db
+from ..db.repositories import rate_limit_repository
+from .config import API_V1_STR, JWT_TOKEN_PREFIX, RATE_LIMIT_STORE, SECRET_KEY
+from .jwt import ALGORITHM
+from .metrics import route_template
+
+DEFAULT_PAGE_SIZE = 20
+PRUNE_INTERVAL = 60.0
+
+
+def _page_cost(request: Request) -> int:
+    # a page of 100 costs as much as five default ones
+    try:
+        limit = int(request.query_params.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return 1
+    return max(1, math.ceil(limit / DEFAULT_PAGE_SIZE))
+
+
+class Budget(NamedTuple):
+    limit: int
+    period: float
+    cost: Optional[Callable[[Request], int]] = None
+
+
+_LOGIN = Budget(10, 60)
+_REGISTER = Budget(10, 3600)
+_PAGE = Budget(120, 60, cost=_page_cost)
+_EXPORT = Budget(5, 60)
+_BULK = Budget(10, 60)
+_TOGGLE = Budget(30, 60)
+
+# (method, route template) -> budget per client, other routes are not limited
+RATE_LIMITS: Dict[Tuple[str, str], Budget] = {
+    ("POST", f"{API_V1_STR}/users/login"): _LOGIN,
+    ("POST", f"{API_V1_STR}/users"): _REGISTER,
+    ("GET", f"{API_V1_STR}/places"): _PAGE,
+    ("GET", f"{API_V1_STR}/places/feed"): _PAGE,
+    ("GET", f"{API_V1_STR}/posts"): _PAGE,
+    ("GET", f"{API_V1_STR}/posts/feed"): _PAGE,
+    ("GET", f"{API_V1_STR}/search"): _PAGE,
+    ("GET", f"{API_V1_STR}/places/export"): _EXPORT,
+    ("GET", f"{API_V1_STR}/posts/export"): _EXPORT,
+    ("POST", f"{API_V1_STR}/places/bulk"): _BULK,
+    ("POST", f"{API_V1_STR}/posts/bulk"): _BULK,
+    ("POST", f"{API_V1_STR}/places/{{slug}}/favorite"): _TOGGLE,
+    ("DELETE", f"{API_V1_STR}/places/{{slug}}/favorite"): _TOGGLE,
+    ("POST", f"{API_V1_STR}/posts/{{slug}}/like"): _TOGGLE,
+    ("DELETE", f"{API_V1_STR}/posts/{{slug}}/like"): _TOGGLE,
+    ("POST", f"{API_V1_STR}/profiles/{{username}}/follow"): _TOGGLE,
+    ("DELETE", f"{API_V1_STR}/profiles/{{username}}/follow"): _TOGGLE,
+}
+
+
+class MemoryStore:
+    """
+    Token buckets of this worker: `limit` tokens, refilled evenly over `period`.
+    """
+
+    def __init__(self):
+        # key -> (tokens, updated at, period)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._pruned_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def hit(self, key: str, budget: Budget, cost: int) -> float:
+        now = time.monotonic()
+        rate = budget.limit / budget.period
+        tokens, updated_at, _ = self._buckets.get(key, (budget.limit, now, 0))
+        tokens = min(budget.limit, tokens + (now - updated_at) * rate)
+
+        if now - self._pruned_at > PRUNE_INTERVAL:
+            self._prune(now)
+
+        if tokens < cost:
+            self._buckets[key] = (tokens, now, budget.period)
+            return (cost - tokens) / rate
+        self._buckets[key] = (tokens - cost, now, budget.period)
+        return 0.0
+
+    def _prune(self, now: float):
+        # a bucket untouched for longer than its period is full again
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if now - bucket[1] < bucket[2]
+        }
+        self._pruned_at = now
+
+
+def sliding_window_retry_after(
+    previous: int, current: int, limit: int, period: float, elapsed: float
+) -> float:
+    """
+    Seconds until `previous * (1 - elapsed / period) + current` falls to `limit`,
+    assuming no further requests.
+    """
+    if current > limit:
+        # the current window has to become the previous one and fade out
+        return period - elapsed + period * (1 - limit / current)
+    if previous * (1 - elapsed / period) + current <= limit:
+        return 0.0
+    return period * (1 - (limit - current) / previous) - elapsed
+
+
+class MongoStore:
+    """
+    Sliding window counters in a TTL collection, shared by every worker.
+    """
+
+    async def hit(self, key: str, budget: Budget, cost: int) -> float:
+        now = time.time()
+        window = int(now // budget.period)
+        elapsed = now - window * budget.period
+        # the previous window is still weighed in during the current one
+        expires_at = datetime.utcfromtimestamp((window + 2) * budget.period)
+        current, previous = await asyncio.gather(
+            rate_limit_repository.add_to_window(
+                db.client, f"{key}:{window}", cost, expires_at
+            ),
+            rate_limit_repository.get_window_count(db.client, f"{key}:{window - 1}"),
+        )
+        return sliding_window_retry_after(
+            previous, current, budget.limit, budget.period, elapsed
+        )
+
+
+def client_key(request: Request) -> str:
+    """
+    Username from a valid token, the address of the client otherwise.
+    """
+    authorization = request.headers.get("Authorization", "")
+    prefix, _, token = authorization.partition(" ")
+    if prefix == JWT_TOKEN_PREFIX and token:
+        try:
+            payload = jwt.decode(token, str(SECRET_KEY), algorithms=[ALGORITHM])
+            return f"user:{payload['username']}"
+        except (PyJWTError, KeyError):
+            pass
+    return f"ip:{request.client.host if request.client else ''}"
+
+
+store = MongoStore() if RATE_LIMIT_STORE == "mongo" else MemoryStore()
+
+
+async def rate_limit_middleware(request: Request, call_next) -> Response:
+    route = route_template(request)
+    budget = RATE_LIMITS.get((request.method, route))
+    if budget is None:
+        return await call_next(request)
+
+    cost = min(budget.cost(request) if budget.cost else 1, budget.limit)
+    key = f"{request.method} {route} {client_key(request)}"
+    try:
+        retry_after = await store.hit(key, budget, cost)
+    except PyMongoError:
+        # an unreachable shared store must not take the routes down with it
+        retry_after = 0.0
+    if retry_after > 0:
+        return JSONResponse(
+            {"errors": ["Too many requests"]},
+            status_code=HTTP_429_TOO_MANY_REQUESTS,
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    return await call_next(request)
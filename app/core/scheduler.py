@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+from ..db.mongodb import db
+from ..db.view_buffer import view_buffer
+from ..services.deletions import purge_deleted
+from ..services.jobs import measure_jobs, run_next_job
+from ..services.trending import refresh_trending_places
+from .config import (
+    DELETION_INTERVAL,
+    JOB_METRICS_INTERVAL,
+    JOB_POLL_INTERVAL,
+    JOB_STOP_TIMEOUT,
+    JOB_WORKERS,
+    TRENDING_REFRESH_INTERVAL,
+    VIEW_FLUSH_INTERVAL,
+)
+
+
+class PeriodicTask:
+    """
+    Runs `run(conn)` in the background every `interval` seconds, starting right
+    away. With `run_on_stop` it runs once more on shutdown.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        interval: float,
+        run: Callable[[AsyncIOMotorClient], Awaitable],
+        run_on_stop: bool = False,
+    ):
+        self.name = name
+        self.interval = interval
+        self.run = run
+        self.run_on_stop = run_on_stop
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self, conn: AsyncIOMotorClient):
+        try:
+            await self.run(conn)
+        except PyMongoError as exc:
+            logging.warning("%s failed: %s", self.name, exc)
+
+    async def _loop(self, conn: AsyncIOMotorClient):
+        while True:
+            await self.run_once(conn)
+            await asyncio.sleep(self.interval)
+
+    def start(self, conn: AsyncIOMotorClient):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop(conn))
+
+    async def stop(self, conn: AsyncIOMotorClient):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.run_on_stop:
+            await self.run_once(conn)
+
+
+class JobWorkers:
+    """
+    `concurrency` workers running the jobs of services.jobs one at a time each,
+    polling every `poll_interval` seconds while none is due.
+    """
+
+    def __init__(self, concurrency: int, poll_interval: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def _work(self, conn: AsyncIOMotorClient):
+        while not self._stopping.is_set():
+            try:
+                ran = await run_next_job(conn)
+            except PyMongoError as exc:
+                logging.warning("Running jobs failed: %s", exc)
+                ran = False
+            if not ran:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self, conn: AsyncIOMotorClient):
+        if not self._tasks:
+            self._stopping = asyncio.Event()
+            self._tasks = [
+                asyncio.ensure_future(self._work(conn)) for _ in range(self.concurrency)
+            ]
+
+    async def stop(self, timeout: float):
+        """
+        Let the running jobs finish within `timeout` seconds. The ones cut short
+        stay leased and are run again once their lease ran out.
+        """
+        if not self._tasks:
+            return
+        self._stopping.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+
+job_workers = JobWorkers(JOB_WORKERS, JOB_POLL_INTERVAL)
+
+periodic_tasks: List[PeriodicTask] = [
+    PeriodicTask(
+        "Flushing views", VIEW_FLUSH_INTERVAL, view_buffer.flush, run_on_stop=True
+    ),
+    PeriodicTask(
+        "Refreshing trending places", TRENDING_REFRESH_INTERVAL, refresh_trending_places
+    ),
+    PeriodicTask("Purging deleted documents", DELETION_INTERVAL, purge_deleted),
+    PeriodicTask("Measuring the job queue", JOB_METRICS_INTERVAL, measure_jobs),
+]
+
+
+async def start_periodic_tasks():
+    for task in periodic_tasks:
+        task.start(db.client)
+    job_workers.start(db.client)
+
+
+async def stop_periodic_tasks():
+    # before close_mongo_connection, the last views are still written
+    await job_workers.stop(JOB_STOP_TIMEOUT)
+    for task in periodic_tasks:
+        await task.stop(db.client)
@@ -0,0 +1,218 @@
+import functools
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .config import (
+    PROJECT_NAME,
+    TRACE_EXPORT_FILE,
+    TRACE_EXPORTER,
+    TRACE_SAMPLE_RATE,
+)
+from .metrics import route_template
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "span_id",
+        "parent_id",
+        "start_unix_ns",
+        "start_ns",
+        "end_ns",
+        "attributes",
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: dict):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.start_unix_ns = time.time_ns()
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+
+    def finish(self):
+        self.end_ns = time.perf_counter_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.perf_counter_ns()) - self.start_ns) / 1e6
+
+
+class Trace:
+    """
+    Spans of one sampled request. Spans may be added from Motor's executor
+    threads, appending to a list is safe there.
+    """
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+
+    def start_span(
+        self, name: str, parent: Optional[Span] = None, attributes: dict = None
+    ) -> Span:
+        span = Span(name, parent, attributes or {})
+        self.spans.append(span)
+        return span
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    trace = current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    new_span = trace.start_span(name, current_span.get(), attributes)
+    reset = current_span.set(new_span)
+    try:
+        yield new_span
+    finally:
+        current_span.reset(reset)
+        new_span.finish()
+
+
+def traced(fn):
+    """
+    Record a span around every call of `fn` while the request is sampled.
+    """
+    name = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if current_trace.get() is None:
+                return await fn(*args, **kwargs)
+            with span(name):
+                return await fn(*args, **kwargs)
+
+    else:
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if current_trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def server_timing(trace: Trace, root: Span) -> str:
+    """
+    Spans summed up by name, the root span is reported as `total`.
+    """
+    totals: Dict[str, List[float]] = OrderedDict()
+    for item in trace.spans:
+        if item is not root:
+            totals.setdefault(item.name, []).append(item.duration_ms)
+
+    metrics = [
+        f'{name};dur={sum(durations):.2f};desc="{len(durations)}x"'
+        for name, durations in totals.items()
+    ]
+    metrics.append(f"total;dur={root.duration_ms:.2f}")
+    return ", ".join(metrics)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace, root: Span) -> dict:
+    """
+    The trace in OTLP/JSON, the format of the OpenTelemetry file exporter.
+    """
+    spans = []
+    for item in trace.spans:
+        end_unix_ns = item.start_unix_ns + int(item.duration_ms * 1e6)
+        spans.append(
+            {
+                "traceId": trace.trace_id,
+                "spanId": item.span_id,
+                "parentSpanId": item.parent_id or "",
+                "name": item.name,
+                # SPAN_KIND_SERVER for the request, SPAN_KIND_INTERNAL otherwise
+                "kind": 2 if item is root else 1,
+                "startTimeUnixNano": str(item.start_unix_ns),
+                "endTimeUnixNano": str(end_unix_ns),
+                "attributes": [
+                    {"key": key, "value": _otlp_value(value)}
+                    for key, value in item.attributes.items()
+                ],
+            }
+        )
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": PROJECT_NAME}}
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+            }
+        ]
+    }
+
+
+_export_lock = threading.Lock()
+
+
+def export(trace: Trace, root: Span):
+    line = json.dumps(to_otlp(trace, root)) + "\n"
+    with _export_lock:
+        if TRACE_EXPORTER == "stdout":
+            sys.stdout.write(line)
+            sys.stdout.flush()
+        elif TRACE_EXPORTER == "file":
+            with open(TRACE_EXPORT_FILE, "a") as f:
+                f.write(line)
+
+
+async def tracing_middleware(request: Request, call_next) -> Response:
+    if random.random() >= TRACE_SAMPLE_RATE:
+        return await call_next(request)
+
+    trace = Trace()
+    current_trace.set(trace)
+    route = route_template(request)
+    with span(
+        f"{request.method} {route}",
+        **{
+            "http.method": request.method,
+            "http.route": route,
+            "http.target": request.url.path,
+        },
+    ) as root:
+        response = await call_next(request)
+        root.attributes["http.status_code"] = response.status_code
+
+    response.headers["Server-Timing"] = server_timing(trace, root)
+    if TRACE_EXPORTER:
+        export(trace, root)
+    return response
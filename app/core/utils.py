@@ -1,7 +1,40 @@
+import base64
+import json
+
+from bson import json_util
+from bson.errors import BSONError
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from starlette.exceptions import HTTPException
 from starlette.responses import JSONResponse
+from starlette.status import HTTP_400_BAD_REQUEST
+
+from .tracing import traced
+
+
+@traced
+def create_aliased_response(model: BaseModel, headers: dict = None) -> JSONResponse:
+    return JSONResponse(content=jsonable_encoder(model, by_alias=True), headers=headers)
+
+
+def create_aliased_line(model: BaseModel, **extra) -> bytes:
+    content = {**extra, **jsonable_encoder(model, by_alias=True)}
+    return (
+        json.dumps(content, ensure_ascii=False, separators=(",", ":")) + "\n"
+    ).encode("utf-8")
+
+
+def encode_cursor(value: dict) -> str:
+    raw = json_util.dumps(value).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
 
-def create_aliased_response(model: BaseModel) -> JSONResponse:
-    return JSONResponse(content=jsonable_encoder(model, by_alias=True))
+def decode_cursor(token: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        value = json_util.loads(raw)
+    except (ValueError, BSONError):
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if not isinstance(value, dict):
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return value
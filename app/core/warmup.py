@@ -0,0 +1,51 @@
+import asyncio
+import logging
+import time
+
+from pymongo.errors import PyMongoError
+from starlette.exceptions import HTTPException
+
+from ..db.change_stream import invalidation_bus
+from ..db.mongodb import db
+from ..db.repositories import place_repository
+from ..services.place import get_place_by_slug
+from ..services.tag import fetch_all_tag_names, fetch_all_tags
+from .config import WARMUP_PLACES, WARMUP_TIMEOUT
+
+
+class Readiness:
+    def __init__(self):
+        self.warm = False
+        self.warm_up_ms = None
+
+
+readiness = Readiness()
+
+
+async def warm_up():
+    """
+    Startup handler run after connect_to_mongo, the worker serves no request
+    before it returns.
+    """
+    started = time.perf_counter()
+    conn = db.client
+    if await invalidation_bus.wait_started(WARMUP_TIMEOUT):
+        try:
+            await asyncio.gather(fetch_all_tags(conn), fetch_all_tag_names(conn))
+            # the first page of the listing, the places most requests are about
+            rows = place_repository.find_places(conn, {}, WARMUP_PLACES, 0)
+            slugs = [row["slug"] async for row in rows]
+            await asyncio.gather(*(get_place_by_slug(conn, slug) for slug in slugs))
+        except (PyMongoError, HTTPException) as exc:
+            logging.warning("Preloading caches failed: %s", exc)
+    else:
+        logging.info("Local caches are disabled, nothing to preload")
+
+    readiness.warm = True
+    readiness.warm_up_ms = round((time.perf_counter() - started) * 1000, 1)
+    logging.info("Warmed up in %sms", readiness.warm_up_ms)
+
+
+async def cool_down():
+    # stop taking traffic before the connection goes away
+    readiness.warm = False
@@ -0,0 +1,148 @@
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    NamedTuple,
+    Set,
+    Tuple,
+)
+
+from ..core.config import LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL
+
+# (collection, document id), a None id stands for any document of the collection
+Dependency = Tuple[str, Any]
+
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+    depends_on: Tuple[Dependency, ...]
+
+
+class LocalCache:
+    """
+    In-process cache of documents, kept coherent with writes made by other
+    workers through the change stream in db.change_stream. A worker's own
+    writes evict right away, see evict().
+
+    Caches stay disabled, every lookup goes to Mongo, until the change stream
+    runs, and are cleared whenever it stops. Cached values are shared between
+    requests and must not be modified.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        collections: Iterable[str],
+        maxsize: int = LOCAL_CACHE_SIZE,
+        ttl: float = LOCAL_CACHE_TTL,
+    ):
+        self.name = name
+        self.collections = frozenset(collections)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = False
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._keys_by_dependency: Dict[Dependency, Set[Hashable]] = {}
+        # bumped on every eviction so a load racing with a write isn't stored
+        self._generation = 0
+        caches.append(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable[Any]],
+        depends_on: Callable[[Any], Iterable[Dependency]],
+    ) -> Any:
+        if not self.enabled:
+            return await load()
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+        self.misses += 1
+        generation = self._generation
+        value = await load()
+        if value is not None and self.enabled and generation == self._generation:
+            self._store(key, value, tuple(_normalize(depends_on(value))))
+        return value
+
+    def _store(self, key: Hashable, value: Any, depends_on: Tuple[Dependency, ...]):
+        self._discard(key)
+        self._entries[key] = _Entry(value, time.monotonic() + self.ttl, depends_on)
+        for dependency in depends_on:
+            self._keys_by_dependency.setdefault(dependency, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for dependency in entry.depends_on:
+            keys = self._keys_by_dependency.get(dependency)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_dependency[dependency]
+
+    def evict(self, collection: str, document_id: Any):
+        self._generation += 1
+        for dependency in ((collection, str(document_id)), (collection, None)):
+            for key in list(self._keys_by_dependency.get(dependency, ())):
+                self._discard(key)
+
+    def forget(self, key: Hashable):
+        # for writes that know the key but not the document id
+        self._generation += 1
+        self._discard(key)
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+        self._keys_by_dependency.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _normalize(depends_on: Iterable[Dependency]) -> Iterable[Dependency]:
+    # change events carry ObjectIds, models may hold them as strings
+    for collection, document_id in depends_on:
+        yield collection, None if document_id is None else str(document_id)
+
+
+caches: List[LocalCache] = []
+
+
+def evict(collection: str, document_id: Any = None):
+    """
+    Evict what depends on a document this worker just wrote, without waiting
+    for the change stream. Without an id every cache of the collection is cleared.
+    """
+    for cache in caches:
+        if collection not in cache.collections:
+            continue
+        if document_id is None:
+            cache.clear()
+        else:
+            cache.evict(collection, document_id)
@@ -0,0 +1,66 @@
+from contextvars import ContextVar
+from typing import List, NamedTuple, Optional
+
+from bson.timestamp import Timestamp
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.client_session import ClientSession
+
+
+class CausalToken(NamedTuple):
+    operation_time: Timestamp
+    cluster_time: dict
+
+
+class CausalState:
+    """
+    Per request bookkeeping for causally consistent reads.
+
+    Every operation gets its own session: Motor runs operations on executor
+    threads and a pymongo session must not be shared between them.
+    """
+
+    def __init__(self, token: Optional[CausalToken] = None):
+        self.token = token
+        self.secondary_reads = False
+        self.sessions: List[ClientSession] = []
+
+    def latest_token(self) -> Optional[CausalToken]:
+        tokens = [
+            CausalToken(session.operation_time, session.cluster_time)
+            for session in self.sessions
+            if session.operation_time and session.cluster_time
+        ]
+        return max(tokens, key=lambda token: token.operation_time, default=None)
+
+    def end_sessions(self):
+        # pymongo does not end them on garbage collection, each would hold a
+        # server session until logicalSessionTimeout
+        for session in self.sessions:
+            session.end_session()
+        self.sessions = []
+
+
+causal_state: ContextVar[Optional[CausalState]] = ContextVar(
+    "causal_state", default=None
+)
+
+
+def start_causal_session(
+    conn: AsyncIOMotorClient, write: bool = False
+) -> Optional[ClientSession]:
+    """
+    Session for a single operation of the current request, if it needs one.
+
+    Writes always get a session so their operation time can be handed back to
+    the client; reads only when the client sent a token to wait for.
+    """
+    state = causal_state.get()
+    if state is None or not (write or state.token):
+        return None
+
+    session = conn.delegate.start_session(causal_consistency=True)
+    if state.token:
+        session.advance_cluster_time(state.token.cluster_time)
+        session.advance_operation_time(state.token.operation_time)
+    state.sessions.append(session)
+    return session
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+from ..core.config import (
+    CHANGE_STREAM_NAME,
+    change_stream_tokens_collection_name,
+    database_name,
+)
+from .cache import caches
+
+# the saved token points to a change that is no longer in the oplog
+RESUME_FAILED_CODES = (260, 280, 286)
+TOKEN_SAVE_INTERVAL = 5.0
+MAX_RETRY_DELAY = 60.0
+
+
+class InvalidationBus:
+    """
+    Watches the collections the local caches depend on and evicts what a
+    change touched, so every worker drops a document no matter which one
+    wrote it.
+    """
+
+    def __init__(self):
+        self.resume_token: Optional[dict] = None
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+        self._settled: Optional[asyncio.Event] = None
+
+    @property
+    def collections(self):
+        return sorted({name for cache in caches for name in cache.collections})
+
+    def _set_running(self, running: bool):
+        self.running = running
+        for cache in caches:
+            cache.enabled = running
+            cache.clear()
+        self._settle()
+
+    def _settle(self):
+        if self._settled is not None:
+            self._settled.set()
+
+    async def wait_started(self, timeout: float) -> bool:
+        """
+        Wait until the first attempt to open the stream succeeded or failed.
+        """
+        if self._settled is not None:
+            try:
+                await asyncio.wait_for(self._settled.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.running
+
+    def dispatch(self, change: dict):
+        collection = change.get("ns", {}).get("coll")
+        document_key = change.get("documentKey")
+        for cache in caches:
+            if document_key is not None and collection in cache.collections:
+                cache.evict(collection, document_key["_id"])
+            elif collection is None or collection in cache.collections:
+                # drop, rename, invalidate: nothing is known about the documents
+                cache.clear()
+
+    async def _load_token(self, conn: AsyncIOMotorClient):
+        row = await conn[database_name][change_stream_tokens_collection_name].find_one(
+            {"_id": CHANGE_STREAM_NAME}
+        )
+        self.resume_token = row["token"] if row else None
+
+    async def _save_token(self, conn: AsyncIOMotorClient):
+        if self.resume_token is None:
+            return
+        await conn[database_name][change_stream_tokens_collection_name].update_one(
+            {"_id": CHANGE_STREAM_NAME},
+            {"$set": {"token": self.resume_token, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+
+    async def _watch(self, conn: AsyncIOMotorClient):
+        pipeline = [{"$match": {"ns.coll": {"$in": self.collections}}}]
+        async with conn[database_name].watch(
+            pipeline, resume_after=self.resume_token, max_await_time_ms=1000
+        ) as stream:
+            # opens the cursor, caches may only fill once changes are seen
+            change = await stream.try_next()
+            self._set_running(True)
+            logging.info("Watching %s for cache invalidation", self.collections)
+            saved_at = time.monotonic()
+            while stream.alive:
+                if change is not None:
+                    self.dispatch(change)
+                self.resume_token = stream.resume_token
+                if time.monotonic() - saved_at > TOKEN_SAVE_INTERVAL:
+                    await self._save_token(conn)
+                    saved_at = time.monotonic()
+                change = await stream.try_next()
+
+    async def run(self, conn: AsyncIOMotorClient):
+        delay = 1.0
+        try:
+            await self._load_token(conn)
+        except PyMongoError:
+            pass
+        while True:
+            try:
+                await self._watch(conn)
+                delay = 1.0
+            except OperationFailure as exc:
+                if exc.code in RESUME_FAILED_CODES and self.resume_token:
+                    logging.warning("Cannot resume the change stream, starting over")
+                    self.resume_token = None
+                    continue
+                self._stopped(exc, delay)
+            except PyMongoError as exc:
+                self._stopped(exc, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    def _stopped(self, exc: Exception, delay: float):
+        # changes may be missed from now on, serve everything from Mongo
+        if self.running:
+            self._set_running(False)
+        self._settle()
+        logging.warning(
+            "Change stream stopped (%s), local caches disabled, retrying in %.0fs",
+            exc,
+            delay,
+        )
+
+    def start(self, conn: AsyncIOMotorClient):
+        if caches and self._task is None:
+            self._settled = asyncio.Event()
+            self._task = asyncio.ensure_future(self.run(conn))
+
+    async def stop(self, conn: AsyncIOMotorClient):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._set_running(False)
+        try:
+            await self._save_token(conn)
+        except PyMongoError:
+            pass
+
+
+invalidation_bus = InvalidationBus()
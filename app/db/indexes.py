@@ -0,0 +1,233 @@
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from .mongodb import AsyncIOMotorClient
+from ..core.config import (
+    VIEW_RETENTION_DAYS,
+    comments_collection_name,
+    database_name,
+    favorites_collection_name,
+    followers_collection_name,
+    jobs_collection_name,
+    likes_collection_name,
+    place_collection_name,
+    post_collection_name,
+    rate_limits_collection_name,
+    tags_collection_name,
+    users_collection_name,
+    views_collection_name,
+)
+
+# another worker starting at the same time dropped it first
+INDEX_NOT_FOUND = 27
+
+# text is not necessarily english, keep every word and skip stemming
+SEARCH_LANGUAGE = "none"
+
+# what services.deletions still has to purge, kept small by leaving out the rest
+DELETED = IndexModel(
+    [("deleted_at", ASCENDING)],
+    name="deleted_at",
+    partialFilterExpression={"deleted_at": {"$exists": True}},
+)
+
+# every filter and sort in app/db/repositories must be served by one of these,
+# tests/db/test_query_plans.py checks it against a real mongod
+INDEXES: Dict[str, List[IndexModel]] = {
+    # the unique slug index is what decides who gets a slug, app/services/slugs.py
+    place_collection_name: [
+        IndexModel([("slug", ASCENDING)], name="slug", unique=True),
+        IndexModel(
+            [("author_id", ASCENDING), ("_id", DESCENDING)], name="author_recent"
+        ),
+        DELETED,
+        IndexModel(
+            [
+                ("title", TEXT),
+                ("description", TEXT),
+                ("body", TEXT),
+                ("tag_list", TEXT),
+            ],
+            name="search",
+            weights={"title": 10, "tag_list": 5, "description": 3, "body": 1},
+            default_language=SEARCH_LANGUAGE,
+        ),
+    ],
+    post_collection_name: [
+        IndexModel([("slug", ASCENDING)], name="slug", unique=True),
+        IndexModel(
+            [("author_id", ASCENDING), ("_id", DESCENDING)], name="author_recent"
+        ),
+        DELETED,
+        IndexModel(
+            [("title", TEXT), ("body", TEXT), ("tag_list", TEXT)],
+            name="search",
+            weights={"title": 10, "tag_list": 5, "body": 1},
+            default_language=SEARCH_LANGUAGE,
+        ),
+    ],
+    # one favorite, like or follow per user, adding one is an upsert on these
+    favorites_collection_name: [
+        IndexModel(
+            [("place_id", ASCENDING), ("user_id", ASCENDING)],
+            name="place_user",
+            unique=True,
+        ),
+        IndexModel([("user_id", ASCENDING)], name="user"),
+    ],
+    likes_collection_name: [
+        IndexModel(
+            [("post_id", ASCENDING), ("user_id", ASCENDING)],
+            name="post_user",
+            unique=True,
+        ),
+        IndexModel([("user_id", ASCENDING)], name="user"),
+    ],
+    followers_collection_name: [
+        IndexModel(
+            [("follower", ASCENDING), ("following", ASCENDING)],
+            name="follower_following",
+            unique=True,
+        ),
+        IndexModel([("following", ASCENDING)], name="following"),
+    ],
+    comments_collection_name: [
+        IndexModel([("slug", ASCENDING)], name="slug"),
+        IndexModel([("username", ASCENDING)], name="username"),
+    ],
+    tags_collection_name: [IndexModel([("tag", ASCENDING)], name="tag")],
+    users_collection_name: [
+        IndexModel([("username", ASCENDING)], name="username"),
+        IndexModel([("email", ASCENDING)], name="email"),
+        DELETED,
+    ],
+    # run_at is unset once a job failed for good, only the pending ones are indexed
+    jobs_collection_name: [
+        IndexModel(
+            [("run_at", ASCENDING)],
+            name="run_at",
+            partialFilterExpression={"run_at": {"$exists": True}},
+        )
+    ],
+    # windows are removed by the TTL monitor once they no longer count
+    rate_limits_collection_name: [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at", expireAfterSeconds=0)
+    ],
+    views_collection_name: [
+        IndexModel(
+            [("collection", ASCENDING), ("day", ASCENDING), ("target_id", ASCENDING)],
+            name="collection_day_target",
+            unique=True,
+        ),
+        IndexModel(
+            [("day", ASCENDING)],
+            name="day",
+            expireAfterSeconds=VIEW_RETENTION_DAYS * 24 * 3600,
+        ),
+    ],
+}
+
+
+async def _find_duplicates(collection, keys: List[str], limit: int = 5) -> List[dict]:
+    rows = collection.aggregate(
+        [
+            {"$group": {"_id": {key: f"${key}" for key in keys}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+            {"$limit": limit},
+        ],
+        allowDiskUse=True,
+    )
+    return [row["_id"] async for row in rows]
+
+
+# what create_indexes may set besides the key, the rest of index_information()
+# (v, ns, textIndexVersion, ...) is filled in by mongod
+_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+
+def _definition(index: dict) -> dict:
+    """
+    What makes an index, from an IndexModel document or from index_information().
+    mongod keeps the fields of a text index in its weights, under an _fts key.
+    """
+    key = {
+        field: direction
+        for field, direction in dict(index["key"]).items()
+        if field not in ("_fts", "_ftsx")
+    }
+    definition = {
+        "key": [
+            (field, direction) for field, direction in key.items() if direction != TEXT
+        ]
+    }
+    if "weights" in index or TEXT in key.values():
+        text_fields = {
+            field: 1 for field, direction in key.items() if direction == TEXT
+        }
+        definition["weights"] = {**text_fields, **index.get("weights", {})}
+        definition["default_language"] = index.get("default_language", "english")
+    for name in _OPTIONS:
+        # unique=False is no option, expireAfterSeconds=0 is
+        if index.get(name) is not None and index[name] is not False:
+            definition[name] = index[name]
+    return definition
+
+
+async def _drop_changed_indexes(
+    collection, indexes: List[IndexModel]
+) -> List[IndexModel]:
+    """
+    A changed index keeps its name, mongod refuses to create it over the old one.
+    Drop the old one and return what is left to create. An index that becomes
+    unique is left out while duplicates would make it fail, the old one is kept.
+    Every worker runs this on startup, at the same time as the others.
+    """
+    existing = await collection.index_information()
+    creatable = []
+    for index in indexes:
+        spec = index.document
+        old = existing.get(spec["name"])
+        if old and _definition(old) == _definition(spec):
+            creatable.append(index)
+            continue
+        if spec.get("unique") and not (old and old.get("unique")):
+            duplicates = await _find_duplicates(collection, list(spec["key"]))
+            if duplicates:
+                logging.error(
+                    "Cannot make index %s.%s unique, remove the duplicated values"
+                    " first, for example: %s",
+                    collection.name,
+                    spec["name"],
+                    duplicates,
+                )
+                continue
+        if old:
+            try:
+                await collection.drop_index(spec["name"])
+            except OperationFailure as exc:
+                if exc.code != INDEX_NOT_FOUND:
+                    raise
+        creatable.append(index)
+    return creatable
+
+
+# unique indexes duplicates keep from being created, as collection.name;
+# /health/ready answers 503 while there are any, nothing else enforces them
+blocked_indexes: List[str] = []
+
+
+async def create_indexes(conn: AsyncIOMotorClient, db_name: str = database_name):
+    blocked_indexes.clear()
+    for collection_name, indexes in INDEXES.items():
+        collection = conn[db_name][collection_name]
+        creatable = await _drop_changed_indexes(collection, indexes)
+        blocked_indexes.extend(
+            f"{collection_name}.{index.document['name']}"
+            for index in indexes
+            if index not in creatable
+        )
+        if creatable:
+            await collection.create_indexes(creatable)
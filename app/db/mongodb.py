@@ -1,4 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.requests import Request
+
+from .causal import causal_state
 
 
 class DataBase:
@@ -8,5 +11,9 @@ class DataBase:
 db = DataBase()
 
 
-async def get_database() -> AsyncIOMotorClient:
+async def get_database(request: Request) -> AsyncIOMotorClient:
+    state = causal_state.get()
+    if state is not None and request.method in ("GET", "HEAD"):
+        # reads of this request may go to secondaries, see db.causal
+        state.secondary_reads = True
     return db.client
@@ -1,8 +1,14 @@
+import asyncio
 import logging
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from ..core.config import MONGODB_URL, MAX_CONNECTIONS_COUNT, MIN_CONNECTIONS_COUNT
+from .change_stream import invalidation_bus
+from .indexes import create_indexes
 from .mongodb import db
+from .monitoring import CommandRecorder, CommandTracer, PoolMetrics
+
+pool_metrics = PoolMetrics()
 
 
 async def connect_to_mongo():
@@ -11,11 +17,20 @@ async def connect_to_mongo():
         str(MONGODB_URL),
         maxPoolSize=MAX_CONNECTIONS_COUNT,
         minPoolSize=MIN_CONNECTIONS_COUNT,
+        event_listeners=[CommandRecorder(), CommandTracer(), pool_metrics],
+    )
+    # fails the startup when the server is unreachable, and opens the pool's
+    # minimum of connections up front instead of during the first requests
+    await asyncio.gather(
+        *(db.client.admin.command("ping") for _ in range(max(MIN_CONNECTIONS_COUNT, 1)))
     )
+    await create_indexes(db.client)
+    invalidation_bus.start(db.client)
     logging.info("Successfully connected to the database!")
 
 
 async def close_mongo_connection():
     logging.info("Closing the database connection...")
+    await invalidation_bus.stop(db.client)
     db.client.close()
     logging.info("The database connection is closed!")
@@ -0,0 +1,243 @@
+import json
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from pymongo import monitoring
+
+from ..core.metrics import (
+    POOL_CHECKED_OUT,
+    POOL_CHECKOUT_FAILURES,
+    POOL_CHECKOUT_WAIT,
+    POOL_CONNECTIONS,
+)
+from ..core.tracing import Span, current_span, current_trace
+
+# commands whose payload carries the documents or filter of the operation
+_SHAPE_FIELDS = {
+    "find": "filter",
+    "findAndModify": "query",
+    "count": "query",
+    "distinct": "query",
+    "aggregate": "pipeline",
+    "update": "updates",
+    "delete": "deletes",
+}
+
+
+class CommandRecord(NamedTuple):
+    name: str
+    collection: Optional[str]
+    duration_ms: float
+    shape: str
+    command: dict
+
+
+class QueryLog:
+    """
+    Commands issued on behalf of a single request.
+    """
+
+    def __init__(self):
+        self.records: List[CommandRecord] = []
+        self._pending: Dict[int, Tuple[str, Optional[str], str, dict]] = {}
+
+    @property
+    def count(self) -> int:
+        return len(self.records)
+
+    @property
+    def duration_ms(self) -> float:
+        return sum(record.duration_ms for record in self.records)
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        command = event.command
+        collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = command.get("collection")
+        self._pending[event.request_id] = (
+            event.command_name,
+            collection,
+            command_shape(event.command_name, collection, command),
+            command,
+        )
+
+    def finished(self, event: monitoring.CommandSucceededEvent):
+        pending = self._pending.pop(event.request_id, None)
+        if pending:
+            name, collection, shape, command = pending
+            self.records.append(
+                CommandRecord(
+                    name, collection, event.duration_micros / 1000, shape, command
+                )
+            )
+
+    def repeated_shapes(self, limit: int) -> List[Tuple[str, int]]:
+        """
+        Shapes run more than `limit` times, the usual sign of a per-row query.
+        """
+        shapes = Counter(
+            record.shape for record in self.records if record.name != "getMore"
+        )
+        return [
+            (shape, count) for shape, count in shapes.most_common() if count > limit
+        ]
+
+
+query_log: ContextVar[Optional[QueryLog]] = ContextVar("query_log", default=None)
+
+
+def _strip_values(value):
+    if isinstance(value, dict):
+        return {key: _strip_values(item) for key, item in value.items()}
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        return [_strip_values(item) for item in value]
+    return "?"
+
+
+def command_shape(name: str, collection: Optional[str], command: dict) -> str:
+    """
+    Command with every literal replaced, so `find places {slug: "a"}` and
+    `find places {slug: "b"}` have the same shape.
+    """
+    payload = command.get(_SHAPE_FIELDS.get(name, ""), {})
+    if name in ("update", "delete") and payload:
+        payload = payload[0].get("q", {})
+    return f"{name} {collection} {json.dumps(_strip_values(payload), sort_keys=True)}"
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """
+    Attributes commands to the request they run for.
+
+    Motor runs the driver on executor threads and, since 2.3, copies the
+    caller's context into them, so `query_log` holds the request's log here as
+    well. Older versions run the listener with the default, None, and nothing
+    would be recorded; pyproject.toml requires motor ^2.3 for this.
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        log = query_log.get()
+        if log is not None:
+            log.started(event)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        log = query_log.get()
+        if log is not None:
+            log.finished(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        log = query_log.get()
+        if log is not None:
+            log.finished(event)
+
+
+class CommandTracer(monitoring.CommandListener):
+    """
+    Records a span per command of a sampled request, under the span that
+    was current when the operation was started. Like CommandRecorder it
+    finds them in the context motor (^2.3) copies into its executor threads.
+    """
+
+    def __init__(self):
+        self._pending: Dict[int, Span] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        trace = current_trace.get()
+        if trace is not None:
+            collection = event.command.get(event.command_name)
+            attributes = {"db.system": "mongodb", "db.operation": event.command_name}
+            if isinstance(collection, str):
+                attributes["db.mongodb.collection"] = collection
+            self._pending[event.request_id] = trace.start_span(
+                f"mongo.{event.command_name}", current_span.get(), attributes
+            )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        span = self._pending.pop(event.request_id, None)
+        if span is not None:
+            span.finish()
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        span = self._pending.pop(event.request_id, None)
+        if span is not None:
+            span.attributes["error"] = True
+            span.finish()
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Pool size and checkout waits. A checkout starts and finishes on the same
+    thread, so the start time is kept thread-local.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self.connections: Counter = Counter()
+        self.checked_out: Counter = Counter()
+
+    @staticmethod
+    def _address(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        address = self._address(event)
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            POOL_CHECKOUT_WAIT.labels(address).observe(time.perf_counter() - started)
+            self._local.started = None
+        POOL_CHECKED_OUT.labels(address).inc()
+        self.checked_out[address] += 1
+
+    def connection_check_out_failed(self, event):
+        address = self._address(event)
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            POOL_CHECKOUT_WAIT.labels(address).observe(time.perf_counter() - started)
+            self._local.started = None
+        POOL_CHECKOUT_FAILURES.labels(address, str(event.reason)).inc()
+
+    def connection_checked_in(self, event):
+        address = self._address(event)
+        POOL_CHECKED_OUT.labels(address).dec()
+        self.checked_out[address] -= 1
+
+    def connection_created(self, event):
+        address = self._address(event)
+        POOL_CONNECTIONS.labels(address).inc()
+        self.connections[address] += 1
+
+    def connection_closed(self, event):
+        address = self._address(event)
+        POOL_CONNECTIONS.labels(address).dec()
+        self.connections[address] -= 1
+
+    def stats(self) -> dict:
+        """
+        Connections of this worker by server address.
+        """
+        return {
+            address: {"open": count, "checkedOut": self.checked_out[address]}
+            for address, count in self.connections.items()
+        }
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
@@ -0,0 +1,120 @@
+from typing import NamedTuple, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReadPreference, WriteConcern
+from pymongo.collation import Collation
+
+from ...core.config import LISTING_READ_PREFERENCE, QUERY_MAX_TIME_MS, database_name
+from ..causal import causal_state, start_causal_session
+from ..mongodb import AsyncIOMotorClient
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+class OperationProfile(NamedTuple):
+    name: str
+    read_preference: Optional[object] = None
+    write_concern: Optional[WriteConcern] = None
+    max_time_ms: Optional[int] = None
+    collation: Optional[Collation] = None
+
+
+# single-document reads that must see the latest write (details, guards)
+READ = OperationProfile("read", max_time_ms=QUERY_MAX_TIME_MS)
+# pages, feeds and tag lists, which tolerate replication lag
+LISTING = OperationProfile(
+    "listing",
+    read_preference=READ_PREFERENCES[LISTING_READ_PREFERENCE],
+    max_time_ms=QUERY_MAX_TIME_MS,
+)
+# long running exports; maxTimeMS would cap the whole cursor
+EXPORT = OperationProfile(
+    "export", read_preference=READ_PREFERENCES[LISTING_READ_PREFERENCE]
+)
+WRITE = OperationProfile("write")
+# likes, favorites and follows: cheap to redo, latency matters more
+COUNTER_WRITE = OperationProfile("counter_write", write_concern=WriteConcern(w=1))
+USER_WRITE = OperationProfile("user_write", write_concern=WriteConcern(w="majority"))
+
+# soft-deleted places, posts and users wait for services.deletions to purge them,
+# reads leave them out with this
+NOT_DELETED = {"deleted_at": None}
+
+# client -> {(collection name, profile name): collection handle}
+_handles: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def get_collection(
+    conn: AsyncIOMotorClient, name: str, profile: OperationProfile
+) -> AsyncIOMotorCollection:
+    state = causal_state.get()
+    if state and state.secondary_reads and profile.read_preference is None:
+        profile = profile._replace(
+            name=f"{profile.name}_secondary",
+            read_preference=ReadPreference.SECONDARY_PREFERRED,
+        )
+
+    handles = _handles.setdefault(conn, {})
+    key = (name, profile.name)
+    if key not in handles:
+        handles[key] = conn[database_name][name].with_options(
+            read_preference=profile.read_preference,
+            write_concern=profile.write_concern,
+        )
+    return handles[key]
+
+
+def find_options(conn: AsyncIOMotorClient, profile: OperationProfile) -> dict:
+    """
+    Keyword arguments for find/find_one.
+    """
+    options = {}
+    if profile.max_time_ms:
+        options["max_time_ms"] = profile.max_time_ms
+    if profile.collation:
+        options["collation"] = profile.collation
+    return {**options, **session_options(conn)}
+
+
+def command_options(conn: AsyncIOMotorClient, profile: OperationProfile) -> dict:
+    """
+    Keyword arguments for count_documents/aggregate.
+    """
+    options = {}
+    if profile.max_time_ms:
+        options["maxTimeMS"] = profile.max_time_ms
+    if profile.collation:
+        options["collation"] = profile.collation
+    return {**options, **session_options(conn)}
+
+
+def write_options(conn: AsyncIOMotorClient) -> dict:
+    """
+    Keyword arguments for inserts, updates and deletes.
+    """
+    return session_options(conn, write=True)
+
+
+def session_options(conn: AsyncIOMotorClient, write: bool = False) -> dict:
+    session = start_causal_session(conn, write=write)
+    return {"session": session} if session else {}
+
+
+def versioned_update(
+    query: dict, fields: dict, version: Optional[int] = None
+) -> Tuple[dict, dict]:
+    """
+    Filter and update for a partial update that bumps `version`, and only
+    applies to a document still at `version` when one is given.
+    """
+    if version is not None:
+        # documents written before versioning have no version field
+        query = {**query, "version": version if version else {"$in": [0, None]}}
+    return query, {"$set": fields, "$inc": {"version": 1}}
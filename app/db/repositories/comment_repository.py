@@ -0,0 +1,23 @@
+from motor.motor_asyncio import AsyncIOMotorCursor
+
+from .base import LISTING, WRITE, find_options, get_collection, write_options
+from ...core.config import comments_collection_name
+from ...db.mongodb import AsyncIOMotorClient
+
+
+def find_comments(conn: AsyncIOMotorClient, slug: str) -> AsyncIOMotorCursor:
+    return get_collection(conn, comments_collection_name, LISTING).find(
+        {"slug": slug}, **find_options(conn, LISTING)
+    )
+
+
+async def insert_comment(conn: AsyncIOMotorClient, comment_doc: dict):
+    await get_collection(conn, comments_collection_name, WRITE).insert_one(
+        comment_doc, **write_options(conn)
+    )
+
+
+async def delete_comment(conn: AsyncIOMotorClient, id: int, username: str):
+    await get_collection(conn, comments_collection_name, WRITE).delete_many(
+        {"_id": id, "username": username}, **write_options(conn)
+    )
@@ -0,0 +1,138 @@
+from typing import Dict
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCursor
+from pymongo import ASCENDING, UpdateOne
+
+from .profile_repository import profile_cache
+from .base import (
+    COUNTER_WRITE,
+    EXPORT,
+    NOT_DELETED,
+    WRITE,
+    command_options,
+    get_collection,
+    find_options,
+    write_options,
+)
+from ..cache import evict
+from ...core.config import users_collection_name
+from ...db.mongodb import AsyncIOMotorClient
+
+# maintained on the user document under "counters"
+COUNTERS = ("places", "posts", "favorites", "followers", "followings")
+
+
+async def increment_counters(
+    conn: AsyncIOMotorClient,
+    deltas: Dict[object, Dict[str, int]],
+    key: str = "username",
+):
+    """
+    Add `deltas` ({username: {counter: delta}}) to the counters of each user,
+    users are looked up by `key`.
+    """
+    updates = [
+        UpdateOne(
+            {key: user},
+            {"$inc": {f"counters.{name}": delta for name, delta in counters.items()}},
+        )
+        for user, counters in deltas.items()
+        if any(counters.values())
+    ]
+    if updates:
+        await get_collection(conn, users_collection_name, COUNTER_WRITE).bulk_write(
+            updates, ordered=False, **write_options(conn)
+        )
+    # profiles are cached by username
+    for user in deltas:
+        if key == "username":
+            profile_cache.forget(user)
+        else:
+            evict(users_collection_name, user)
+
+
+async def count_by(
+    conn: AsyncIOMotorClient, collection_name: str, field: str
+) -> Dict[object, int]:
+    """
+    Number of documents of a whole collection by value of `field`, soft-deleted
+    ones left out.
+    """
+    rows = get_collection(conn, collection_name, EXPORT).aggregate(
+        [
+            {"$match": NOT_DELETED},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        ],
+        allowDiskUse=True,
+        **command_options(conn, EXPORT),
+    )
+    return {row["_id"]: row["count"] async for row in rows}
+
+
+def iterate_user_counters(conn: AsyncIOMotorClient) -> AsyncIOMotorCursor:
+    return get_collection(conn, users_collection_name, EXPORT).find(
+        {},
+        projection={"username": True, "counters": True},
+        sort=[("_id", ASCENDING)],
+        **find_options(conn, EXPORT),
+    )
+
+
+async def set_counters(
+    conn: AsyncIOMotorClient, counters: Dict[ObjectId, Dict[str, int]]
+) -> int:
+    result = await get_collection(conn, users_collection_name, WRITE).bulk_write(
+        [
+            UpdateOne({"_id": user_id}, {"$set": {"counters": values}})
+            for user_id, values in counters.items()
+        ],
+        ordered=False,
+        **write_options(conn),
+    )
+    return result.modified_count
+
+
+def iterate_stored_counts(
+    conn: AsyncIOMotorClient, collection_name: str, field: str
+) -> AsyncIOMotorCursor:
+    return get_collection(conn, collection_name, EXPORT).find(
+        {},
+        projection={field: True},
+        sort=[("_id", ASCENDING)],
+        **find_options(conn, EXPORT),
+    )
+
+
+async def set_stored_counts(
+    conn: AsyncIOMotorClient,
+    collection_name: str,
+    field: str,
+    counts: Dict[ObjectId, int],
+) -> int:
+    result = await get_collection(conn, collection_name, WRITE).bulk_write(
+        [
+            UpdateOne({"_id": document_id}, {"$set": {field: count}})
+            for document_id, count in counts.items()
+        ],
+        ordered=False,
+        **write_options(conn),
+    )
+    return result.modified_count
+
+
+async def increment_stored_counts(
+    conn: AsyncIOMotorClient,
+    collection_name: str,
+    field: str,
+    deltas: Dict[ObjectId, int],
+):
+    updates = [
+        UpdateOne({"_id": document_id}, {"$inc": {field: delta}})
+        for document_id, delta in deltas.items()
+        if delta
+    ]
+    if updates:
+        await get_collection(conn, collection_name, COUNTER_WRITE).bulk_write(
+            updates, ordered=False, **write_options(conn)
+        )
@@ -0,0 +1,84 @@
+from datetime import datetime
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+
+from .base import (
+    NOT_DELETED,
+    READ,
+    WRITE,
+    find_options,
+    get_collection,
+    write_options,
+)
+from ...db.mongodb import AsyncIOMotorClient
+
+
+async def mark_deleted(
+    conn: AsyncIOMotorClient, collection_name: str, query: dict, now: datetime
+) -> int:
+    """
+    Soft-delete the documents matching `query`, returns how many were marked.
+    """
+    result = await get_collection(conn, collection_name, WRITE).update_many(
+        {**query, **NOT_DELETED}, {"$set": {"deleted_at": now}}, **write_options(conn)
+    )
+    return result.modified_count
+
+
+async def claim_deleted(
+    conn: AsyncIOMotorClient,
+    collection_name: str,
+    now: datetime,
+    lease_until: datetime,
+) -> Optional[dict]:
+    """
+    Lease the oldest soft-deleted document nobody is purging, so a single
+    worker removes its dependents.
+    """
+    return await get_collection(conn, collection_name, WRITE).find_one_and_update(
+        {
+            "deleted_at": {"$exists": True},
+            "$or": [
+                {"purge_lease_until": {"$exists": False}},
+                {"purge_lease_until": {"$lte": now}},
+            ],
+        },
+        {"$set": {"purge_lease_until": lease_until}},
+        sort=[("deleted_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+        **write_options(conn),
+    )
+
+
+async def find_dependents(
+    conn: AsyncIOMotorClient,
+    collection_name: str,
+    query: dict,
+    limit: int,
+    projection: Optional[dict] = None,
+) -> List[dict]:
+    # from the primary, a lagging secondary would hand back rows already removed
+    rows = get_collection(conn, collection_name, READ).find(
+        query, projection=projection, limit=limit, **find_options(conn, READ)
+    )
+    return [row async for row in rows]
+
+
+async def delete_by_ids(
+    conn: AsyncIOMotorClient, collection_name: str, ids: List[ObjectId]
+) -> int:
+    result = await get_collection(conn, collection_name, WRITE).delete_many(
+        {"_id": {"$in": ids}}, **write_options(conn)
+    )
+    return result.deleted_count
+
+
+async def remove_deleted(
+    conn: AsyncIOMotorClient, collection_name: str, document_id: ObjectId
+) -> int:
+    result = await get_collection(conn, collection_name, WRITE).delete_one(
+        {"_id": document_id, "deleted_at": {"$exists": True}}, **write_options(conn)
+    )
+    return result.deleted_count
@@ -0,0 +1,94 @@
+from datetime import datetime
+from typing import Dict, List, Set
+
+from bson import ObjectId
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+from .base import (
+    COUNTER_WRITE,
+    LISTING,
+    READ,
+    command_options,
+    find_options,
+    get_collection,
+    write_options,
+)
+from ...core.config import favorites_collection_name
+from ...db.mongodb import AsyncIOMotorClient
+
+
+async def is_favorited(
+    conn: AsyncIOMotorClient, user_id: ObjectId, place_id: ObjectId
+) -> bool:
+    count = await get_collection(conn, favorites_collection_name, READ).count_documents(
+        {"user_id": user_id, "place_id": place_id}, **command_options(conn, READ)
+    )
+    return count > 0
+
+
+async def get_favorite_scores(
+    conn: AsyncIOMotorClient,
+    since: datetime,
+    now: datetime,
+    half_life_hours: float,
+    limit: int,
+) -> Dict[ObjectId, float]:
+    """
+    Favorites added since `since` by place, each one worth half as much every
+    `half_life_hours`.
+    """
+    # a favorite is added when its _id is generated
+    age_ms = {"$subtract": [now, {"$toDate": "$_id"}]}
+    decay = {"$pow": [0.5, {"$divide": [age_ms, half_life_hours * 3600 * 1000]}]}
+    rows = get_collection(conn, favorites_collection_name, LISTING).aggregate(
+        [
+            {"$match": {"_id": {"$gte": ObjectId.from_datetime(since)}}},
+            {"$group": {"_id": "$place_id", "score": {"$sum": decay}}},
+            {"$sort": {"score": DESCENDING}},
+            {"$limit": limit},
+        ],
+        **command_options(conn, LISTING),
+    )
+    return {row["_id"]: row["score"] async for row in rows}
+
+
+async def get_favorited_place_ids(
+    conn: AsyncIOMotorClient, user_id: ObjectId, place_ids: List[ObjectId]
+) -> Set[ObjectId]:
+    rows = get_collection(conn, favorites_collection_name, LISTING).find(
+        {"user_id": user_id, "place_id": {"$in": place_ids}},
+        projection={"_id": False, "place_id": True},
+        **find_options(conn, LISTING),
+    )
+    return {row["place_id"] async for row in rows}
+
+
+async def add_favorite(
+    conn: AsyncIOMotorClient, user_id: ObjectId, place_id: ObjectId
+) -> bool:
+    """
+    Upsert on the unique index, returns whether this call added the favorite.
+    """
+    try:
+        result = await get_collection(
+            conn, favorites_collection_name, COUNTER_WRITE
+        ).update_one(
+            {"place_id": place_id, "user_id": user_id},
+            {"$setOnInsert": {"place_id": place_id, "user_id": user_id}},
+            upsert=True,
+            **write_options(conn),
+        )
+    except DuplicateKeyError:
+        # a concurrent upsert of the same favorite won
+        return False
+    return result.upserted_id is not None
+
+
+async def remove_favorite(
+    conn: AsyncIOMotorClient, user_id: ObjectId, place_id: ObjectId
+) -> int:
+    result = await get_collection(
+        conn, favorites_collection_name, COUNTER_WRITE
+    ).delete_one({"place_id": place_id, "user_id": user_id}, **write_options(conn))
+    return result.deleted_count
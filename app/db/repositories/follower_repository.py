@@ -0,0 +1,68 @@
+from typing import List, Set
+
+from motor.motor_asyncio import AsyncIOMotorCursor
+from pymongo.errors import DuplicateKeyError
+
+from .base import (
+    COUNTER_WRITE,
+    LISTING,
+    READ,
+    command_options,
+    find_options,
+    get_collection,
+    write_options,
+)
+from ...core.config import followers_collection_name
+from ...db.mongodb import AsyncIOMotorClient
+
+
+async def is_following(conn: AsyncIOMotorClient, follower: str, following: str) -> bool:
+    count = await get_collection(conn, followers_collection_name, READ).count_documents(
+        {"follower": follower, "following": following}, **command_options(conn, READ)
+    )
+    return count > 0
+
+
+def find_followings(conn: AsyncIOMotorClient, follower: str) -> AsyncIOMotorCursor:
+    return get_collection(conn, followers_collection_name, LISTING).find(
+        {"follower": follower}, **find_options(conn, LISTING)
+    )
+
+
+async def get_followed_usernames(
+    conn: AsyncIOMotorClient, follower: str, usernames: List[str]
+) -> Set[str]:
+    rows = get_collection(conn, followers_collection_name, LISTING).find(
+        {"follower": follower, "following": {"$in": usernames}},
+        projection={"_id": False, "following": True},
+        **find_options(conn, LISTING),
+    )
+    return {row["following"] async for row in rows}
+
+
+async def add_follower(conn: AsyncIOMotorClient, follower: str, following: str) -> bool:
+    """
+    Upsert on the unique index, returns whether this call added the follow.
+    """
+    try:
+        result = await get_collection(
+            conn, followers_collection_name, COUNTER_WRITE
+        ).update_one(
+            {"follower": follower, "following": following},
+            {"$setOnInsert": {"follower": follower, "following": following}},
+            upsert=True,
+            **write_options(conn),
+        )
+    except DuplicateKeyError:
+        # a concurrent upsert of the same follow won
+        return False
+    return result.upserted_id is not None
+
+
+async def remove_follower(
+    conn: AsyncIOMotorClient, follower: str, following: str
+) -> int:
+    result = await get_collection(
+        conn, followers_collection_name, COUNTER_WRITE
+    ).delete_one({"follower": follower, "following": following}, **write_options(conn))
+    return result.deleted_count
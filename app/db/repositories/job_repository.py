@@ -0,0 +1,120 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+
+from .base import READ, WRITE, command_options, get_collection, write_options
+from ...core.config import jobs_collection_name
+from ...db.mongodb import AsyncIOMotorClient
+
+QUEUED = "queued"
+RUNNING = "running"
+FAILED = "failed"
+
+
+async def enqueue_job(
+    conn: AsyncIOMotorClient, name: str, payload: dict, run_at: datetime
+) -> ObjectId:
+    result = await get_collection(conn, jobs_collection_name, WRITE).insert_one(
+        {
+            "name": name,
+            "payload": payload,
+            "status": QUEUED,
+            "due_at": run_at,
+            "run_at": run_at,
+            "attempts": 0,
+        },
+        **write_options(conn),
+    )
+    return result.inserted_id
+
+
+async def claim_job(
+    conn: AsyncIOMotorClient, now: datetime, lease_until: datetime, max_attempts: int
+) -> Optional[dict]:
+    """
+    Lease the job that is due the longest. A leased job is visible again at
+    `lease_until`, so the one a dead worker held is run by another, unless that
+    was its last attempt, see fail_abandoned_jobs.
+    """
+    return await get_collection(conn, jobs_collection_name, WRITE).find_one_and_update(
+        {"run_at": {"$lte": now}, "attempts": {"$lt": max_attempts}},
+        {
+            "$set": {"status": RUNNING, "run_at": lease_until},
+            "$inc": {"attempts": 1},
+        },
+        sort=[("run_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+        **write_options(conn),
+    )
+
+
+def _leased(job: dict) -> dict:
+    # a worker that outlived its lease no longer owns the job, attempts moved on
+    return {"_id": job["_id"], "attempts": job["attempts"]}
+
+
+async def finish_job(conn: AsyncIOMotorClient, job: dict) -> int:
+    result = await get_collection(conn, jobs_collection_name, WRITE).delete_one(
+        _leased(job), **write_options(conn)
+    )
+    return result.deleted_count
+
+
+async def retry_job(
+    conn: AsyncIOMotorClient, job: dict, run_at: datetime, error: str
+) -> int:
+    result = await get_collection(conn, jobs_collection_name, WRITE).update_one(
+        _leased(job),
+        {
+            "$set": {
+                "status": QUEUED,
+                "due_at": run_at,
+                "run_at": run_at,
+                "error": error,
+            }
+        },
+        **write_options(conn),
+    )
+    return result.modified_count
+
+
+async def fail_job(conn: AsyncIOMotorClient, job: dict, error: str) -> int:
+    """
+    Keep a job that ran out of attempts for inspection, it is never run again.
+    """
+    result = await get_collection(conn, jobs_collection_name, WRITE).update_one(
+        _leased(job),
+        {"$set": {"status": FAILED, "error": error}, "$unset": {"run_at": True}},
+        **write_options(conn),
+    )
+    return result.modified_count
+
+
+async def fail_abandoned_jobs(
+    conn: AsyncIOMotorClient, now: datetime, max_attempts: int
+) -> int:
+    """
+    Give up jobs whose last attempt lost its lease, the worker died or hung.
+    """
+    result = await get_collection(conn, jobs_collection_name, WRITE).update_many(
+        {"run_at": {"$lte": now}, "attempts": {"$gte": max_attempts}},
+        {
+            "$set": {"status": FAILED, "error": "lease expired on the last attempt"},
+            "$unset": {"run_at": True},
+        },
+        **write_options(conn),
+    )
+    return result.modified_count
+
+
+async def count_pending_jobs(conn: AsyncIOMotorClient) -> Dict[str, int]:
+    rows = get_collection(conn, jobs_collection_name, READ).aggregate(
+        [
+            {"$match": {"run_at": {"$exists": True}}},
+            {"$group": {"_id": "$name", "count": {"$sum": 1}}},
+        ],
+        **command_options(conn, READ),
+    )
+    return {row["_id"]: row["count"] async for row in rows}
@@ -0,0 +1,66 @@
+from typing import List, Set
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from .base import (
+    COUNTER_WRITE,
+    LISTING,
+    READ,
+    command_options,
+    find_options,
+    get_collection,
+    write_options,
+)
+from ...core.config import likes_collection_name
+from ...db.mongodb import AsyncIOMotorClient
+
+
+async def is_liked(
+    conn: AsyncIOMotorClient, user_id: ObjectId, post_id: ObjectId
+) -> bool:
+    count = await get_collection(conn, likes_collection_name, READ).count_documents(
+        {"user_id": user_id, "post_id": post_id}, **command_options(conn, READ)
+    )
+    return count > 0
+
+
+async def get_liked_post_ids(
+    conn: AsyncIOMotorClient, user_id: ObjectId, post_ids: List[ObjectId]
+) -> Set[ObjectId]:
+    rows = get_collection(conn, likes_collection_name, LISTING).find(
+        {"user_id": user_id, "post_id": {"$in": post_ids}},
+        projection={"_id": False, "post_id": True},
+        **find_options(conn, LISTING),
+    )
+    return {row["post_id"] async for row in rows}
+
+
+async def add_like(
+    conn: AsyncIOMotorClient, user_id: ObjectId, post_id: ObjectId
+) -> bool:
+    """
+    Upsert on the unique index, returns whether this call added the like.
+    """
+    try:
+        result = await get_collection(
+            conn, likes_collection_name, COUNTER_WRITE
+        ).update_one(
+            {"post_id": post_id, "user_id": user_id},
+            {"$setOnInsert": {"post_id": post_id, "user_id": user_id}},
+            upsert=True,
+            **write_options(conn),
+        )
+    except DuplicateKeyError:
+        # a concurrent upsert of the same like won
+        return False
+    return result.upserted_id is not None
+
+
+async def remove_like(
+    conn: AsyncIOMotorClient, user_id: ObjectId, post_id: ObjectId
+) -> int:
+    result = await get_collection(
+        conn, likes_collection_name, COUNTER_WRITE
+    ).delete_one({"post_id": post_id, "user_id": user_id}, **write_options(conn))
+    return result.deleted_count
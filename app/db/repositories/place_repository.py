@@ -0,0 +1,134 @@
+from typing import Dict, List, Optional, Set
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCursor
+from pymongo import DESCENDING, InsertOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from .base import (
+    COUNTER_WRITE,
+    EXPORT,
+    LISTING,
+    NOT_DELETED,
+    READ,
+    WRITE,
+    find_options,
+    get_collection,
+    versioned_update,
+    write_options,
+)
+from ...core.config import place_collection_name
+from ...db.mongodb import AsyncIOMotorClient
+
+
+async def get_place_row(
+    conn: AsyncIOMotorClient, slug: str, projection: dict = None
+) -> Optional[dict]:
+    return await get_collection(conn, place_collection_name, READ).find_one(
+        {"slug": slug, **NOT_DELETED}, projection=projection, **find_options(conn, READ)
+    )
+
+
+async def get_place_id(conn: AsyncIOMotorClient, slug: str) -> Optional[ObjectId]:
+    row = await get_place_row(conn, slug, projection={"_id": True})
+    return row["_id"] if row else None
+
+
+async def get_places_by_ids(
+    conn: AsyncIOMotorClient, place_ids: List[ObjectId]
+) -> List[dict]:
+    rows = get_collection(conn, place_collection_name, LISTING).find(
+        {"_id": {"$in": place_ids}, **NOT_DELETED}, **find_options(conn, LISTING)
+    )
+    return [row async for row in rows]
+
+
+def find_places(
+    conn: AsyncIOMotorClient, query: dict, limit: int, offset: int
+) -> AsyncIOMotorCursor:
+    return get_collection(conn, place_collection_name, LISTING).find(
+        {**query, **NOT_DELETED},
+        sort=[("_id", DESCENDING)],
+        limit=limit,
+        skip=offset,
+        **find_options(conn, LISTING),
+    )
+
+
+def iterate_places(
+    conn: AsyncIOMotorClient, after: Optional[ObjectId], batch_size: int
+) -> AsyncIOMotorCursor:
+    return get_collection(conn, place_collection_name, EXPORT).find(
+        {"_id": {"$gt": after}, **NOT_DELETED} if after else NOT_DELETED,
+        sort=[("_id", 1)],
+        batch_size=batch_size,
+        **find_options(conn, EXPORT),
+    )
+
+
+async def find_existing_slugs(conn: AsyncIOMotorClient, slugs: List[str]) -> Set[str]:
+    rows = get_collection(conn, place_collection_name, READ).find(
+        {"slug": {"$in": slugs}},
+        projection={"_id": False, "slug": True},
+        **find_options(conn, READ),
+    )
+    return {row["slug"] async for row in rows}
+
+
+async def increment_favorites_count(
+    conn: AsyncIOMotorClient, place_id: ObjectId, delta: int
+) -> Optional[dict]:
+    """
+    Add `delta` to the stored favorites count, returns the place as updated.
+    """
+    return await get_collection(
+        conn, place_collection_name, COUNTER_WRITE
+    ).find_one_and_update(
+        {"_id": place_id},
+        {"$inc": {"favorites_count": delta}},
+        return_document=ReturnDocument.AFTER,
+        **write_options(conn),
+    )
+
+
+async def insert_place(conn: AsyncIOMotorClient, place_doc: dict) -> ObjectId:
+    result = await get_collection(conn, place_collection_name, WRITE).insert_one(
+        place_doc, **write_options(conn)
+    )
+    return result.inserted_id
+
+
+async def insert_places(
+    conn: AsyncIOMotorClient, place_docs: List[dict]
+) -> Dict[int, str]:
+    """
+    Unordered bulk insert, returns error messages by position of the failed documents.
+    """
+    try:
+        await get_collection(conn, place_collection_name, WRITE).bulk_write(
+            [InsertOne(doc) for doc in place_docs], ordered=False, **write_options(conn)
+        )
+    except BulkWriteError as exc:
+        return {error["index"]: error["errmsg"] for error in exc.details["writeErrors"]}
+    return {}
+
+
+async def update_place(
+    conn: AsyncIOMotorClient,
+    slug: str,
+    author_id: str,
+    fields: dict,
+    version: Optional[int] = None,
+) -> Optional[dict]:
+    """
+    Set `fields` on the author's place, returns it as updated or None when it
+    is missing, someone else's or no longer at `version`.
+    """
+    query, update = versioned_update(
+        {"slug": slug, "author_id": author_id, **NOT_DELETED}, fields, version
+    )
+    return await get_collection(
+        conn, place_collection_name, WRITE
+    ).find_one_and_update(
+        query, update, return_document=ReturnDocument.AFTER, **write_options(conn)
+    )
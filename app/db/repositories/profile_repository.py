@@ -1,12 +1,52 @@
-from typing import Optional, List
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from starlette.exceptions import HTTPException
 from starlette.status import HTTP_404_NOT_FOUND
 
-from .user_repository import get_user
+from .follower_repository import (
+    add_follower,
+    find_followings,
+    get_followed_usernames,
+    is_following,
+    remove_follower,
+)
+from .user_repository import find_users, get_user_row
+from ..cache import LocalCache
 from ...db.mongodb import AsyncIOMotorClient
-from ...core.config import database_name, followers_collection_name
-from ...models.profile import Profile
+from ...core.config import users_collection_name
+from ...core.http_cache import CacheValidators, make_etag
+from ...models.profile import Profile, ProfileCounters, ProfileWithCounters
+
+
+profile_cache = LocalCache("profiles", [users_collection_name])
+
+
+async def _load_profile(
+    conn: AsyncIOMotorClient, username: str
+) -> Optional[Tuple[str, Profile, ProfileCounters]]:
+    row = await get_user_row(
+        conn,
+        username,
+        projection={"username": True, "bio": True, "image": True, "counters": True},
+    )
+    if row:
+        counters = ProfileCounters.from_db(row.get("counters"))
+        return row["_id"], Profile.from_db(row), counters
+
+
+async def _get_cached_profile(
+    conn: AsyncIOMotorClient, target_username: str
+) -> Tuple[str, Profile, ProfileCounters]:
+    cached = await profile_cache.get_or_load(
+        target_username,
+        lambda: _load_profile(conn, target_username),
+        depends_on=lambda row: [(users_collection_name, row[0])],
+    )
+    if not cached:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND, detail=f"User {target_username} not found"
+        )
+    return cached
 
 
 async def get_profile_by_username(
@@ -14,13 +54,9 @@ async def get_profile_by_username(
     target_username: str,
     current_username: Optional[str] = None,
 ) -> Profile:
-    user = await get_user(conn, target_username)
-    if not user:
-        raise HTTPException(
-            status_code=HTTP_404_NOT_FOUND, detail=f"User {target_username} not found"
-        )
+    _, cached_profile, _ = await _get_cached_profile(conn, target_username)
 
-    profile = Profile(**user.dict())
+    profile = cached_profile.copy()
     profile.following = await is_following_for_user(
         conn, current_username, target_username
     )
@@ -28,21 +64,68 @@ async def get_profile_by_username(
     return profile
 
 
+async def get_profile_with_counters(
+    conn: AsyncIOMotorClient,
+    target_username: str,
+    current_username: Optional[str] = None,
+) -> ProfileWithCounters:
+    _, profile, counters = await _get_cached_profile(conn, target_username)
+    following = (
+        await is_following_for_user(conn, current_username, target_username)
+        if current_username
+        else False
+    )
+    return ProfileWithCounters.from_db(
+        profile.dict(), following=following, counters=counters.copy()
+    )
+
+
+async def get_profiles_by_usernames(
+    conn: AsyncIOMotorClient,
+    usernames: Iterable[str],
+    current_username: Optional[str] = None,
+) -> Dict[str, Profile]:
+    usernames = list(set(usernames))
+    rows = find_users(
+        conn,
+        usernames,
+        projection={"_id": False, "username": True, "bio": True, "image": True},
+    )
+    profiles = {row["username"]: Profile.from_db(row) async for row in rows}
+
+    if current_username and profiles:
+        followed = await get_followed_usernames(conn, current_username, list(profiles))
+        for username in followed:
+            profiles[username].following = True
+
+    return profiles
+
+
+def get_profile_validators(profile: ProfileWithCounters) -> CacheValidators:
+    """
+    From the profile as served, the cached user row and the viewer's follow,
+    so a separate read cannot find a newer user than the body shows.
+    """
+    # counters move without touching updated_at, only the etag notices
+    return CacheValidators(
+        etag=make_etag(
+            profile.username,
+            profile.bio,
+            profile.image,
+            profile.following,
+            *profile.counters.dict().values(),
+        )
+    )
+
+
 async def is_following_for_user(
     conn: AsyncIOMotorClient, current_username: str, target_username: str
 ) -> bool:
-    count = await conn[database_name][followers_collection_name].count_documents(
-        {"follower": current_username, "following": target_username}
-    )
-    return count > 0
+    return await is_following(conn, current_username, target_username)
 
 
-async def get_followings(
-    conn: AsyncIOMotorClient, username: str
-) -> List[Profile]:
-    cursor = conn[database_name][followers_collection_name].find(
-        {"follower": username}
-    )
+async def get_followings(conn: AsyncIOMotorClient, username: str) -> List[Profile]:
+    cursor = find_followings(conn, username)
 
     result: List[Profile] = []
     async for item in cursor:
@@ -59,15 +142,11 @@ async def get_followings(
 
 async def follow_for_user(
     conn: AsyncIOMotorClient, current_username: str, target_username: str
-):
-    await conn[database_name][followers_collection_name].insert_one(
-        {"follower": current_username, "following": target_username}
-    )
+) -> bool:
+    return await add_follower(conn, current_username, target_username)
 
 
 async def unfollow_user(
     conn: AsyncIOMotorClient, current_username: str, target_username: str
-):
-    await conn[database_name][followers_collection_name].delete_many(
-        {"follower": current_username, "following": target_username}
-    )
+) -> int:
+    return await remove_follower(conn, current_username, target_username)
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from pymongo import ReturnDocument
+
+from .base import COUNTER_WRITE, READ, find_options, get_collection, write_options
+from ...core.config import rate_limits_collection_name
+from ...db.mongodb import AsyncIOMotorClient
+
+
+async def add_to_window(
+    conn: AsyncIOMotorClient, key: str, cost: int, expires_at: datetime
+) -> int:
+    row = await get_collection(
+        conn, rate_limits_collection_name, COUNTER_WRITE
+    ).find_one_and_update(
+        {"_id": key},
+        {"$inc": {"count": cost}, "$setOnInsert": {"expires_at": expires_at}},
+        projection={"_id": False, "count": True},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        **write_options(conn),
+    )
+    return row["count"]
+
+
+async def get_window_count(conn: AsyncIOMotorClient, key: str) -> int:
+    row = await get_collection(conn, rate_limits_collection_name, READ).find_one(
+        {"_id": key},
+        projection={"_id": False, "count": True},
+        **find_options(conn, READ),
+    )
+    return row["count"] if row else 0
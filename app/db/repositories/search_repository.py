@@ -0,0 +1,46 @@
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import DESCENDING
+
+from .base import LISTING, NOT_DELETED, command_options, get_collection
+from ...db.mongodb import AsyncIOMotorClient
+
+
+async def search_rows(
+    conn: AsyncIOMotorClient,
+    collection_name: str,
+    text: str,
+    filters: dict,
+    after: Optional[Tuple[float, ObjectId]],
+    limit: int,
+) -> List[dict]:
+    """
+    Rows matching `text` by descending relevance, each with its `score`.
+    `after` is the (score, _id) of the last row of the previous page.
+    """
+    pipeline = [
+        {"$match": {"$text": {"$search": text}, **filters, **NOT_DELETED}},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+    ]
+    if after:
+        score, last_id = after
+        pipeline.append(
+            {
+                "$match": {
+                    "$or": [
+                        {"score": {"$lt": score}},
+                        {"score": score, "_id": {"$lt": last_id}},
+                    ]
+                }
+            }
+        )
+    # the text index cannot sort, this sorts the matches only
+    pipeline += [
+        {"$sort": {"score": DESCENDING, "_id": DESCENDING}},
+        {"$limit": limit},
+    ]
+    rows = get_collection(conn, collection_name, LISTING).aggregate(
+        pipeline, **command_options(conn, LISTING)
+    )
+    return [row async for row in rows]
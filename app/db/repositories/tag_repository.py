@@ -0,0 +1,44 @@
+from typing import Iterable, List
+
+from motor.motor_asyncio import AsyncIOMotorCursor
+from pymongo import ASCENDING, UpdateOne
+
+from .base import LISTING, READ, WRITE, find_options, get_collection, write_options
+from ...core.config import tags_collection_name
+from ...db.mongodb import AsyncIOMotorClient
+
+
+def find_tags(conn: AsyncIOMotorClient) -> AsyncIOMotorCursor:
+    return get_collection(conn, tags_collection_name, LISTING).find(
+        sort=[("tag", ASCENDING)], **find_options(conn, LISTING)
+    )
+
+
+async def get_tag_names(conn: AsyncIOMotorClient) -> List[str]:
+    rows = get_collection(conn, tags_collection_name, LISTING).find(
+        {},
+        projection={"_id": False, "tag": True},
+        sort=[("tag", ASCENDING)],
+        **find_options(conn, LISTING),
+    )
+    return [row["tag"] async for row in rows]
+
+
+async def get_tag_list(
+    conn: AsyncIOMotorClient, collection_name: str, slug: str
+) -> List[str]:
+    row = await get_collection(conn, collection_name, READ).find_one(
+        {"slug": slug}, projection={"tag_list": True}, **find_options(conn, READ)
+    )
+    return row["tag_list"]
+
+
+async def upsert_tags(conn: AsyncIOMotorClient, tags: Iterable[str]):
+    requests = [
+        UpdateOne({"tag": tag}, {"$setOnInsert": {"tag": tag}}, upsert=True)
+        for tag in set(tags)
+    ]
+    if requests:
+        await get_collection(conn, tags_collection_name, WRITE).bulk_write(
+            requests, ordered=False, **write_options(conn)
+        )
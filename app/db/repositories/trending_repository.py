@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from .base import READ, WRITE, find_options, get_collection, write_options
+from ...core.config import trending_collection_name
+from ...db.mongodb import AsyncIOMotorClient
+
+
+async def claim_run(
+    conn: AsyncIOMotorClient, name: str, now: datetime, next_run_at: datetime
+) -> bool:
+    """
+    Whether this worker gets to compute ranking `name`, which no other worker
+    will do again before `next_run_at`.
+    """
+    try:
+        await get_collection(conn, trending_collection_name, WRITE).update_one(
+            {"_id": name, "next_run_at": {"$lte": now}},
+            {"$set": {"next_run_at": next_run_at}},
+            upsert=True,
+            **write_options(conn),
+        )
+    except DuplicateKeyError:
+        # the ranking exists and is not due, the upsert tried to create it again
+        return False
+    return True
+
+
+async def save_ranking(
+    conn: AsyncIOMotorClient, name: str, ranking: List[dict], computed_at: datetime
+):
+    await get_collection(conn, trending_collection_name, WRITE).update_one(
+        {"_id": name},
+        {"$set": {"ranking": ranking, "computed_at": computed_at}},
+        **write_options(conn),
+    )
+
+
+async def get_ranking(conn: AsyncIOMotorClient, name: str) -> Optional[dict]:
+    return await get_collection(conn, trending_collection_name, READ).find_one(
+        {"_id": name}, **find_options(conn, READ)
+    )
@@ -1,29 +1,85 @@
+from datetime import datetime
+from typing import List, Optional
+
 from bson.objectid import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCursor
 from pydantic import EmailStr
+from pymongo import ReturnDocument
+
+from .base import (
+    LISTING,
+    NOT_DELETED,
+    READ,
+    USER_WRITE,
+    find_options,
+    get_collection,
+    versioned_update,
+    write_options,
+)
+from ..cache import evict
+from ...core.security import generate_salt, get_password_hash
 from ...models.user import UserInCreate, UserInDB, UserInUpdate
 from ...db.mongodb import AsyncIOMotorClient
-from ...core.config import database_name, users_collection_name
+from ...core.config import users_collection_name
 
 
-async def get_user(conn: AsyncIOMotorClient, username: str) -> UserInDB:
-    row = await conn[database_name][users_collection_name].find_one(
-        {"username": username}
+async def get_user_row(
+    conn: AsyncIOMotorClient,
+    username: str,
+    projection: dict = None,
+    include_deleted: bool = False,
+) -> Optional[dict]:
+    query = {"username": username}
+    if not include_deleted:
+        query.update(NOT_DELETED)
+    return await get_collection(conn, users_collection_name, READ).find_one(
+        query, projection=projection, **find_options(conn, READ)
     )
+
+
+async def get_user_id(conn: AsyncIOMotorClient, username: str) -> Optional[ObjectId]:
+    row = await get_user_row(conn, username, projection={"_id": True})
+    return row["_id"] if row else None
+
+
+def find_users(
+    conn: AsyncIOMotorClient, usernames: List[str], projection: dict = None
+) -> AsyncIOMotorCursor:
+    return get_collection(conn, users_collection_name, LISTING).find(
+        {"username": {"$in": usernames}, **NOT_DELETED},
+        projection=projection,
+        **find_options(conn, LISTING),
+    )
+
+
+async def get_user(
+    conn: AsyncIOMotorClient, username: str, include_deleted: bool = False
+) -> UserInDB:
+    row = await get_user_row(conn, username, include_deleted=include_deleted)
     if row:
-        return UserInDB(**row)
+        return UserInDB.from_db(row)
 
 
-async def get_user_by_email(conn: AsyncIOMotorClient, email: EmailStr) -> UserInDB:
-    row = await conn[database_name][users_collection_name].find_one({"email": email})
+async def get_user_by_email(
+    conn: AsyncIOMotorClient, email: EmailStr, include_deleted: bool = False
+) -> UserInDB:
+    query = {"email": email}
+    if not include_deleted:
+        query.update(NOT_DELETED)
+    row = await get_collection(conn, users_collection_name, READ).find_one(
+        query, **find_options(conn, READ)
+    )
     if row:
-        return UserInDB(**row)
+        return UserInDB.from_db(row)
 
 
 async def create_user(conn: AsyncIOMotorClient, user: UserInCreate) -> UserInDB:
     dbuser = UserInDB(**user.dict())
     dbuser.change_password(user.password)
 
-    row = await conn[database_name][users_collection_name].insert_one(dbuser.dict())
+    row = await get_collection(conn, users_collection_name, USER_WRITE).insert_one(
+        dbuser.dict(), **write_options(conn)
+    )
 
     dbuser.id = row.inserted_id
     dbuser.created_at = ObjectId(dbuser.id).generation_time
@@ -34,18 +90,31 @@ async def create_user(conn: AsyncIOMotorClient, user: UserInCreate) -> UserInDB:
 
 async def update_user(
     conn: AsyncIOMotorClient, username: str, user: UserInUpdate
-) -> UserInDB:
-    dbuser = await get_user(conn, username)
-
-    dbuser.username = user.username or dbuser.username
-    dbuser.email = user.email or dbuser.email
-    dbuser.bio = user.bio or dbuser.bio
-    dbuser.image = user.image or dbuser.image
+) -> Optional[UserInDB]:
+    """
+    Set the given fields on `username`, returns the user as updated or None when
+    it is missing or no longer at `user.version`. The username itself is kept.
+    """
+    fields = {
+        name: value
+        for name, value in user.dict(
+            exclude={"username", "password", "version"}
+        ).items()
+        if value
+    }
     if user.password:
-        dbuser.change_password(user.password)
+        fields["salt"] = generate_salt()
+        fields["hashed_password"] = get_password_hash(fields["salt"] + user.password)
+    fields["updated_at"] = datetime.utcnow()
 
-    updated_at = await conn[database_name][users_collection_name].update_one(
-        {"username": dbuser.username}, {"$set": dbuser.dict()}
+    query, update = versioned_update(
+        {"username": username, **NOT_DELETED}, fields, user.version
     )
-    dbuser.updated_at = updated_at
-    return dbuser
+    row = await get_collection(
+        conn, users_collection_name, USER_WRITE
+    ).find_one_and_update(
+        query, update, return_document=ReturnDocument.AFTER, **write_options(conn)
+    )
+    if row:
+        evict(users_collection_name, row["_id"])
+        return UserInDB.from_db(row)
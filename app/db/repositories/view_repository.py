@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Dict, Tuple
+
+from bson import ObjectId
+from pymongo import DESCENDING, UpdateOne
+
+from .base import (
+    COUNTER_WRITE,
+    LISTING,
+    command_options,
+    get_collection,
+    write_options,
+)
+from ...core.config import views_collection_name
+from ...db.mongodb import AsyncIOMotorClient
+
+
+async def add_views(
+    conn: AsyncIOMotorClient,
+    counts: Dict[Tuple[str, ObjectId], int],
+    day: datetime,
+):
+    """
+    Add view counts by (collection name, document id) to the counters of `day`.
+    """
+    await get_collection(conn, views_collection_name, COUNTER_WRITE).bulk_write(
+        [
+            UpdateOne(
+                {"collection": collection_name, "day": day, "target_id": target_id},
+                {"$inc": {"count": count}},
+                upsert=True,
+            )
+            for (collection_name, target_id), count in counts.items()
+        ],
+        ordered=False,
+        **write_options(conn),
+    )
+
+
+async def get_view_scores(
+    conn: AsyncIOMotorClient,
+    collection_name: str,
+    since: datetime,
+    now: datetime,
+    half_life_hours: float,
+    limit: int,
+) -> Dict[ObjectId, float]:
+    """
+    Views since `since` by document, each one worth half as much every
+    `half_life_hours`.
+    """
+    age_ms = {"$subtract": [now, "$day"]}
+    decay = {"$pow": [0.5, {"$divide": [age_ms, half_life_hours * 3600 * 1000]}]}
+    rows = get_collection(conn, views_collection_name, LISTING).aggregate(
+        [
+            {"$match": {"collection": collection_name, "day": {"$gte": since}}},
+            {
+                "$group": {
+                    "_id": "$target_id",
+                    "score": {"$sum": {"$multiply": ["$count", decay]}},
+                }
+            },
+            {"$sort": {"score": DESCENDING}},
+            {"$limit": limit},
+        ],
+        **command_options(conn, LISTING),
+    )
+    return {row["_id"]: row["score"] async for row in rows}
@@ -0,0 +1,59 @@
+import asyncio
+from contextvars import ContextVar, copy_context
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from ..core.tracing import current_span, current_trace
+from .causal import causal_state
+from .monitoring import query_log
+
+T = TypeVar("T")
+
+# set for GET requests by core.causal.shared_loads_middleware; any other request
+# may read what it just wrote and always loads on its own
+shared_loads: ContextVar[bool] = ContextVar("shared_loads", default=False)
+
+
+def _detach():
+    # the queries of a shared load are no single request's
+    query_log.set(None)
+    current_trace.set(None)
+    current_span.set(None)
+
+
+class SingleFlight:
+    """
+    Concurrent loads of the same key share one execution instead of each
+    querying Mongo.
+
+    The load runs as its own task, so a caller that goes away does not cancel
+    it for the others. Only GET requests without a causal token share loads,
+    and only with those reading from the same members.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> T:
+        state = causal_state.get()
+        if not shared_loads.get() or (state is not None and state.token is not None):
+            return await load()
+        key = (key, state is not None and state.secondary_reads)
+
+        flight = self._flights.get(key)
+        if flight is None:
+            context = copy_context()
+            context.run(_detach)
+            flight = context.run(asyncio.ensure_future, load())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda done: self._land(key, done))
+        return await asyncio.shield(flight)
+
+    def _land(self, key: Hashable, flight: asyncio.Future):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # every caller may have been cancelled, don't log the error as unhandled
+        if not flight.cancelled():
+            flight.exception()
@@ -0,0 +1,43 @@
+import logging
+from collections import Counter
+from datetime import datetime
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+from .repositories import view_repository
+
+
+class ViewBuffer:
+    """
+    Views counted in memory and written in one unordered bulk write per flush,
+    instead of one update per request.
+    """
+
+    def __init__(self):
+        self._counts: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def add(self, collection_name: str, document_id: ObjectId):
+        self._counts[(collection_name, document_id)] += 1
+
+    async def flush(self, conn: AsyncIOMotorClient):
+        if not self._counts:
+            return
+        # views added while the write is in flight go into the next flush
+        counts, self._counts = self._counts, Counter()
+        now = datetime.utcnow()
+        day = datetime(now.year, now.month, now.day)
+        try:
+            await view_repository.add_views(conn, counts, day)
+        except PyMongoError:
+            # keep them for the next flush, an update that did land is counted twice
+            self._counts.update(counts)
+            logging.warning("Writing %d view counters failed", len(counts))
+            raise
+
+
+view_buffer = ViewBuffer()
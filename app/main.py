@@ -1,10 +1,26 @@
 from fastapi import FastAPI
 from starlette.exceptions import HTTPException
+from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.cors import CORSMiddleware
 from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
 
 from .api.api_v1.api import router as api_router
-from .core.config import ALLOWED_HOSTS, API_V1_STR, PROJECT_NAME
+from .api.health import router as health_router
+from .core.causal import causal_consistency_middleware, shared_loads_middleware
+from .core.config import (
+    ALLOWED_HOSTS,
+    API_V1_STR,
+    CAUSAL_READS,
+    CAUSAL_TOKEN_HEADER,
+    PROJECT_NAME,
+    RATE_LIMIT_ENABLED,
+)
+from .core.metrics import metrics, metrics_middleware
+from .core.query_budget import query_budget_middleware
+from .core.rate_limit import rate_limit_middleware
+from .core.scheduler import start_periodic_tasks, stop_periodic_tasks
+from .core.tracing import tracing_middleware
+from .core.warmup import cool_down, warm_up
 from .core.errors import http_422_error_handler, http_error_handler
 from .db.mongodb_utils import close_mongo_connection, connect_to_mongo
 
@@ -13,18 +29,45 @@ app = FastAPI(title=PROJECT_NAME)
 if not ALLOWED_HOSTS:
     ALLOWED_HOSTS = ["*"]
 
+app.add_middleware(BaseHTTPMiddleware, dispatch=query_budget_middleware)
+
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(BaseHTTPMiddleware, dispatch=rate_limit_middleware)
+
+app.add_middleware(BaseHTTPMiddleware, dispatch=tracing_middleware)
+app.add_middleware(BaseHTTPMiddleware, dispatch=metrics_middleware)
+
+app.add_middleware(BaseHTTPMiddleware, dispatch=shared_loads_middleware)
+
+if CAUSAL_READS:
+    app.add_middleware(BaseHTTPMiddleware, dispatch=causal_consistency_middleware)
+
+# added last so it wraps everything, responses of the middlewares included
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_HOSTS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        CAUSAL_TOKEN_HEADER,
+        "X-Query-Count",
+        "X-Query-Time",
+        "Server-Timing",
+        "Retry-After",
+    ],
 )
 
 app.add_event_handler("startup", connect_to_mongo)
+app.add_event_handler("startup", warm_up)
+app.add_event_handler("startup", start_periodic_tasks)
+app.add_event_handler("shutdown", cool_down)
+app.add_event_handler("shutdown", stop_periodic_tasks)
 app.add_event_handler("shutdown", close_mongo_connection)
 
 app.add_exception_handler(HTTPException, http_error_handler)
 app.add_exception_handler(HTTP_422_UNPROCESSABLE_ENTITY, http_422_error_handler)
 
 app.include_router(api_router, prefix=API_V1_STR)
+app.include_router(health_router)
+app.add_route("/metrics", metrics, include_in_schema=False)
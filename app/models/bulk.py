@@ -0,0 +1,18 @@
+from typing import List, Optional
+
+from pydantic import Field
+
+from .rwmodel import RWModel
+
+
+class BulkItemResult(RWModel):
+    index: int
+    status: str
+    slug: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkResultInResponse(RWModel):
+    results: List[BulkItemResult]
+    created_count: int = Field(..., alias="createdCount")
+    failed_count: int = Field(..., alias="failedCount")
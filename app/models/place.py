@@ -32,6 +32,8 @@ class Place(DateTimeModelMixin, PlaceBase):
     author: Profile
     favorited: bool
     favorites_count: int = Field(..., alias="favoritesCount")
+    # bumped by every update, documents written before it existed are at 0
+    version: int = 0
 
 
 class PlaceInDB(DBModelMixin, Place):
@@ -56,3 +58,5 @@ class PlaceInUpdate(RWModel):
     description: Optional[str] = None
     body: Optional[str] = None
     tag_list: List[str] = Field([], alias="tagList")
+    # the version the change was made on, a concurrent update makes it fail
+    version: Optional[int] = None
@@ -39,6 +39,8 @@ class Post(DateTimeModelMixin, PostBase):
     author: Profile
     liked: bool
     likes_count: int = Field(..., alias="likesCount")
+    # bumped by every update, documents written before it existed are at 0
+    version: int = 0
 
 
 class PostInDB(DBModelMixin, Post):
@@ -64,3 +66,5 @@ class PostInUpdate(RWModel):
     description: Optional[str] = None
     body: Optional[str] = None
     tag_list: List[str] = Field([], alias="tagList")
+    # the version the change was made on, a concurrent update makes it fail
+    version: Optional[int] = None
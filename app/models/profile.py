@@ -12,8 +12,20 @@ class Profile(RWModel):
     following: bool = False
 
 
+class ProfileCounters(RWModel):
+    places: int = 0
+    posts: int = 0
+    favorites: int = 0
+    followers: int = 0
+    followings: int = 0
+
+
+class ProfileWithCounters(Profile):
+    counters: ProfileCounters = ProfileCounters()
+
+
 class ProfileInResponse(RWModel):
-    profile: Profile
+    profile: ProfileWithCounters
 
 
 class ProfilesInResponse(RWModel):
@@ -7,9 +7,25 @@ from pydantic import BaseConfig, BaseModel
 class RWModel(BaseModel):
     class Config(BaseConfig):
         allow_population_by_alias = True
+        allow_population_by_field_name = True
         json_encoders = {
             datetime: lambda dt: dt.replace(tzinfo=timezone.utc)
             .isoformat()
             .replace("+00:00", "Z"),
             ObjectId: lambda x: str(x),
         }
+
+    @classmethod
+    def from_db(cls, row: dict = None, **values):
+        """
+        Build model from a row we wrote ourselves without running validation.
+        Request bodies must keep using the regular (validating) constructor.
+        """
+        data = {**row, **values} if row else values
+        fields = {}
+        for name, field in cls.__fields__.items():
+            if field.alias in data:
+                fields[name] = data[field.alias]
+            elif name in data:
+                fields[name] = data[name]
+        return cls.construct(**fields)
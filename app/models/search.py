@@ -0,0 +1,20 @@
+from enum import Enum
+from typing import Optional
+
+from pydantic import Field
+
+from .place import ManyPlacesInResponse
+from .post import ManyPostsInResponse
+
+
+class SearchType(str, Enum):
+    PLACES = "places"
+    POSTS = "posts"
+
+
+class PlaceSearchInResponse(ManyPlacesInResponse):
+    next_cursor: Optional[str] = Field(None, alias="nextCursor")
+
+
+class PostSearchInResponse(ManyPostsInResponse):
+    next_cursor: Optional[str] = Field(None, alias="nextCursor")
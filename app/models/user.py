@@ -12,6 +12,8 @@ class UserBase(RWModel):
     email: EmailStr
     bio: Optional[str] = ""
     image: Optional[AnyUrl] = None
+    # bumped by every update, documents written before it existed are at 0
+    version: int = 0
 
 
 class UserInDB(DBModelMixin, UserBase):
@@ -49,3 +51,5 @@ class UserInUpdate(RWModel):
     password: Optional[str] = None
     bio: Optional[str] = None
     image: Optional[AnyUrl] = None
+    # the version the change was made on, a concurrent update makes it fail
+    version: Optional[int] = None
@@ -26,7 +26,8 @@ class ObjID(str):
 
     @classmethod
     def validate(cls, v):
-        bsoid = ObjectId()
-        if not bsoid.is_valid(str(v)):
-            return ValueError(f"Must be ObjectId: {v}")
+        if isinstance(v, ObjectId):
+            return v
+        if not ObjectId.is_valid(str(v)):
+            raise ValueError(f"Must be ObjectId: {v}")
         return ObjectId(str(v))
@@ -6,8 +6,10 @@ from .user import get_user_by_email
 from ..models.user import UserInLogin, UserInResponse, User
 from ..core.config import ACCESS_TOKEN_EXPIRE_MINUTES
 from ..core.jwt import create_access_token
+from ..core.tracing import traced
 
 
+@traced
 async def authentication_service(request: UserInLogin, conn: AsyncIOMotorClient):
     user = await get_user_by_email(conn, request.email)
     if not user or not user.check_password(request.password):
@@ -0,0 +1,111 @@
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterator, List, Set, Type
+
+from pydantic import ValidationError
+
+from ..db.mongodb import AsyncIOMotorClient
+from ..models.bulk import BulkItemResult, BulkResultInResponse
+from ..models.rwmodel import RWModel
+from .jobs import UPSERT_TAGS, enqueue
+from .slugs import slug_candidates
+from ..core.tracing import traced
+
+CREATED = "created"
+FAILED = "failed"
+DUPLICATE_KEY = "E11000"
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors()
+    )
+
+
+@traced
+async def create_by_slug_in_bulk(
+    conn: AsyncIOMotorClient,
+    model: Type[RWModel],
+    items: List[dict],
+    username: str,
+    *,
+    find_existing_slugs: Callable[[AsyncIOMotorClient, List[str]], Awaitable[Set[str]]],
+    insert_all: Callable[[AsyncIOMotorClient, List[dict]], Awaitable[Dict[int, str]]],
+) -> BulkResultInResponse:
+    """
+    Validate and insert `items`, each under the first free candidate of
+    `slugs.slug_candidates` for its title, the way single creates pick one.
+    Slugs taken by an earlier item, a stored document or a concurrent write
+    move the item on to its next candidate, so every round costs one lookup
+    and one unordered bulk write.
+    """
+    results: Dict[int, BulkItemResult] = {}
+    pending: Dict[int, dict] = {}
+    candidates: Dict[int, Iterator[str]] = {}
+
+    for index, item in enumerate(items):
+        try:
+            validated = model(**item)
+        except ValidationError as exc:
+            results[index] = BulkItemResult(
+                index=index, status=FAILED, error=_validation_message(exc)
+            )
+            continue
+
+        doc = validated.dict()
+        doc["author_id"] = username
+        pending[index] = doc
+        candidates[index] = slug_candidates(validated.title)
+
+    claimed: Set[str] = set()
+    tags = set()
+    while pending:
+        for index, doc in list(pending.items()):
+            slug = next((s for s in candidates[index] if s not in claimed), None)
+            if slug is None:
+                del pending[index]
+                results[index] = BulkItemResult(
+                    index=index,
+                    status=FAILED,
+                    error=f"No free slug left for '{doc['title']}'",
+                )
+                continue
+            doc["slug"] = slug
+            claimed.add(slug)
+
+        existing = await find_existing_slugs(
+            conn, [doc["slug"] for doc in pending.values()]
+        )
+        batch = [(i, doc) for i, doc in pending.items() if doc["slug"] not in existing]
+        now = datetime.utcnow()
+        for _, doc in batch:
+            doc["updated_at"] = now
+
+        failed_positions = (
+            await insert_all(conn, [doc for _, doc in batch]) if batch else {}
+        )
+
+        for position, (index, doc) in enumerate(batch):
+            error = failed_positions.get(position)
+            if error and error.startswith(DUPLICATE_KEY):
+                # written concurrently, stays pending for its next candidate
+                continue
+            del pending[index]
+            if error:
+                results[index] = BulkItemResult(
+                    index=index, status=FAILED, slug=doc["slug"], error=error
+                )
+            else:
+                results[index] = BulkItemResult(
+                    index=index, status=CREATED, slug=doc["slug"]
+                )
+                tags.update(doc["tag_list"])
+
+    if tags:
+        await enqueue(conn, UPSERT_TAGS, {"tags": sorted(tags)})
+
+    created_count = sum(result.status == CREATED for result in results.values())
+    return BulkResultInResponse(
+        results=[results[index] for index in sorted(results)],
+        created_count=created_count,
+        failed_count=len(results) - created_count,
+    )
@@ -3,35 +3,35 @@ from typing import List, Optional
 
 from ..models.comment import CommentInCreate, CommentInDB
 from ..db.mongodb import AsyncIOMotorClient
-from ..core.config import comments_collection_name, database_name
+from ..db.repositories import comment_repository
 from .profile import get_profile_service
+from ..core.tracing import traced
 
 
+@traced
 async def get_comments(
     conn: AsyncIOMotorClient, slug: str, username: Optional[str] = None
 ) -> List[CommentInDB]:
     comments: List[CommentInDB] = []
-    rows = conn[database_name][comments_collection_name].find(
-        {"slug": slug},  # "username": username
-    )
+    rows = comment_repository.find_comments(conn, slug)
     async for row in rows:
         author = await get_profile_service(conn, username=row["username"])
-        comments.append(CommentInDB(**row, author=author.profile))
+        comments.append(CommentInDB.from_db(row, author=author.profile))
     return comments
 
 
+@traced
 async def create_comment(
     conn: AsyncIOMotorClient, slug: str, comment: CommentInCreate, username: str
 ) -> CommentInDB:
     comment_doc = comment.dict()
     comment_doc["slug"] = slug
     comment_doc["username"] = username
-    await conn[database_name][comments_collection_name].insert_one(comment_doc)
+    await comment_repository.insert_comment(conn, comment_doc)
     author = await get_profile_service(conn, username=username)
-    return CommentInDB(**comment_doc, author=author.profile)
+    return CommentInDB.from_db(comment_doc, author=author.profile)
 
 
+@traced
 async def delete_comment(conn: AsyncIOMotorClient, id: int, username: str):
-    await conn[database_name][comments_collection_name].delete_many(
-        {"_id": id, "username": username}
-    )
+    await comment_repository.delete_comment(conn, id, username)
@@ -0,0 +1,96 @@
+import asyncio
+from typing import Dict
+
+from bson import ObjectId
+
+from ..core.config import (
+    EXPORT_BATCH_SIZE,
+    favorites_collection_name,
+    followers_collection_name,
+    likes_collection_name,
+    place_collection_name,
+    post_collection_name,
+)
+from ..core.tracing import traced
+from ..db.mongodb import AsyncIOMotorClient
+from ..db.repositories.counter_repository import (
+    COUNTERS,
+    count_by,
+    iterate_stored_counts,
+    iterate_user_counters,
+    set_counters,
+    set_stored_counts,
+)
+
+
+@traced
+async def reconcile_counters(
+    conn: AsyncIOMotorClient, batch_size: int = EXPORT_BATCH_SIZE
+) -> int:
+    """
+    Recount what the counters on user documents and the favorite and like
+    counts on places and posts track and overwrite the ones that drifted,
+    returns how many documents were repaired. Writes landing while it runs may
+    be counted or not, run it again if in doubt.
+    """
+    places, posts, favorites, followers, followings = await asyncio.gather(
+        count_by(conn, place_collection_name, "author_id"),
+        count_by(conn, post_collection_name, "author_id"),
+        count_by(conn, favorites_collection_name, "user_id"),
+        count_by(conn, followers_collection_name, "following"),
+        count_by(conn, followers_collection_name, "follower"),
+    )
+    favorites_by_place, likes_by_post = await asyncio.gather(
+        count_by(conn, favorites_collection_name, "place_id"),
+        count_by(conn, likes_collection_name, "post_id"),
+    )
+
+    repaired = 0
+    fixes: Dict[ObjectId, Dict[str, int]] = {}
+    async for row in iterate_user_counters(conn):
+        username = row["username"]
+        expected = {
+            "places": places.get(username, 0),
+            "posts": posts.get(username, 0),
+            "favorites": favorites.get(row["_id"], 0),
+            "followers": followers.get(username, 0),
+            "followings": followings.get(username, 0),
+        }
+        stored = row.get("counters") or {}
+        if any(stored.get(name, 0) != expected[name] for name in COUNTERS):
+            fixes[row["_id"]] = expected
+        if len(fixes) == batch_size:
+            repaired += await set_counters(conn, fixes)
+            fixes = {}
+    if fixes:
+        repaired += await set_counters(conn, fixes)
+
+    repaired += await _reconcile_stored_counts(
+        conn, place_collection_name, "favorites_count", favorites_by_place, batch_size
+    )
+    repaired += await _reconcile_stored_counts(
+        conn, post_collection_name, "likes_count", likes_by_post, batch_size
+    )
+    return repaired
+
+
+async def _reconcile_stored_counts(
+    conn: AsyncIOMotorClient,
+    collection_name: str,
+    field: str,
+    expected: Dict[ObjectId, int],
+    batch_size: int,
+) -> int:
+    repaired = 0
+    fixes: Dict[ObjectId, int] = {}
+    async for row in iterate_stored_counts(conn, collection_name, field):
+        count = expected.get(row["_id"], 0)
+        # documents written before the count was stored have no field at all
+        if row.get(field) != count:
+            fixes[row["_id"]] = count
+        if len(fixes) == batch_size:
+            repaired += await set_stored_counts(conn, collection_name, field, fixes)
+            fixes = {}
+    if fixes:
+        repaired += await set_stored_counts(conn, collection_name, field, fixes)
+    return repaired
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from ..core.config import (
+    DELETION_BATCH_PAUSE,
+    DELETION_BATCH_SIZE,
+    DELETION_LEASE,
+    comments_collection_name,
+    favorites_collection_name,
+    followers_collection_name,
+    likes_collection_name,
+    place_collection_name,
+    post_collection_name,
+    users_collection_name,
+)
+from ..core.metrics import PURGED_DOCUMENTS
+from ..core.tracing import traced
+from ..db.mongodb import AsyncIOMotorClient
+from ..db.repositories import counter_repository, deletion_repository
+
+Batch = List[dict]
+
+
+async def _purge(
+    conn: AsyncIOMotorClient,
+    collection_name: str,
+    query: dict,
+    projection: Optional[dict] = None,
+    on_removed: Optional[Callable[[Batch], Awaitable]] = None,
+) -> int:
+    """
+    Remove everything matching `query` batch by batch, pausing in between so a
+    large purge leaves the primary to the requests. `on_removed` undoes the
+    counts the removed batch contributed to.
+    """
+    removed = 0
+    while True:
+        rows = await deletion_repository.find_dependents(
+            conn, collection_name, query, DELETION_BATCH_SIZE, projection
+        )
+        if not rows:
+            return removed
+        # removed first: a purge cut short leaves counts too high, never too low
+        deleted = await deletion_repository.delete_by_ids(
+            conn, collection_name, [row["_id"] for row in rows]
+        )
+        if on_removed and deleted == len(rows):
+            await on_removed(rows)
+        elif on_removed:
+            # someone else removed some of them and undid their counts, which
+            # ones is unknown; leave the rest too high for reconcile_counters
+            logging.warning(
+                "Purging %s removed %d of %d, counts left for reconcile_counters",
+                collection_name,
+                deleted,
+                len(rows),
+            )
+        removed += deleted
+        PURGED_DOCUMENTS.labels(collection_name).inc(deleted)
+        await asyncio.sleep(DELETION_BATCH_PAUSE)
+
+
+def _count(rows: Batch, field: str) -> Counter:
+    return Counter(row[field] for row in rows)
+
+
+async def _purge_place(conn: AsyncIOMotorClient, place: dict) -> int:
+    async def uncount_favorites(rows: Batch):
+        await counter_repository.increment_counters(
+            conn,
+            {
+                user_id: {"favorites": -n}
+                for user_id, n in _count(rows, "user_id").items()
+            },
+            key="_id",
+        )
+
+    return await _purge(
+        conn,
+        favorites_collection_name,
+        {"place_id": place["_id"]},
+        {"user_id": True},
+        uncount_favorites,
+    )
+
+
+async def _purge_post(conn: AsyncIOMotorClient, post: dict) -> int:
+    likes = await _purge(
+        conn, likes_collection_name, {"post_id": post["_id"]}, {"_id": True}
+    )
+    # the slug stays taken until the post itself is removed
+    comments = await _purge(
+        conn, comments_collection_name, {"slug": post["slug"]}, {"_id": True}
+    )
+    return likes + comments
+
+
+async def _purge_user(conn: AsyncIOMotorClient, user: dict) -> int:
+    username = user["username"]
+    # marked with the user already, this catches any written meanwhile; they are
+    # purged on their own, with what depends on them
+    now = datetime.utcnow()
+    marked = await deletion_repository.mark_deleted(
+        conn, place_collection_name, {"author_id": username}, now
+    )
+    marked += await deletion_repository.mark_deleted(
+        conn, post_collection_name, {"author_id": username}, now
+    )
+
+    async def uncount_favorites(rows: Batch):
+        await counter_repository.increment_stored_counts(
+            conn,
+            place_collection_name,
+            "favorites_count",
+            {place_id: -n for place_id, n in _count(rows, "place_id").items()},
+        )
+
+    async def uncount_likes(rows: Batch):
+        await counter_repository.increment_stored_counts(
+            conn,
+            post_collection_name,
+            "likes_count",
+            {post_id: -n for post_id, n in _count(rows, "post_id").items()},
+        )
+
+    async def uncount_followers(rows: Batch):
+        await counter_repository.increment_counters(
+            conn,
+            {name: {"followers": -n} for name, n in _count(rows, "following").items()},
+        )
+
+    async def uncount_followings(rows: Batch):
+        await counter_repository.increment_counters(
+            conn,
+            {name: {"followings": -n} for name, n in _count(rows, "follower").items()},
+        )
+
+    user_id = user["_id"]
+    removed = marked
+    removed += await _purge(
+        conn,
+        favorites_collection_name,
+        {"user_id": user_id},
+        {"place_id": True},
+        uncount_favorites,
+    )
+    removed += await _purge(
+        conn,
+        likes_collection_name,
+        {"user_id": user_id},
+        {"post_id": True},
+        uncount_likes,
+    )
+    removed += await _purge(
+        conn,
+        followers_collection_name,
+        {"follower": username},
+        {"following": True},
+        uncount_followers,
+    )
+    removed += await _purge(
+        conn,
+        followers_collection_name,
+        {"following": username},
+        {"follower": True},
+        uncount_followings,
+    )
+    removed += await _purge(
+        conn, comments_collection_name, {"username": username}, {"_id": True}
+    )
+    return removed
+
+
+# users first, the places and posts they mark are purged in the same run
+_PURGES: Dict[str, Callable[[AsyncIOMotorClient, dict], Awaitable[int]]] = {
+    users_collection_name: _purge_user,
+    place_collection_name: _purge_place,
+    post_collection_name: _purge_post,
+}
+
+
+@traced
+async def purge_deleted(conn: AsyncIOMotorClient) -> int:
+    """
+    Remove the soft-deleted places, posts and users along with what depends on
+    them, returns how many of them were removed. Each one is leased, a worker
+    that dies mid-purge leaves it to another once the lease ran out.
+    """
+    purged = 0
+    for collection_name, purge_dependents in _PURGES.items():
+        while True:
+            now = datetime.utcnow()
+            doc = await deletion_repository.claim_deleted(
+                conn, collection_name, now, now + timedelta(seconds=DELETION_LEASE)
+            )
+            if not doc:
+                break
+            removed = await purge_dependents(conn, doc)
+            await deletion_repository.remove_deleted(conn, collection_name, doc["_id"])
+            purged += 1
+            logging.info(
+                "Purged %s %s deleted at %s with %d dependents",
+                collection_name,
+                doc["_id"],
+                doc["deleted_at"],
+                removed,
+            )
+    return purged
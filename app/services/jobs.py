@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict
+
+from bson import ObjectId
+
+from ..core.config import (
+    JOB_LEASE,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BACKOFF,
+    JOB_RETRY_BACKOFF_MAX,
+)
+from ..core.metrics import JOB_DURATION, JOB_RUNS, JOB_WAIT, JOBS_PENDING
+from ..core.tracing import traced
+from ..db.mongodb import AsyncIOMotorClient
+from ..db.repositories import job_repository
+from .tag import create_tags_that_not_exist
+
+UPSERT_TAGS = "upsert_tags"
+
+
+async def _upsert_tags(conn: AsyncIOMotorClient, payload: dict):
+    await create_tags_that_not_exist(conn, payload["tags"])
+
+
+# a job may run more than once, after a lost lease or a failed finish, every
+# handler has to be idempotent. That is why the counter increments stay next to
+# their writes: run twice, an $inc counts twice
+_HANDLERS: Dict[str, Callable[[AsyncIOMotorClient, dict], Awaitable]] = {
+    UPSERT_TAGS: _upsert_tags,
+}
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(
+        seconds=min(JOB_RETRY_BACKOFF * 2 ** (attempts - 1), JOB_RETRY_BACKOFF_MAX)
+    )
+
+
+@traced
+async def enqueue(conn: AsyncIOMotorClient, name: str, payload: dict) -> ObjectId:
+    """
+    Queue `name` to run with `payload` in the background, it survives restarts
+    once this returns.
+    """
+    if name not in _HANDLERS:
+        raise ValueError(f"no job named {name}")
+    return await job_repository.enqueue_job(conn, name, payload, datetime.utcnow())
+
+
+@traced
+async def run_next_job(conn: AsyncIOMotorClient) -> bool:
+    """
+    Lease the next due job and run it, False when none is due. A failed job is
+    retried with a growing delay until it ran out of attempts.
+    """
+    now = datetime.utcnow()
+    job = await job_repository.claim_job(
+        conn, now, now + timedelta(seconds=JOB_LEASE), JOB_MAX_ATTEMPTS
+    )
+    if not job:
+        return False
+
+    name = job["name"]
+    JOB_WAIT.labels(name).observe(max((now - job["due_at"]).total_seconds(), 0))
+    start = time.perf_counter()
+    try:
+        # given up before the lease ends, or another worker would run it too
+        await asyncio.wait_for(_HANDLERS[name](conn, job["payload"]), JOB_LEASE)
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+        if job["attempts"] >= JOB_MAX_ATTEMPTS:
+            logging.exception("Job %s %s failed for good", name, job["_id"])
+            await job_repository.fail_job(conn, job, error)
+            outcome = "failed"
+        else:
+            logging.warning("Job %s %s failed, retrying: %s", name, job["_id"], error)
+            await job_repository.retry_job(
+                conn, job, datetime.utcnow() + _backoff(job["attempts"]), error
+            )
+            outcome = "retried"
+    else:
+        await job_repository.finish_job(conn, job)
+        outcome = "done"
+    JOB_DURATION.labels(name).observe(time.perf_counter() - start)
+    JOB_RUNS.labels(name, outcome).inc()
+    return True
+
+
+@traced
+async def measure_jobs(conn: AsyncIOMotorClient):
+    """
+    Also fails the jobs abandoned on their last attempt, they are never claimed
+    again and would be counted as pending for good.
+    """
+    abandoned = await job_repository.fail_abandoned_jobs(
+        conn, datetime.utcnow(), JOB_MAX_ATTEMPTS
+    )
+    if abandoned:
+        logging.error("Gave up %d jobs whose last attempt lost its lease", abandoned)
+    counts = await job_repository.count_pending_jobs(conn)
+    for name in _HANDLERS:
+        JOBS_PENDING.labels(name).set(counts.get(name, 0))
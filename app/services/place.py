@@ -1,6 +1,6 @@
-from typing import List, Optional
+import asyncio
+from typing import AsyncIterator, List, Optional, Set, Tuple
 from bson import ObjectId
-from slugify import slugify
 from datetime import datetime
 
 from ..models.place import (
@@ -9,103 +9,237 @@ from ..models.place import (
     PlaceInDB,
     PlaceInUpdate,
 )
+from ..models.bulk import BulkResultInResponse
 from ..db.mongodb import AsyncIOMotorClient
-from ..db.repositories.profile_repository import get_profile_by_username, get_followings
-from ..core.config import (
-    database_name,
-    favorites_collection_name,
-    users_collection_name,
-    place_collection_name,
+from ..db.repositories import (
+    counter_repository,
+    deletion_repository,
+    favorite_repository,
+    place_repository,
 )
-from .tag import create_tags_that_not_exist, get_tags
+from ..db.repositories.user_repository import get_user_id, get_user_row
+from ..db.cache import LocalCache
+from ..db.singleflight import SingleFlight
+from ..db.repositories.profile_repository import (
+    get_followings,
+    get_profile_by_username,
+    get_profiles_by_usernames,
+    profile_cache,
+)
+from ..core.config import EXPORT_BATCH_SIZE, place_collection_name
+from ..core.http_cache import CacheValidators, latest, make_etag
+from .bulk import create_by_slug_in_bulk
+from .slugs import write_with_unique_slug
+from .jobs import UPSERT_TAGS, enqueue
+from .tag import get_tags
 from ..models.profile import Profile
+from ..core.tracing import traced
 
 
+@traced
 async def is_place_favorited_by_user(
     conn: AsyncIOMotorClient, slug: str, username: str
 ) -> bool:
-    user_doc = await conn[database_name][users_collection_name].find_one(
-        {"username": username}, projection={"id": True}
-    )
-    place_doc = await conn[database_name][place_collection_name].find_one(
-        {"slug": slug}, projection={"id": True}
-    )
-    if place_doc and user_doc:
-        count = await conn[database_name][favorites_collection_name].count_documents(
-            {"user_id": user_doc["_id"], "place_id": place_doc["_id"]}
-        )
-        return count > 0
+    user_id = await get_user_id(conn, username)
+    place_id = await place_repository.get_place_id(conn, slug)
+    if place_id and user_id:
+        return await favorite_repository.is_favorited(conn, user_id, place_id)
     else:
         raise RuntimeError(
             f"没有找到对应的user_id或place_id,"
-            f" 用户名={username} user={user_doc},slug={slug} place={place_doc}"
+            f" 用户名={username} user_id={user_id},slug={slug} place_id={place_id}"
         )
 
 
-async def add_place_to_favorites(conn: AsyncIOMotorClient, slug: str, username: str):
-    user_doc = await conn[database_name][users_collection_name].find_one(
-        {"username": username}, projection={"id": True}
-    )
-    place_doc = await conn[database_name][place_collection_name].find_one(
-        {"slug": slug}, projection={"id": True}
+async def _favorite_target(
+    conn: AsyncIOMotorClient, slug: str, username: str
+) -> Tuple[Optional[ObjectId], Optional[ObjectId]]:
+    user_id, place_id = await asyncio.gather(
+        get_user_id(conn, username), place_repository.get_place_id(conn, slug)
     )
-    if place_doc and user_doc:
-        await conn[database_name][favorites_collection_name].insert_one(
-            {"user_id": user_doc["_id"], "place_id": place_doc["_id"]}
-        )
-    else:
+    if place_id and not user_id:
         raise RuntimeError(
             f"没有找到对应的user_id或place_id,"
-            f" 用户名={username} user_id={user_doc},slug={slug} place_id={place_doc}"
+            f" 用户名={username} user_id={user_id},slug={slug} place_id={place_id}"
         )
+    return user_id, place_id
 
 
-async def remove_place_from_favorites(
-    conn: AsyncIOMotorClient, slug: str, username: str
-):
-    user_doc = await conn[database_name][users_collection_name].find_one(
-        {"username": username}
-    )
-    place_doc = await conn[database_name][place_collection_name].find_one(
-        {"slug": slug}
+async def _favorite_state(
+    conn: AsyncIOMotorClient, place_doc: Optional[dict], favorited: bool
+) -> Optional[PlaceInDB]:
+    if not place_doc:
+        return None
+    author = await get_profile_by_username(conn, target_username=place_doc["author_id"])
+    return PlaceInDB.from_db(
+        place_doc,
+        author=author,
+        created_at=ObjectId(place_doc["_id"]).generation_time,
+        favorites_count=place_doc.get("favorites_count", 0),
+        favorited=favorited,
     )
-    if place_doc and user_doc:
-        await conn[database_name][favorites_collection_name].delete_many(
-            {"user_id": user_doc["_id"], "place_id": place_doc["_id"]}
+
+
+@traced
+async def add_place_to_favorites(
+    conn: AsyncIOMotorClient, slug: str, username: str
+) -> Optional[PlaceInDB]:
+    """
+    Idempotent, the stored count only moves when this call added the favorite.
+    Returns None when there is no such place.
+    """
+    user_id, place_id = await _favorite_target(conn, slug, username)
+    if not place_id:
+        return None
+
+    if await favorite_repository.add_favorite(conn, user_id, place_id):
+        place_doc, _ = await asyncio.gather(
+            place_repository.increment_favorites_count(conn, place_id, 1),
+            counter_repository.increment_counters(conn, {username: {"favorites": 1}}),
         )
+        _place_rows.forget(slug)
     else:
-        raise RuntimeError(
-            f"没有找到对应的user_id或place_id,"
-            f" 用户名={username} user_id={user_doc},slug={slug} place_id={place_doc}"
+        place_doc = await place_repository.get_place_row(conn, slug)
+    return await _favorite_state(conn, place_doc, favorited=True)
+
+
+@traced
+async def remove_place_from_favorites(
+    conn: AsyncIOMotorClient, slug: str, username: str
+) -> Optional[PlaceInDB]:
+    user_id, place_id = await _favorite_target(conn, slug, username)
+    if not place_id:
+        return None
+
+    if await favorite_repository.remove_favorite(conn, user_id, place_id):
+        place_doc, _ = await asyncio.gather(
+            place_repository.increment_favorites_count(conn, place_id, -1),
+            counter_repository.increment_counters(conn, {username: {"favorites": -1}}),
         )
+        _place_rows.forget(slug)
+    else:
+        place_doc = await place_repository.get_place_row(conn, slug)
+    return await _favorite_state(conn, place_doc, favorited=False)
 
 
-async def get_favorites_count_for_place(conn: AsyncIOMotorClient, slug: str) -> int:
-    place_doc = await conn[database_name][place_collection_name].find_one(
-        {"slug": slug}, projection={"id": True}
+_place_loads = SingleFlight()
+_place_rows = LocalCache("places", [place_collection_name])
+
+
+async def _load_place(conn: AsyncIOMotorClient, slug: str) -> Optional[dict]:
+    # everything that is the same for every viewer
+    place_doc = await _place_rows.get_or_load(
+        slug,
+        lambda: place_repository.get_place_row(conn, slug),
+        depends_on=lambda row: [(place_collection_name, row["_id"])],
     )
     if place_doc:
-        return await conn[database_name][favorites_collection_name].count_documents(
-            {"place_id": place_doc["_id"]}
+        return {
+            **place_doc,
+            "favorites_count": place_doc.get("favorites_count", 0),
+            "author": await get_profile_by_username(conn, target_username=place_doc["author_id"]),
+        }
+
+
+async def _overlay_viewer(
+    conn: AsyncIOMotorClient,
+    shared_doc: Optional[dict],
+    slug: str,
+    username: Optional[str],
+) -> Optional[PlaceInDB]:
+    if shared_doc:
+        # concurrent callers got the same document, overlay the viewer's flags on a copy
+        place_doc = {**shared_doc, "author": shared_doc["author"].copy()}
+        place_doc["favorited"] = await is_place_favorited_by_user(conn, slug, username) if username else False
+
+        return PlaceInDB.from_db(
+            place_doc, created_at=ObjectId(place_doc["_id"]).generation_time
         )
-    else:
-        raise RuntimeError(f"没有找到对应的place_id," f" slug={slug} place_id={place_doc}")
 
 
+@traced
 async def get_place_by_slug(
-    conn: AsyncIOMotorClient, slug: str, username: Optional[str] = None
+    conn: AsyncIOMotorClient,
+    slug: str,
+    username: Optional[str] = None,
+    validators: Optional[CacheValidators] = None,
 ) -> PlaceInDB:
-    place_doc = await conn[database_name][place_collection_name].find_one(
-        {"slug": slug}
+    """
+    With `validators` the place served is the one they describe. A cached row or
+    author older than them is dropped and read again, once: what is read then is
+    at least as new as the validators.
+    """
+    shared_doc = await _place_loads.do(slug, lambda: _load_place(conn, slug))
+    place = await _overlay_viewer(conn, shared_doc, slug, username)
+    if place and validators and _served_etag(place) != validators.etag:
+        _place_rows.forget(slug)
+        profile_cache.forget(place.author.username)
+        shared_doc = await _load_place(conn, slug)
+        place = await _overlay_viewer(conn, shared_doc, slug, username)
+    return place
+
+
+def _place_etag(slug: str, row: dict, favorited: bool, author: Optional[dict]) -> str:
+    # taken alike from the projections of get_place_validators and a served place
+    return make_etag(
+        slug,
+        row.get("updated_at"),
+        row.get("version", 0),
+        row.get("favorites_count", 0),
+        favorited,
+        (author.get("bio") or "") if author else None,
+        author.get("image") if author else None,
     )
-    if place_doc:
-        place_doc["favorites_count"] = await get_favorites_count_for_place(conn, slug)
-        place_doc["favorited"] = await is_place_favorited_by_user(conn, slug, username) if username else False
-        place_doc["author"] = await get_profile_by_username(conn, target_username=place_doc["author_id"])
 
-        return PlaceInDB(
-            **place_doc, created_at=ObjectId(place_doc["_id"]).generation_time
-        )
+
+def _served_etag(place: PlaceInDB) -> str:
+    return _place_etag(
+        place.slug,
+        {
+            "updated_at": place.updated_at,
+            "version": place.version,
+            "favorites_count": place.favorites_count,
+        },
+        place.favorited,
+        place.author.dict(),
+    )
+
+
+@traced
+async def get_place_validators(
+    conn: AsyncIOMotorClient, slug: str, username: Optional[str] = None
+) -> Optional[CacheValidators]:
+    """
+    From projections only, cheap enough to answer a 304 before the place is
+    hydrated. Pass them on to get_place_by_slug for a body they describe.
+    """
+    place_doc = await place_repository.get_place_row(
+        conn,
+        slug,
+        projection={
+            "updated_at": True,
+            "version": True,
+            "author_id": True,
+            "favorites_count": True,
+        },
+    )
+    if not place_doc:
+        return None
+
+    author = await get_user_row(
+        conn,
+        place_doc["author_id"],
+        projection={"_id": False, "bio": True, "image": True, "updated_at": True},
+    )
+    favorited = (
+        await is_place_favorited_by_user(conn, slug, username) if username else False
+    )
+    return CacheValidators(
+        etag=_place_etag(slug, place_doc, favorited, author),
+        last_modified=latest(
+            place_doc.get("updated_at"), author.get("updated_at") if author else None
+        ),
+    )
 
 
 #
@@ -122,22 +256,28 @@ async def get_place_by_slug(
 #     )
 
 
+@traced
 async def create_place_by_slug(
     conn: AsyncIOMotorClient, place: PlaceInCreate, username: str
 ) -> PlaceInDB:
-    slug = slugify(place.title)
     place_doc = place.dict()
-    place_doc["slug"] = slug
     place_doc["author_id"] = username
-    place_doc["updated_at"] = datetime.now()
-    await conn[database_name][place_collection_name].insert_one(place_doc)
+    place_doc["updated_at"] = datetime.utcnow()
+
+    async def insert(slug: str):
+        place_doc["slug"] = slug
+        await place_repository.insert_place(conn, place_doc)
+
+    # the unique index decides, a taken slug gets a suffix
+    await write_with_unique_slug(place.title, insert)
+    await counter_repository.increment_counters(conn, {username: {"places": 1}})
 
     if place.tag_list:
-        await create_tags_that_not_exist(conn, place.tag_list)
+        await enqueue(conn, UPSERT_TAGS, {"tags": place.tag_list})
 
     author = await get_profile_by_username(conn, target_username=username)
-    return PlaceInDB(
-        **place_doc,
+    return PlaceInDB.from_db(
+        place_doc,
         created_at=ObjectId(place_doc["_id"]).generation_time,
         author=author,
         favorites_count=1,
@@ -145,37 +285,79 @@ async def create_place_by_slug(
     )
 
 
+@traced
+async def create_places_in_bulk(
+    conn: AsyncIOMotorClient, places: List[dict], username: str
+) -> BulkResultInResponse:
+    result = await create_by_slug_in_bulk(
+        conn,
+        PlaceInCreate,
+        places,
+        username,
+        find_existing_slugs=place_repository.find_existing_slugs,
+        insert_all=place_repository.insert_places,
+    )
+    await counter_repository.increment_counters(
+        conn, {username: {"places": result.created_count}}
+    )
+    return result
+
+
+@traced
 async def update_place_by_slug(
     conn: AsyncIOMotorClient, slug: str, place: PlaceInUpdate, username: str
-) -> PlaceInDB:
-    dbplace = await get_place_by_slug(conn, slug, username)
+) -> Optional[PlaceInDB]:
+    """
+    Partial update of the author's place, None when it is missing, someone
+    else's or was updated since `place.version`.
+    """
+    # only what was given, derived fields like favorites_count are never written back
+    fields = {
+        name: value
+        for name, value in place.dict(exclude={"version"}).items()
+        if value
+    }
+    fields["updated_at"] = datetime.utcnow()
+
+    row = None
+
+    async def update(new_slug: str):
+        nonlocal row
+        row = await place_repository.update_place(
+            conn, slug, username, {**fields, "slug": new_slug}, place.version
+        )
 
     if place.title:
-        dbplace.slug = slugify(place.title)
-        dbplace.title = place.title
-    dbplace.body = place.body if place.body else dbplace.body
-    dbplace.description = (
-        place.description if place.description else dbplace.description
-    )
-    if place.tag_list:
-        await create_tags_that_not_exist(conn, place.tag_list)
-        dbplace.tag_list = place.tag_list
-
-    dbplace.updated_at = datetime.now()
-    await conn[database_name][place_collection_name].replace_one(
-        {"slug": slug, "author_id": username}, dbplace.dict()
-    )
+        await write_with_unique_slug(place.title, update)
+    else:
+        await update(slug)
 
-    dbplace.created_at = ObjectId(dbplace.id).generation_time
-    return dbplace
+    if not row:
+        return None
+    # the old slug, the new one was free and so not cached
+    _place_rows.forget(slug)
+    if place.tag_list:
+        await enqueue(conn, UPSERT_TAGS, {"tags": place.tag_list})
+    return (await hydrate_places(conn, [row], username))[0]
 
 
-async def delete_place_by_slug(conn: AsyncIOMotorClient, slug: str, username: str):
-    await conn[database_name][place_collection_name].delete_many(
-        {"author_id": username, "slug": slug}
+@traced
+async def delete_place_by_slug(
+    conn: AsyncIOMotorClient, slug: str, username: str
+) -> int:
+    # marked only, services.deletions purges it with its favorites later
+    deleted = await deletion_repository.mark_deleted(
+        conn,
+        place_collection_name,
+        {"slug": slug, "author_id": username},
+        datetime.utcnow(),
     )
+    await counter_repository.increment_counters(conn, {username: {"places": -deleted}})
+    _place_rows.forget(slug)
+    return deleted
 
 
+@traced
 async def get_user_places(
     conn: AsyncIOMotorClient, username: str, limit=20, offset=0
 ) -> List[PlaceInDB]:
@@ -186,27 +368,27 @@ async def get_user_places(
 
     authors = list(map(lambda x: x.username, followings))
 
-    place_docs = conn[database_name][place_collection_name].find(
-        {"author_id": {"$in": authors}}, limit=limit, skip=offset
+    place_docs = place_repository.find_places(
+        conn, {"author_id": {"$in": authors}}, limit, offset
     )
     async for row in place_docs:
         slug = row["slug"]
         author = await get_profile_by_username(conn, target_username=row["author_id"])
         await get_tags(conn, slug)
-        favorites_count = await get_favorites_count_for_place(conn, slug)
         favorited_by_user = await is_place_favorited_by_user(conn, slug, username)
         places.append(
-            PlaceInDB(
-                **row,
+            PlaceInDB.from_db(
+                row,
                 author=author,
                 created_at=ObjectId(row["_id"]).generation_time,
-                favorites_count=favorites_count,
+                favorites_count=row.get("favorites_count", 0),
                 favorited=favorited_by_user,
             )
         )
     return places
 
 
+@traced
 async def get_places_with_filters(
     conn: AsyncIOMotorClient, filters: PlaceFilterParams, username: Optional[str] = None
 ) -> List[PlaceInDB]:
@@ -222,23 +404,81 @@ async def get_places_with_filters(
     if filters.author:
         base_query["author"] = f'$in: ["{filters.author}]"'
 
-    rows = conn[database_name][place_collection_name].find(
-        {"author_id": filters.author} if filters.author else {}, limit=filters.limit, skip=filters.offset
+    rows = place_repository.find_places(
+        conn,
+        {"author_id": filters.author} if filters.author else {},
+        filters.limit,
+        filters.offset,
     )
 
     async for row in rows:
         slug = row["slug"]
         author = await get_profile_by_username(conn, target_username=row["author_id"])
         await get_tags(conn, slug)
-        favorites_count = await get_favorites_count_for_place(conn, slug)
         favorited_by_user = await is_place_favorited_by_user(conn, slug, username)
         places.append(
-            PlaceInDB(
-                **row,
+            PlaceInDB.from_db(
+                row,
                 author=author,
                 created_at=ObjectId(row["_id"]).generation_time,
-                favorites_count=favorites_count,
+                favorites_count=row.get("favorites_count", 0),
                 favorited=favorited_by_user,
             )
         )
     return places
+
+
+@traced
+async def get_favorited_place_ids(
+    conn: AsyncIOMotorClient, place_ids: List[ObjectId], username: Optional[str]
+) -> Set[ObjectId]:
+    if not username:
+        return set()
+
+    user_id = await get_user_id(conn, username)
+    if not user_id:
+        return set()
+
+    return await favorite_repository.get_favorited_place_ids(conn, user_id, place_ids)
+
+
+@traced
+async def hydrate_places(
+    conn: AsyncIOMotorClient, rows: List[dict], username: Optional[str] = None
+) -> List[PlaceInDB]:
+    place_ids = [row["_id"] for row in rows]
+    favorited_ids, authors = await asyncio.gather(
+        get_favorited_place_ids(conn, place_ids, username),
+        get_profiles_by_usernames(conn, (row["author_id"] for row in rows), username),
+    )
+
+    return [
+        PlaceInDB.from_db(
+            row,
+            author=authors[row["author_id"]],
+            created_at=ObjectId(row["_id"]).generation_time,
+            favorites_count=row.get("favorites_count", 0),
+            favorited=row["_id"] in favorited_ids,
+        )
+        for row in rows
+        # skip rows whose author account no longer exists
+        if row["author_id"] in authors
+    ]
+
+
+async def export_places(
+    conn: AsyncIOMotorClient,
+    after: Optional[ObjectId] = None,
+    username: Optional[str] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[List[PlaceInDB]]:
+    rows = place_repository.iterate_places(conn, after, batch_size)
+
+    chunk: List[dict] = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == batch_size:
+            yield await hydrate_places(conn, chunk, username)
+            chunk = []
+    if chunk:
+        yield await hydrate_places(conn, chunk, username)
@@ -1,6 +1,6 @@
-from typing import List, Optional
+import asyncio
+from typing import AsyncIterator, List, Optional, Set, Tuple
 from bson import ObjectId
-from slugify import slugify
 from datetime import datetime
 
 from ..models.post import (
@@ -9,120 +9,251 @@ from ..models.post import (
     PostInDB,
     PostInUpdate,
 )
+from ..models.bulk import BulkResultInResponse
 from ..db.mongodb import AsyncIOMotorClient
-from ..db.repositories.profile_repository import get_profile_by_username
-from ..core.config import (
-    database_name,
-    likes_collection_name,
-    users_collection_name,
-    post_collection_name,
+from ..db.repositories import (
+    counter_repository,
+    deletion_repository,
+    like_repository,
+    post_repository,
 )
-from .tag import create_tags_that_not_exist, get_tags
+from ..db.repositories.user_repository import get_user_id, get_user_row
+from ..db.cache import LocalCache
+from ..db.singleflight import SingleFlight
+from ..db.repositories.profile_repository import (
+    get_profile_by_username,
+    get_profiles_by_usernames,
+    profile_cache,
+)
+from ..core.config import EXPORT_BATCH_SIZE, post_collection_name
+from ..core.http_cache import CacheValidators, latest, make_etag
+from .bulk import create_by_slug_in_bulk
+from .slugs import write_with_unique_slug
+from .jobs import UPSERT_TAGS, enqueue
+from .tag import get_tags
+from ..core.tracing import traced
 
 
+@traced
 async def is_post_liked_by_user(
     conn: AsyncIOMotorClient, slug: str, username: str
 ) -> bool:
-    user_doc = await conn[database_name][users_collection_name].find_one(
-        {"username": username}, projection={"id": True}
-    )
-    post_doc = await conn[database_name][post_collection_name].find_one(
-        {"slug": slug}, projection={"id": True}
-    )
-    if post_doc and user_doc:
-        count = await conn[database_name][likes_collection_name].count_documents(
-            {"user_id": user_doc["_id"], "post_id": post_doc["_id"]}
-        )
-        return count > 0
+    user_id = await get_user_id(conn, username)
+    post_id = await post_repository.get_post_id(conn, slug)
+    if post_id and user_id:
+        return await like_repository.is_liked(conn, user_id, post_id)
     else:
         raise RuntimeError(
             f"没有找到对应的user_id或post_id,"
-            f" 用户名={username} user={user_doc},slug={slug} post={post_doc}"
+            f" 用户名={username} user_id={user_id},slug={slug} post_id={post_id}"
         )
 
 
-async def add_post_to_likes(conn: AsyncIOMotorClient, slug: str, username: str):
-    user_doc = await conn[database_name][users_collection_name].find_one(
-        {"username": username}, projection={"id": True}
-    )
-    post_doc = await conn[database_name][post_collection_name].find_one(
-        {"slug": slug}, projection={"id": True}
+async def _like_target(
+    conn: AsyncIOMotorClient, slug: str, username: str
+) -> Tuple[Optional[ObjectId], Optional[ObjectId]]:
+    user_id, post_id = await asyncio.gather(
+        get_user_id(conn, username), post_repository.get_post_id(conn, slug)
     )
-    if post_doc and user_doc:
-        await conn[database_name][likes_collection_name].insert_one(
-            {"user_id": user_doc["_id"], "post_id": post_doc["_id"]}
-        )
-    else:
+    if post_id and not user_id:
         raise RuntimeError(
             f"没有找到对应的user_id或post_id,"
-            f" 用户名={username} user_id={user_doc},slug={slug} post_id={post_doc}"
+            f" 用户名={username} user_id={user_id},slug={slug} post_id={post_id}"
         )
+    return user_id, post_id
+
 
+async def _like_state(
+    conn: AsyncIOMotorClient, post_doc: Optional[dict], liked: bool
+) -> Optional[PostInDB]:
+    if not post_doc:
+        return None
+    author = await get_profile_by_username(conn, target_username=post_doc["author_id"])
+    return PostInDB.from_db(
+        post_doc,
+        author=author,
+        created_at=ObjectId(post_doc["_id"]).generation_time,
+        likes_count=post_doc.get("likes_count", 0),
+        liked=liked,
+    )
 
+
+@traced
+async def add_post_to_likes(
+    conn: AsyncIOMotorClient, slug: str, username: str
+) -> Optional[PostInDB]:
+    """
+    Idempotent, the stored count only moves when this call added the like.
+    Returns None when there is no such post.
+    """
+    user_id, post_id = await _like_target(conn, slug, username)
+    if not post_id:
+        return None
+
+    if await like_repository.add_like(conn, user_id, post_id):
+        post_doc = await post_repository.increment_likes_count(conn, post_id, 1)
+        _post_rows.forget(slug)
+    else:
+        post_doc = await post_repository.get_post_row(conn, slug)
+    return await _like_state(conn, post_doc, liked=True)
+
+
+@traced
 async def remove_post_from_likes(
     conn: AsyncIOMotorClient, slug: str, username: str
-):
-    user_doc = await conn[database_name][users_collection_name].find_one(
-        {"username": username}
-    )
-    post_doc = await conn[database_name][post_collection_name].find_one(
-        {"slug": slug}
-    )
-    if post_doc and user_doc:
-        await conn[database_name][likes_collection_name].delete_many(
-            {"user_id": user_doc["_id"], "post_id": post_doc["_id"]}
-        )
+) -> Optional[PostInDB]:
+    user_id, post_id = await _like_target(conn, slug, username)
+    if not post_id:
+        return None
+
+    if await like_repository.remove_like(conn, user_id, post_id):
+        post_doc = await post_repository.increment_likes_count(conn, post_id, -1)
+        _post_rows.forget(slug)
     else:
-        raise RuntimeError(
-            f"没有找到对应的user_id或post_id,"
-            f" 用户名={username} user_id={user_doc},slug={slug} post_id={post_doc}"
-        )
+        post_doc = await post_repository.get_post_row(conn, slug)
+    return await _like_state(conn, post_doc, liked=False)
 
 
-async def get_likes_count_for_post(conn: AsyncIOMotorClient, slug: str) -> int:
-    post_doc = await conn[database_name][post_collection_name].find_one(
-        {"slug": slug}, projection={"id": True}
+_post_loads = SingleFlight()
+_post_rows = LocalCache("posts", [post_collection_name])
+
+
+async def _load_post(conn: AsyncIOMotorClient, slug: str) -> Optional[dict]:
+    # everything that is the same for every viewer
+    post_doc = await _post_rows.get_or_load(
+        slug,
+        lambda: post_repository.get_post_row(conn, slug),
+        depends_on=lambda row: [(post_collection_name, row["_id"])],
     )
     if post_doc:
-        return await conn[database_name][likes_collection_name].count_documents(
-            {"post_id": post_doc["_id"]}
+        return {
+            **post_doc,
+            "likes_count": post_doc.get("likes_count", 0),
+            "author": await get_profile_by_username(conn, target_username=post_doc["author_id"]),
+        }
+
+
+async def _overlay_viewer(
+    conn: AsyncIOMotorClient,
+    shared_doc: Optional[dict],
+    slug: str,
+    username: Optional[str],
+) -> Optional[PostInDB]:
+    if shared_doc:
+        # concurrent callers got the same document, overlay the viewer's flags on a copy
+        post_doc = {**shared_doc, "author": shared_doc["author"].copy()}
+        post_doc["liked"] = await is_post_liked_by_user(conn, slug, username) if username else False
+
+        return PostInDB.from_db(
+            post_doc, created_at=ObjectId(post_doc["_id"]).generation_time
         )
-    else:
-        raise RuntimeError(f"没有找到对应的post_id," f" slug={slug} post_id={post_doc}")
 
 
+@traced
 async def get_post_by_slug(
-    conn: AsyncIOMotorClient, slug: str, username: Optional[str] = None
+    conn: AsyncIOMotorClient,
+    slug: str,
+    username: Optional[str] = None,
+    validators: Optional[CacheValidators] = None,
 ) -> PostInDB:
-    post_doc = await conn[database_name][post_collection_name].find_one(
-        {"slug": slug}
+    """
+    With `validators` the post served is the one they describe. A cached row or
+    author older than them is dropped and read again, once: what is read then is
+    at least as new as the validators.
+    """
+    shared_doc = await _post_loads.do(slug, lambda: _load_post(conn, slug))
+    post = await _overlay_viewer(conn, shared_doc, slug, username)
+    if post and validators and _served_etag(post) != validators.etag:
+        _post_rows.forget(slug)
+        profile_cache.forget(post.author.username)
+        shared_doc = await _load_post(conn, slug)
+        post = await _overlay_viewer(conn, shared_doc, slug, username)
+    return post
+
+
+def _post_etag(slug: str, row: dict, liked: bool, author: Optional[dict]) -> str:
+    # taken alike from the projections of get_post_validators and a served post
+    return make_etag(
+        slug,
+        row.get("updated_at"),
+        row.get("version", 0),
+        row.get("likes_count", 0),
+        liked,
+        (author.get("bio") or "") if author else None,
+        author.get("image") if author else None,
     )
-    if post_doc:
-        post_doc["likes_count"] = await get_likes_count_for_post(conn, slug)
-        post_doc["liked"] = await is_post_liked_by_user(conn, slug, username) if username else False
-        post_doc["author"] = await get_profile_by_username(conn, target_username=post_doc["author_id"])
 
-        return PostInDB(
-            **post_doc, created_at=ObjectId(post_doc["_id"]).generation_time
-        )
+
+def _served_etag(post: PostInDB) -> str:
+    return _post_etag(
+        post.slug,
+        {
+            "updated_at": post.updated_at,
+            "version": post.version,
+            "likes_count": post.likes_count,
+        },
+        post.liked,
+        post.author.dict(),
+    )
 
 
+@traced
+async def get_post_validators(
+    conn: AsyncIOMotorClient, slug: str, username: Optional[str] = None
+) -> Optional[CacheValidators]:
+    """
+    From projections only, cheap enough to answer a 304 before the post is
+    hydrated. Pass them on to get_post_by_slug for a body they describe.
+    """
+    post_doc = await post_repository.get_post_row(
+        conn,
+        slug,
+        projection={
+            "updated_at": True,
+            "version": True,
+            "author_id": True,
+            "likes_count": True,
+        },
+    )
+    if not post_doc:
+        return None
+
+    author = await get_user_row(
+        conn,
+        post_doc["author_id"],
+        projection={"_id": False, "bio": True, "image": True, "updated_at": True},
+    )
+    liked = await is_post_liked_by_user(conn, slug, username) if username else False
+    return CacheValidators(
+        etag=_post_etag(slug, post_doc, liked, author),
+        last_modified=latest(
+            post_doc.get("updated_at"), author.get("updated_at") if author else None
+        ),
+    )
+
+
+@traced
 async def create_post_by_slug(
     conn: AsyncIOMotorClient, post: PostInCreate, username: str
 ) -> PostInDB:
-    slug = slugify(post.title)
     post_doc = post.dict()
-    post_doc["slug"] = slug
     post_doc["author_id"] = username
-    post_doc["updated_at"] = datetime.now()
-    await conn[database_name][post_collection_name].insert_one(post_doc)
+    post_doc["updated_at"] = datetime.utcnow()
+
+    async def insert(slug: str):
+        post_doc["slug"] = slug
+        await post_repository.insert_post(conn, post_doc)
+
+    # the unique index decides, a taken slug gets a suffix
+    await write_with_unique_slug(post.title, insert)
+    await counter_repository.increment_counters(conn, {username: {"posts": 1}})
 
     if post.tag_list:
-        await create_tags_that_not_exist(conn, post.tag_list)
+        await enqueue(conn, UPSERT_TAGS, {"tags": post.tag_list})
 
     author = await get_profile_by_username(conn, target_username=username)
-    return PostInDB(
-        **post_doc,
+    return PostInDB.from_db(
+        post_doc,
         created_at=ObjectId(post_doc["_id"]).generation_time,
         author=author,
         likes_count=1,
@@ -130,62 +261,104 @@ async def create_post_by_slug(
     )
 
 
+@traced
+async def create_posts_in_bulk(
+    conn: AsyncIOMotorClient, posts: List[dict], username: str
+) -> BulkResultInResponse:
+    result = await create_by_slug_in_bulk(
+        conn,
+        PostInCreate,
+        posts,
+        username,
+        find_existing_slugs=post_repository.find_existing_slugs,
+        insert_all=post_repository.insert_posts,
+    )
+    await counter_repository.increment_counters(
+        conn, {username: {"posts": result.created_count}}
+    )
+    return result
+
+
+@traced
 async def update_post_by_slug(
     conn: AsyncIOMotorClient, slug: str, post: PostInUpdate, username: str
-) -> PostInDB:
-    dbpost = await get_post_by_slug(conn, slug, username)
+) -> Optional[PostInDB]:
+    """
+    Partial update of the author's post, None when it is missing, someone
+    else's or was updated since `post.version`.
+    """
+    # only what was given, derived fields like likes_count are never written back
+    fields = {
+        name: value
+        for name, value in post.dict(exclude={"version"}).items()
+        if value
+    }
+    fields["updated_at"] = datetime.utcnow()
+
+    row = None
+
+    async def update(new_slug: str):
+        nonlocal row
+        row = await post_repository.update_post(
+            conn, slug, username, {**fields, "slug": new_slug}, post.version
+        )
 
     if post.title:
-        dbpost.slug = slugify(post.title)
-        dbpost.title = post.title
-    dbpost.body = post.body if post.body else dbpost.body
-    dbpost.description = (
-        post.description if post.description else dbpost.description
-    )
-    if post.tag_list:
-        await create_tags_that_not_exist(conn, post.tag_list)
-        dbpost.tag_list = post.tag_list
-
-    dbpost.updated_at = datetime.now()
-    await conn[database_name][post_collection_name].repost_one(
-        {"slug": slug, "author_id": username}, dbpost.dict()
-    )
+        await write_with_unique_slug(post.title, update)
+    else:
+        await update(slug)
 
-    dbpost.created_at = ObjectId(dbpost.id).generation_time
-    return dbpost
+    if not row:
+        return None
+    # the old slug, the new one was free and so not cached
+    _post_rows.forget(slug)
+    if post.tag_list:
+        await enqueue(conn, UPSERT_TAGS, {"tags": post.tag_list})
+    return (await hydrate_posts(conn, [row], username))[0]
 
 
-async def delete_post_by_slug(conn: AsyncIOMotorClient, slug: str, username: str):
-    await conn[database_name][post_collection_name].delete_many(
-        {"author_id": username, "slug": slug}
+@traced
+async def delete_post_by_slug(
+    conn: AsyncIOMotorClient, slug: str, username: str
+) -> int:
+    # marked only, services.deletions purges it with its likes and comments later
+    deleted = await deletion_repository.mark_deleted(
+        conn,
+        post_collection_name,
+        {"slug": slug, "author_id": username},
+        datetime.utcnow(),
     )
+    await counter_repository.increment_counters(conn, {username: {"posts": -deleted}})
+    _post_rows.forget(slug)
+    return deleted
 
 
+@traced
 async def get_user_posts(
     conn: AsyncIOMotorClient, username: str, limit=20, offset=0
 ) -> List[PostInDB]:
     posts: List[PostInDB] = []
-    post_docs = conn[database_name][post_collection_name].find(
-        {"author_id": username}, limit=limit, skip=offset
+    post_docs = post_repository.find_posts(
+        conn, {"author_id": username}, limit, offset
     )
     async for row in post_docs:
         slug = row["slug"]
         author = await get_profile_by_username(conn, target_username=row["author_id"])
         await get_tags(conn, slug, doc_name=post_collection_name)
-        likes_count = await get_likes_count_for_post(conn, slug)
         liked_by_user = await is_post_liked_by_user(conn, slug, username) if username else False
         posts.append(
-            PostInDB(
-                **row,
+            PostInDB.from_db(
+                row,
                 author=author,
                 created_at=ObjectId(row["_id"]).generation_time,
-                likes_count=likes_count,
+                likes_count=row.get("likes_count", 0),
                 liked=liked_by_user,
             )
         )
     return posts
 
 
+@traced
 async def get_posts_with_filters(
     conn: AsyncIOMotorClient, filters: PostFilterParams, username: Optional[str] = None
 ) -> List[PostInDB]:
@@ -201,23 +374,76 @@ async def get_posts_with_filters(
     if filters.author:
         base_query["author"] = f'$in: ["{filters.author}]"'
 
-    rows = conn[database_name][post_collection_name].find(
-        {}, limit=filters.limit, skip=filters.offset
-    )
+    rows = post_repository.find_posts(conn, {}, filters.limit, filters.offset)
 
     async for row in rows:
         slug = row["slug"]
         author = await get_profile_by_username(conn, target_username=row["author_id"])
         await get_tags(conn, slug, doc_name=post_collection_name)
-        likes_count = await get_likes_count_for_post(conn, slug)
         liked_by_user = await is_post_liked_by_user(conn, slug, username) if username else False
         posts.append(
-            PostInDB(
-                **row,
+            PostInDB.from_db(
+                row,
                 author=author,
                 created_at=ObjectId(row["_id"]).generation_time,
-                likes_count=likes_count,
+                likes_count=row.get("likes_count", 0),
                 liked=liked_by_user,
             )
         )
     return posts
+
+
+@traced
+async def get_liked_post_ids(
+    conn: AsyncIOMotorClient, post_ids: List[ObjectId], username: Optional[str]
+) -> Set[ObjectId]:
+    if not username:
+        return set()
+
+    user_id = await get_user_id(conn, username)
+    if not user_id:
+        return set()
+
+    return await like_repository.get_liked_post_ids(conn, user_id, post_ids)
+
+
+@traced
+async def hydrate_posts(
+    conn: AsyncIOMotorClient, rows: List[dict], username: Optional[str] = None
+) -> List[PostInDB]:
+    post_ids = [row["_id"] for row in rows]
+    liked_ids, authors = await asyncio.gather(
+        get_liked_post_ids(conn, post_ids, username),
+        get_profiles_by_usernames(conn, (row["author_id"] for row in rows), username),
+    )
+
+    return [
+        PostInDB.from_db(
+            row,
+            author=authors[row["author_id"]],
+            created_at=ObjectId(row["_id"]).generation_time,
+            likes_count=row.get("likes_count", 0),
+            liked=row["_id"] in liked_ids,
+        )
+        for row in rows
+        # skip rows whose author account no longer exists
+        if row["author_id"] in authors
+    ]
+
+
+async def export_posts(
+    conn: AsyncIOMotorClient,
+    after: Optional[ObjectId] = None,
+    username: Optional[str] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[List[PostInDB]]:
+    rows = post_repository.iterate_posts(conn, after, batch_size)
+
+    chunk: List[dict] = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == batch_size:
+            yield await hydrate_posts(conn, chunk, username)
+            chunk = []
+    if chunk:
+        yield await hydrate_posts(conn, chunk, username)
@@ -5,23 +5,27 @@ from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
 from ..models.profile import ProfileInResponse, ProfilesInResponse
 from ..models.user import User
 from ..db.mongodb import AsyncIOMotorClient
+from ..db.repositories import counter_repository
 from ..db.repositories.profile_repository import (
-    get_profile_by_username,
+    get_profile_with_counters,
     get_followings,
     follow_for_user,
     unfollow_user,
 )
+from ..core.tracing import traced
 
 
+@traced
 async def get_profile_service(
     conn: AsyncIOMotorClient, *, username: str, current_user: Optional[User] = None
 ) -> ProfileInResponse:
-    profile = await get_profile_by_username(
+    profile = await get_profile_with_counters(
         conn, username, current_user.username if current_user else None
     )
     return ProfileInResponse(profile=profile)
 
 
+@traced
 async def get_following_service(
     conn: AsyncIOMotorClient, *, username: str, current_user: Optional[User] = None
 ) -> ProfilesInResponse:
@@ -33,6 +37,7 @@ async def get_following_service(
     return ProfilesInResponse(profiles=profiles)
 
 
+@traced
 async def follow_user_service(user: User, username: str, conn: AsyncIOMotorClient):
     if username == user.username:
         raise HTTPException(
@@ -40,19 +45,29 @@ async def follow_user_service(user: User, username: str, conn: AsyncIOMotorClien
             detail=f"User can not follow them self",
         )
 
-    profile = await get_profile_by_username(conn, username, user.username)
+    profile = await get_profile_with_counters(conn, username, user.username)
     if profile.following:
         raise HTTPException(
             status_code=HTTP_422_UNPROCESSABLE_ENTITY,
             detail=f"You follow this user already",
         )
 
-    await follow_for_user(conn, user.username, profile.username)
+    # a concurrent follow may have added it first, only one of them counts it
+    added = int(await follow_for_user(conn, user.username, profile.username))
+    await counter_repository.increment_counters(
+        conn,
+        {
+            user.username: {"followings": added},
+            profile.username: {"followers": added},
+        },
+    )
     profile.following = True
+    profile.counters.followers += added
 
     return ProfileInResponse(profile=profile)
 
 
+@traced
 async def unfollow_user_service(user: User, username: str, conn: AsyncIOMotorClient):
     if username == user.username:
         raise HTTPException(
@@ -60,7 +75,7 @@ async def unfollow_user_service(user: User, username: str, conn: AsyncIOMotorCli
             detail=f"User can not describe from them self",
         )
 
-    profile = await get_profile_by_username(conn, username, user.username)
+    profile = await get_profile_with_counters(conn, username, user.username)
 
     if not profile.following:
         raise HTTPException(
@@ -68,7 +83,15 @@ async def unfollow_user_service(user: User, username: str, conn: AsyncIOMotorCli
             detail=f"You did not follow this user",
         )
 
-    await unfollow_user(conn, user.username, profile.username)
+    removed = await unfollow_user(conn, user.username, profile.username)
+    await counter_repository.increment_counters(
+        conn,
+        {
+            user.username: {"followings": -removed},
+            profile.username: {"followers": -removed},
+        },
+    )
     profile.following = False
+    profile.counters.followers -= removed
 
     return ProfileInResponse(profile=profile)
@@ -0,0 +1,84 @@
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+
+from ..core.config import place_collection_name, post_collection_name
+from ..core.tracing import traced
+from ..db.mongodb import AsyncIOMotorClient
+from ..db.repositories import search_repository
+from ..models.place import PlaceInDB
+from ..models.post import PostInDB
+from .place import hydrate_places
+from .post import hydrate_posts
+
+EARTH_RADIUS_KM = 6378.1
+
+# (score, _id) of the last result of a page
+SearchPosition = Tuple[float, ObjectId]
+
+
+def _filters(tag: str, near: Optional[Tuple[float, float]], radius_km: float) -> dict:
+    filters = {}
+    if tag:
+        filters["tag_list"] = tag
+    if near:
+        # $near cannot be combined with $text, $geoWithin can
+        filters["location"] = {
+            "$geoWithin": {"$centerSphere": [list(near), radius_km / EARTH_RADIUS_KM]}
+        }
+    return filters
+
+
+async def _search_page(
+    conn: AsyncIOMotorClient,
+    collection_name: str,
+    text: str,
+    filters: dict,
+    after: Optional[SearchPosition],
+    limit: int,
+) -> Tuple[List[dict], Optional[SearchPosition]]:
+    # one row more tells whether there is a next page
+    rows = await search_repository.search_rows(
+        conn, collection_name, text, filters, after, limit + 1
+    )
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1]["score"], rows[-1]["_id"])
+
+
+@traced
+async def search_places(
+    conn: AsyncIOMotorClient,
+    text: str,
+    tag: str = "",
+    near: Optional[Tuple[float, float]] = None,
+    radius_km: float = 10,
+    after: Optional[SearchPosition] = None,
+    limit: int = 20,
+    username: Optional[str] = None,
+) -> Tuple[List[PlaceInDB], Optional[SearchPosition]]:
+    rows, next_position = await _search_page(
+        conn,
+        place_collection_name,
+        text,
+        _filters(tag, near, radius_km),
+        after,
+        limit,
+    )
+    return await hydrate_places(conn, rows, username), next_position
+
+
+@traced
+async def search_posts(
+    conn: AsyncIOMotorClient,
+    text: str,
+    tag: str = "",
+    after: Optional[SearchPosition] = None,
+    limit: int = 20,
+    username: Optional[str] = None,
+) -> Tuple[List[PostInDB], Optional[SearchPosition]]:
+    rows, next_position = await _search_page(
+        conn, post_collection_name, text, _filters(tag, None, 0), after, limit
+    )
+    return await hydrate_posts(conn, rows, username), next_position
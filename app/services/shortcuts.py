@@ -11,22 +11,26 @@ from starlette.status import (
 from .place import get_place_by_slug
 from .user import get_user, get_user_by_email
 from ..db.mongodb import AsyncIOMotorClient
+from ..db.repositories.place_repository import get_place_row
+from ..core.tracing import traced
 
 
+@traced
 async def check_free_username_and_email(
     conn: AsyncIOMotorClient,
     username: Optional[str] = None,
     email: Optional[EmailStr] = None,
 ):
     if username:
-        user_by_username = await get_user(conn, username)
+        # a deleted user keeps both until purged, the purge finds their rows by name
+        user_by_username = await get_user(conn, username, include_deleted=True)
         if user_by_username:
             raise HTTPException(
                 status_code=HTTP_422_UNPROCESSABLE_ENTITY,
                 detail="User with this username already exists",
             )
     if email:
-        user_by_email = await get_user_by_email(conn, email)
+        user_by_email = await get_user_by_email(conn, email, include_deleted=True)
         if user_by_email:
             raise HTTPException(
                 status_code=HTTP_422_UNPROCESSABLE_ENTITY,
@@ -34,6 +38,7 @@ async def check_free_username_and_email(
             )
 
 
+@traced
 async def get_by_slug_or_404(
     conn: AsyncIOMotorClient, slug: str, username: Optional[str] = None, fx: Callable = get_place_by_slug
 ):
@@ -46,16 +51,29 @@ async def get_by_slug_or_404(
     return searched_item
 
 
+@traced
+async def check_by_slug_for_existence(
+    conn: AsyncIOMotorClient, slug: str, fx: Callable = get_place_row
+):
+    # `fx` is a repository row getter, the guard only needs to know the row is there
+    if not await fx(conn, slug, projection={"_id": True}):
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail=f"Item with slug '{slug}' not found",
+        )
+
+
+@traced
 async def check_by_slug_for_existence_and_modifying_permissions(
-    conn: AsyncIOMotorClient, slug: str, username: str = "", fx: Callable = get_place_by_slug
+    conn: AsyncIOMotorClient, slug: str, username: str = "", fx: Callable = get_place_row
 ):
-    searched_item = await fx(conn, slug, username)
+    searched_item = await fx(conn, slug, projection={"author_id": True})
     if not searched_item:
         raise HTTPException(
             status_code=HTTP_404_NOT_FOUND,
             detail=f"Article with slug '{slug}' not found",
         )
-    if searched_item.author.username != username:
+    if searched_item["author_id"] != username:
         raise HTTPException(
             status_code=HTTP_403_FORBIDDEN,
             detail="You have no permission for modifying this place",
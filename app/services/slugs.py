@@ -0,0 +1,50 @@
+import random
+import string
+from typing import Awaitable, Callable, Iterator
+
+from pymongo.errors import DuplicateKeyError
+from slugify import slugify
+from starlette.exceptions import HTTPException
+from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
+
+from ..core.tracing import traced
+
+SLUG_ATTEMPTS = 4
+_BASE36 = string.digits + string.ascii_lowercase
+
+
+def _base36(number: int) -> str:
+    digits = ""
+    while True:
+        number, digit = divmod(number, 36)
+        digits = _BASE36[digit] + digits
+        if not number:
+            return digits
+
+
+def slug_candidates(title: str) -> Iterator[str]:
+    """
+    The slug of `title`, then the same with a short random suffix.
+    """
+    slug = slugify(title)
+    yield slug
+    for _ in range(SLUG_ATTEMPTS - 1):
+        yield f"{slug}-{_base36(random.getrandbits(32))}"
+
+
+@traced
+async def write_with_unique_slug(title: str, write: Callable[[str], Awaitable]) -> str:
+    """
+    Run `write(slug)` until the unique slug index accepts one of the candidates
+    for `title`, returns the slug that was written.
+    """
+    for slug in slug_candidates(title):
+        try:
+            await write(slug)
+        except DuplicateKeyError:
+            continue
+        return slug
+    raise HTTPException(
+        status_code=HTTP_422_UNPROCESSABLE_ENTITY,
+        detail=f"No free slug left for '{title}'",
+    )
@@ -1,37 +1,52 @@
-from typing import List
+from typing import Iterable, List
 
+from ..db.cache import LocalCache
 from ..db.mongodb import AsyncIOMotorClient
+from ..db.repositories import tag_repository
 from ..models.tag import TagInDB
-from ..core.config import database_name, tags_collection_name, place_collection_name
+from ..core.config import place_collection_name, tags_collection_name
+from ..core.tracing import traced
 
 
-async def fetch_all_tags(conn: AsyncIOMotorClient) -> List[TagInDB]:
+tag_cache = LocalCache("tags", [tags_collection_name])
+
+
+def _any_tag(_) -> list:
+    return [(tags_collection_name, None)]
+
+
+async def _load_tags(conn: AsyncIOMotorClient) -> List[TagInDB]:
     tags = []
-    rows = conn[database_name][tags_collection_name].find()
+    rows = tag_repository.find_tags(conn)
     async for row in rows:
-        tags.append(TagInDB(**row))
+        tags.append(TagInDB.from_db(row))
 
     return tags
 
 
-async def get_tags(conn: AsyncIOMotorClient, slug: str, doc_name: str = place_collection_name) -> List[TagInDB]:
-    tags = []
-    place_tags = await conn[database_name][doc_name].find_one(
-        {"slug": slug}, projection={"tag_list": True}
+@traced
+async def fetch_all_tags(conn: AsyncIOMotorClient) -> List[TagInDB]:
+    tags = await tag_cache.get_or_load("tags", lambda: _load_tags(conn), _any_tag)
+    return list(tags)
+
+
+@traced
+async def fetch_all_tag_names(conn: AsyncIOMotorClient) -> List[str]:
+    names = await tag_cache.get_or_load(
+        "names", lambda: tag_repository.get_tag_names(conn), _any_tag
     )
-    for row in place_tags["tag_list"]:
-        tags.append(TagInDB(tag=row))
+    return list(names)
 
-    return tags
 
+@traced
+async def get_tags(conn: AsyncIOMotorClient, slug: str, doc_name: str = place_collection_name) -> List[TagInDB]:
+    tags = []
+    for row in await tag_repository.get_tag_list(conn, doc_name, slug):
+        tags.append(TagInDB.from_db(tag=row))
 
-async def create_tags_that_not_exist(conn: AsyncIOMotorClient, tags: List[str]):
-    dbconn = conn[database_name][tags_collection_name]
-    existing = await dbconn.find({}, projection={"_id": False}).to_list(None)
-    existing = list(map(lambda x: x["tag"], existing))
+    return tags
 
-    filtered = list(filter(lambda x: x not in existing, tags))
 
-    await dbconn.insert_many(
-        [{"tag": tag} for tag in filtered]
-    ) if filtered else None
+@traced
+async def create_tags_that_not_exist(conn: AsyncIOMotorClient, tags: Iterable[str]):
+    await tag_repository.upsert_tags(conn, tags)
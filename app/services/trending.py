@@ -0,0 +1,129 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from ..core.config import (
+    TRENDING_FAVORITE_WEIGHT,
+    TRENDING_HALF_LIFE_HOURS,
+    TRENDING_INTERVAL,
+    TRENDING_SIZE,
+    TRENDING_WINDOW_DAYS,
+    place_collection_name,
+)
+from ..core.tracing import traced
+from ..db.mongodb import AsyncIOMotorClient
+from ..db.repositories import (
+    favorite_repository,
+    place_repository,
+    trending_repository,
+    view_repository,
+)
+from ..db.repositories.follower_repository import get_followed_usernames
+from ..models.place import PlaceInDB
+from .place import get_favorited_place_ids, hydrate_places
+
+
+class TrendingPlaces:
+    """
+    The latest ranking, hydrated as an anonymous viewer sees it.
+    """
+
+    def __init__(self):
+        self.computed_at: Optional[datetime] = None
+        self.places: List[PlaceInDB] = []
+
+
+trending_places = TrendingPlaces()
+
+
+@traced
+async def compute_trending_places(conn: AsyncIOMotorClient) -> bool:
+    """
+    Rank places by decayed views and favorites, unless another worker did
+    within TRENDING_INTERVAL.
+    """
+    now = datetime.utcnow()
+    next_run_at = now + timedelta(seconds=TRENDING_INTERVAL)
+    if not await trending_repository.claim_run(
+        conn, place_collection_name, now, next_run_at
+    ):
+        return False
+
+    since = now - timedelta(days=TRENDING_WINDOW_DAYS)
+    # more candidates than places ranked, a place may score on either side
+    candidates = TRENDING_SIZE * 4
+    views, favorites = await asyncio.gather(
+        view_repository.get_view_scores(
+            conn,
+            place_collection_name,
+            since,
+            now,
+            TRENDING_HALF_LIFE_HOURS,
+            candidates,
+        ),
+        favorite_repository.get_favorite_scores(
+            conn, since, now, TRENDING_HALF_LIFE_HOURS, candidates
+        ),
+    )
+    scores = Counter(views)
+    for place_id, score in favorites.items():
+        scores[place_id] += TRENDING_FAVORITE_WEIGHT * score
+
+    ranking = [
+        {"place_id": place_id, "score": round(score, 3)}
+        for place_id, score in scores.most_common(TRENDING_SIZE)
+    ]
+    await trending_repository.save_ranking(conn, place_collection_name, ranking, now)
+    return True
+
+
+@traced
+async def load_trending_places(conn: AsyncIOMotorClient):
+    doc = await trending_repository.get_ranking(conn, place_collection_name)
+    if not doc or doc.get("computed_at") == trending_places.computed_at:
+        return
+
+    place_ids = [entry["place_id"] for entry in doc["ranking"]]
+    rows = {
+        row["_id"]: row
+        for row in await place_repository.get_places_by_ids(conn, place_ids)
+    }
+    # deleted places drop out, the others keep their rank
+    ranked_rows = [rows[place_id] for place_id in place_ids if place_id in rows]
+    trending_places.places = await hydrate_places(conn, ranked_rows)
+    trending_places.computed_at = doc["computed_at"]
+
+
+@traced
+async def refresh_trending_places(conn: AsyncIOMotorClient):
+    await compute_trending_places(conn)
+    await load_trending_places(conn)
+
+
+@traced
+async def get_trending_places(
+    conn: AsyncIOMotorClient, username: Optional[str] = None, limit: int = 20
+) -> List[PlaceInDB]:
+    places = trending_places.places[:limit]
+    if not username or not places:
+        return places
+
+    # the shared list is anonymous, overlay the viewer's flags on copies
+    favorited_ids, followed = await asyncio.gather(
+        get_favorited_place_ids(conn, [place.id for place in places], username),
+        get_followed_usernames(
+            conn, username, list({place.author.username for place in places})
+        ),
+    )
+    return [
+        place.copy(
+            update={
+                "favorited": place.id in favorited_ids,
+                "author": place.author.copy(
+                    update={"following": place.author.username in followed}
+                ),
+            }
+        )
+        for place in places
+    ]
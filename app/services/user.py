@@ -1,5 +1,5 @@
 from typing import Optional
-from datetime import timedelta
+from datetime import datetime, timedelta
 from ..db.mongodb import AsyncIOMotorClient
 from pydantic import EmailStr
 from starlette.exceptions import HTTPException
@@ -9,15 +9,23 @@ from starlette.status import (
 from ..core.jwt import create_access_token
 from ..core.config import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    place_collection_name,
+    post_collection_name,
+    users_collection_name,
 )
 from ..models.user import User, UserInCreate, UserInResponse
+from ..db.cache import evict
+from ..db.repositories.deletion_repository import mark_deleted
+from ..db.repositories.profile_repository import profile_cache
 from ..db.repositories.user_repository import (
     create_user,
     get_user,
     get_user_by_email,
 )
+from ..core.tracing import traced
 
 
+@traced
 async def create_user_service(user: UserInCreate, conn: AsyncIOMotorClient):
     await check_free_username_and_email(conn, user.username, user.email)
     async with await conn.start_session() as s:
@@ -31,22 +39,41 @@ async def create_user_service(user: UserInCreate, conn: AsyncIOMotorClient):
             return UserInResponse(user=User(**dbuser.dict(), token=token))
 
 
+@traced
 async def check_free_username_and_email(
     conn: AsyncIOMotorClient,
     username: Optional[str] = None,
     email: Optional[EmailStr] = None,
 ):
     if username:
-        user_by_username = await get_user(conn, username)
+        # a deleted user keeps both until purged, the purge finds their rows by name
+        user_by_username = await get_user(conn, username, include_deleted=True)
         if user_by_username:
             raise HTTPException(
                 status_code=HTTP_422_UNPROCESSABLE_ENTITY,
                 detail="User with this username already exists",
             )
     if email:
-        user_by_email = await get_user_by_email(conn, email)
+        user_by_email = await get_user_by_email(conn, email, include_deleted=True)
         if user_by_email:
             raise HTTPException(
                 status_code=HTTP_422_UNPROCESSABLE_ENTITY,
                 detail="User with this email already exists",
             )
+
+
+@traced
+async def delete_user_service(conn: AsyncIOMotorClient, username: str) -> int:
+    # marked only, services.deletions purges the user with everything they wrote.
+    # Their places and posts are hidden right away, the user last so a failed
+    # delete can be retried
+    now = datetime.utcnow()
+    for collection_name in (place_collection_name, post_collection_name):
+        await mark_deleted(conn, collection_name, {"author_id": username}, now)
+        # which of them are cached is not known
+        evict(collection_name)
+    deleted = await mark_deleted(
+        conn, users_collection_name, {"username": username}, now
+    )
+    profile_cache.forget(username)
+    return deleted
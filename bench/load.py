@@ -0,0 +1,453 @@
+"""
+Drive a running server with a weighted mix of requests and report latency per route.
+
+    python -m bench.seed --drop
+    python -m bench.load --base-url http://localhost:8000/api --requests 5000 \\
+        --concurrency 16 --output bench/results/HEAD.json --baseline bench/results/main.json
+
+Every router in ``app/api/api_v1/api.py`` is covered. Results are grouped by route
+template (``GET /places/{slug}``) and written as JSON with p50/p95/p99 latency and
+throughput. With ``--baseline`` the run fails when a route's p95 regressed by more
+than ``--max-regression``. Targets are drawn from the seeder manifest with a fixed
+``--seed``, so two runs against the same dataset send the same requests.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from app.core.config import JWT_TOKEN_PREFIX
+from bench.rows import CITIES, WORDS
+
+
+class Run:
+    """
+    Shared state of one load run: targets, tokens and recorded timings.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, manifest: dict):
+        self.client = client
+        self.manifest = manifest
+        self.tokens: Dict[str, str] = {}
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.recording = True
+
+    async def request(
+        self,
+        method: str,
+        template: str,
+        path: str,
+        username: Optional[str] = None,
+        **kwargs,
+    ) -> Optional[httpx.Response]:
+        headers = {}
+        if username:
+            headers["Authorization"] = f"{JWT_TOKEN_PREFIX} {self.tokens[username]}"
+
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, path, headers=headers, **kwargs
+            )
+            failed = response.status_code >= 400 or "errors" in _json(response)
+        except httpx.HTTPError:
+            response, failed = None, True
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if self.recording:
+            route = f"{method} {template}"
+            self.timings[route].append(elapsed_ms)
+            self.errors[route] += failed
+        return response
+
+    async def login(self, username: str):
+        response = await self.client.post(
+            "/users/login",
+            json={
+                "user": {
+                    "email": f"{username}@example.com",
+                    "password": self.manifest["password"],
+                }
+            },
+        )
+        self.tokens[username] = response.json()["user"]["token"]
+
+
+def _json(response: Optional[httpx.Response]) -> dict:
+    if response is None:
+        return {}
+    try:
+        body = response.json()
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+Scenario = Callable[[Run, random.Random, str], object]
+SCENARIOS: Dict[str, Scenario] = {}
+
+
+def scenario(name: str):
+    def register(fn: Scenario) -> Scenario:
+        SCENARIOS[name] = fn
+        return fn
+
+    return register
+
+
+@scenario("list_places")
+async def _(run: Run, rnd: random.Random, user: str):
+    offset = rnd.randrange(0, 200, 20)
+    await run.request("GET", "/places", "/places", params={"offset": offset})
+
+
+@scenario("list_places_by_author")
+async def _(run: Run, rnd: random.Random, user: str):
+    author = rnd.choice(run.manifest["users"])
+    await run.request("GET", "/places", "/places", params={"author": author})
+
+
+@scenario("place_feed")
+async def _(run: Run, rnd: random.Random, user: str):
+    await run.request("GET", "/places/feed", "/places/feed", username=user)
+
+
+@scenario("get_place")
+async def _(run: Run, rnd: random.Random, user: str):
+    slug = rnd.choice(run.manifest["places"])
+    await run.request("GET", "/places/{slug}", f"/places/{slug}", username=user)
+
+
+@scenario("favorite_place")
+async def _(run: Run, rnd: random.Random, user: str):
+    slug = rnd.choice(run.manifest["places"])
+    path = f"/places/{slug}/favorite"
+    await run.request("POST", "/places/{slug}/favorite", path, username=user)
+    await run.request("DELETE", "/places/{slug}/favorite", path, username=user)
+
+
+@scenario("write_place")
+async def _(run: Run, rnd: random.Random, user: str):
+    title = f"Load test place {rnd.randrange(1 << 30):x}"
+    place = {
+        "title": title,
+        "description": "Created by the load driver",
+        "body": "Load test",
+        "location": {"type": "Point", "coordinates": [106, -6]},
+        "capacity": 10,
+        "tagList": ["loadtest"],
+    }
+    response = await run.request(
+        "POST", "/places", "/places", username=user, json={"place": place}
+    )
+    slug = _json(response).get("place", {}).get("slug")
+    if slug:
+        path = f"/places/{slug}"
+        await run.request(
+            "PUT",
+            "/places/{slug}",
+            path,
+            username=user,
+            json={"place": {"body": "Updated by the load driver"}},
+        )
+        await run.request("DELETE", "/places/{slug}", path, username=user)
+
+
+@scenario("list_posts")
+async def _(run: Run, rnd: random.Random, user: str):
+    offset = rnd.randrange(0, 200, 20)
+    await run.request("GET", "/posts", "/posts", params={"offset": offset})
+
+
+@scenario("post_feed")
+async def _(run: Run, rnd: random.Random, user: str):
+    await run.request("GET", "/posts/feed", "/posts/feed", username=user)
+
+
+@scenario("get_post")
+async def _(run: Run, rnd: random.Random, user: str):
+    slug = rnd.choice(run.manifest["posts"])
+    await run.request("GET", "/posts/{slug}", f"/posts/{slug}", username=user)
+
+
+@scenario("like_post")
+async def _(run: Run, rnd: random.Random, user: str):
+    slug = rnd.choice(run.manifest["posts"])
+    path = f"/posts/{slug}/like"
+    await run.request("POST", "/posts/{slug}/like", path, username=user)
+    await run.request("DELETE", "/posts/{slug}/like", path, username=user)
+
+
+@scenario("comments")
+async def _(run: Run, rnd: random.Random, user: str):
+    slug = rnd.choice(run.manifest["posts"])
+    path = f"/posts/{slug}/comments"
+    await run.request("GET", "/posts/{slug}/comments", path)
+    if rnd.random() < 0.2:
+        await run.request(
+            "POST",
+            "/posts/{slug}/comments",
+            path,
+            username=user,
+            json={"comment": {"body": "Load test comment"}},
+        )
+
+
+@scenario("profile")
+async def _(run: Run, rnd: random.Random, user: str):
+    username = rnd.choice(run.manifest["users"])
+    await run.request(
+        "GET", "/profiles/{username}", f"/profiles/{username}", username=user
+    )
+
+
+@scenario("followings")
+async def _(run: Run, rnd: random.Random, user: str):
+    username = rnd.choice(run.manifest["users"])
+    path = f"/profiles/{username}/followings"
+    await run.request("GET", "/profiles/{username}/followings", path)
+
+
+@scenario("follow")
+async def _(run: Run, rnd: random.Random, user: str):
+    username = rnd.choice(run.manifest["users"])
+    if username == user:
+        return
+    path = f"/profiles/{username}/follow"
+    await run.request("POST", "/profiles/{username}/follow", path, username=user)
+    await run.request("DELETE", "/profiles/{username}/follow", path, username=user)
+
+
+@scenario("search")
+async def _(run: Run, rnd: random.Random, user: str):
+    params = {
+        "q": " ".join(rnd.sample(WORDS, 2)),
+        "type": rnd.choice(["places", "posts"]),
+    }
+    if params["type"] == "places" and rnd.random() < 0.3:
+        params["lng"], params["lat"] = rnd.choice(CITIES)
+    response = await run.request("GET", "/search", "/search", params=params)
+    cursor = _json(response).get("nextCursor")
+    if cursor:
+        await run.request(
+            "GET", "/search", "/search", params={**params, "cursor": cursor}
+        )
+
+
+@scenario("tags")
+async def _(run: Run, rnd: random.Random, user: str):
+    await run.request("GET", "/tags", "/tags")
+
+
+@scenario("current_user")
+async def _(run: Run, rnd: random.Random, user: str):
+    await run.request("GET", "/user", "/user", username=user)
+
+
+@scenario("login")
+async def _(run: Run, rnd: random.Random, user: str):
+    await run.request(
+        "POST",
+        "/users/login",
+        "/users/login",
+        json={
+            "user": {
+                "email": f"{user}@example.com",
+                "password": run.manifest["password"],
+            }
+        },
+    )
+
+
+# roughly the production split: mostly reads of listings and detail pages
+DEFAULT_MIX = {
+    "list_places": 18,
+    "list_places_by_author": 5,
+    "place_feed": 5,
+    "get_place": 20,
+    "favorite_place": 2,
+    "write_place": 1,
+    "list_posts": 10,
+    "post_feed": 3,
+    "get_post": 12,
+    "like_post": 2,
+    "comments": 6,
+    "profile": 8,
+    "followings": 2,
+    "follow": 1,
+    "search": 3,
+    "tags": 4,
+    "current_user": 2,
+    "login": 1,
+}
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, value.split(",")):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}")
+        mix[name] = int(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(timings: List[float], errors: int, duration: float) -> dict:
+    return {
+        "count": len(timings),
+        "errors": errors,
+        "mean_ms": round(sum(timings) / len(timings), 2),
+        "p50_ms": round(percentile(timings, 0.50), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+        "p99_ms": round(percentile(timings, 0.99), 2),
+        "rps": round(len(timings) / duration, 1),
+    }
+
+
+async def drive(args: argparse.Namespace, manifest: dict) -> dict:
+    mix = args.mix
+    names, weights = list(mix), list(mix.values())
+    rnd = random.Random(args.seed)
+    users = rnd.sample(manifest["users"], min(args.concurrency, len(manifest["users"])))
+
+    async with httpx.AsyncClient(
+        base_url=args.base_url, timeout=args.timeout
+    ) as client:
+        run = Run(client, manifest)
+        for user in users:
+            await run.login(user)
+
+        async def worker(n: int, count: int):
+            worker_rnd = random.Random(f"{args.seed}-{n}")
+            user = users[n % len(users)]
+            for _ in range(count):
+                name = worker_rnd.choices(names, weights)[0]
+                await SCENARIOS[name](run, worker_rnd, user)
+
+        def split(total: int) -> List[int]:
+            return [
+                total // args.concurrency + (n < total % args.concurrency)
+                for n in range(args.concurrency)
+            ]
+
+        run.recording = False
+        await asyncio.gather(
+            *(worker(n, count) for n, count in enumerate(split(args.warmup)))
+        )
+        run.recording = True
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(worker(n, count) for n, count in enumerate(split(args.requests)))
+        )
+        duration = time.perf_counter() - started
+
+    all_timings = [value for values in run.timings.values() for value in values]
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "started_at": datetime.utcnow().isoformat(),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "scenarios": args.requests,
+            "duration_s": round(duration, 2),
+            "seed": args.seed,
+            "dataset": manifest["counts"],
+            "mix": mix,
+        },
+        "total": summarize(all_timings, sum(run.errors.values()), duration),
+        "routes": {
+            route: summarize(timings, run.errors[route], duration)
+            for route, timings in sorted(run.timings.items())
+        },
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(result: dict, baseline: dict, max_regression: float) -> List[str]:
+    found = []
+    for route, stats in result["routes"].items():
+        before = baseline["routes"].get(route)
+        if not before:
+            continue
+        limit = before["p95_ms"] * (1 + max_regression)
+        if stats["p95_ms"] > limit:
+            found.append(
+                f"{route}: p95 {stats['p95_ms']}ms, baseline {before['p95_ms']}ms"
+            )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000/api")
+    parser.add_argument("--manifest", default="bench/dataset.json")
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=2000,
+        help="scenarios to run, some send several requests",
+    )
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=34)
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help="weight overrides, e.g. 'login=0,get_place=40'",
+    )
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="report of an earlier run to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+
+    result = asyncio.run(drive(args, manifest))
+    report = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    print(report)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(result, json.load(f), args.max_regression)
+        for line in found:
+            print(f"regression: {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
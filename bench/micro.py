@@ -0,0 +1,269 @@
+"""
+Time the CPU-bound work every request does and append the results to a history file.
+
+    python -m bench.micro --label "before orjson"
+    python -m bench.micro --filter jwt --no-save
+
+Each case reports the best and median microseconds per call over ``--repeat``
+rounds. Runs are appended as JSON lines to ``--history`` together with the commit
+they were taken on, and the table printed at the end compares every case with its
+previous entry, so an optimization is judged by numbers from the same machine.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import timeit
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+import jwt
+from bson import ObjectId
+from pydantic import ValidationError
+from starlette.requests import Request
+from slugify import slugify
+from starlette.exceptions import HTTPException
+from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
+
+from app.core.config import SECRET_KEY
+from app.core.errors import http_422_error_handler
+from app.core.jwt import ALGORITHM, create_access_token
+from app.core.metrics import route_template
+from app.core.rate_limit import RATE_LIMITS, MemoryStore, client_key
+from app.core.utils import create_aliased_response
+from app.main import app
+from app.models.place import ManyPlacesInResponse, PlaceInCreate, PlaceInDB
+from app.models.post import ManyPostsInResponse, PostInDB
+from app.models.profile import Profile
+from app.models.token import TokenPayload
+from app.models.util import ObjID
+
+from .trusted_rows import _hydrated_places, _hydrated_posts, page_builders
+
+PAGE_SIZES = (20, 100)
+
+
+def _run_coroutine(coroutine):
+    # the handlers never await, so driving them without an event loop is enough
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("coroutine awaited something")
+
+
+def _response_cases(page_size: int) -> Dict[str, Callable]:
+    rnd = random.Random(page_size)
+    places = [
+        PlaceInDB.from_db(row, author=Profile.from_db(author))
+        for row, author in _hydrated_places(rnd, page_size)
+    ]
+    posts = [
+        PostInDB.from_db(row, author=Profile.from_db(author))
+        for row, author in _hydrated_posts(rnd, page_size)
+    ]
+    return {
+        f"response/places/page={page_size}": lambda: create_aliased_response(
+            ManyPlacesInResponse(places=places, places_count=len(places))
+        ),
+        f"response/posts/page={page_size}": lambda: create_aliased_response(
+            ManyPostsInResponse(posts=posts, posts_count=len(posts))
+        ),
+    }
+
+
+def _jwt_cases() -> Dict[str, Callable]:
+    token = create_access_token(
+        data={"username": "user1"}, expires_delta=timedelta(days=7)
+    )
+
+    def decode():
+        payload = jwt.decode(token, str(SECRET_KEY), algorithms=[ALGORITHM])
+        return TokenPayload(**payload)
+
+    return {
+        "jwt/create_access_token": lambda: create_access_token(
+            data={"username": "user1"}, expires_delta=timedelta(days=7)
+        ),
+        "jwt/decode": decode,
+    }
+
+
+def _slugify_cases() -> Dict[str, Callable]:
+    ascii_title = " ".join(["Sunset rooftop bar above the old harbour"] * 4)
+    unicode_title = " ".join(["Café Déjà Vu — ramen & jazz, Yogyakarta"] * 4)
+    return {
+        "slugify/long-ascii": lambda: slugify(ascii_title),
+        "slugify/long-unicode": lambda: slugify(unicode_title),
+    }
+
+
+def _objid_cases() -> Dict[str, Callable]:
+    oid = ObjectId()
+    text = str(oid)
+
+    def invalid():
+        try:
+            ObjID.validate("not-an-object-id")
+        except ValueError:
+            pass
+
+    return {
+        "objid/objectid": lambda: ObjID.validate(oid),
+        "objid/string": lambda: ObjID.validate(text),
+        "objid/invalid": invalid,
+    }
+
+
+def _error_cases() -> Dict[str, Callable]:
+    try:
+        PlaceInCreate(title="Harbour", capacity="many", timeStart={"hour": 25})
+    except ValidationError as exc:
+        errors = [
+            {**error, "loc": ("body", "place", *error["loc"])} for error in exc.errors()
+        ]
+    exc = HTTPException(status_code=HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
+    return {
+        "errors/http_422_error_handler": lambda: _run_coroutine(
+            http_422_error_handler(None, exc)
+        )
+    }
+
+
+def _rate_limit_cases() -> Dict[str, Callable]:
+    token = create_access_token(
+        data={"username": "user1"}, expires_delta=timedelta(days=7)
+    ).decode()
+
+    def request(path: str, authorization: str = "") -> Request:
+        headers = [(b"authorization", authorization.encode())] if authorization else []
+        return Request(
+            {
+                "type": "http",
+                "method": "GET",
+                "path": path,
+                "headers": headers,
+                "client": ("10.0.0.1", 1234),
+                "app": app,
+            }
+        )
+
+    store = MemoryStore()
+    budget = RATE_LIMITS[("GET", "/api/places")]
+    # a budget that never runs out, so every call takes a token
+    budget = budget._replace(limit=10**9)
+    return {
+        "ratelimit/route_template": lambda: route_template(
+            request("/api/places/some-slug/favorite")
+        ),
+        "ratelimit/client_key/token": lambda: client_key(
+            request("/api/places", f"Token {token}")
+        ),
+        "ratelimit/client_key/address": lambda: client_key(request("/api/places")),
+        "ratelimit/memory_store": lambda: _run_coroutine(
+            store.hit("GET /api/places user:user1", budget, 1)
+        ),
+    }
+
+
+def cases() -> Dict[str, Callable]:
+    found = {}
+    for page_size in PAGE_SIZES:
+        found.update(
+            {
+                f"models/{name}/page={page_size}": fn
+                for name, fn in page_builders(page_size).items()
+                if not name.startswith("users/")
+            }
+        )
+        found.update(_response_cases(page_size))
+    found.update(_jwt_cases())
+    found.update(_slugify_cases())
+    found.update(_objid_cases())
+    found.update(_error_cases())
+    found.update(_rate_limit_cases())
+    return found
+
+
+def measure(fn: Callable, repeat: int) -> dict:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    rounds = [seconds / number * 1e6 for seconds in timer.repeat(repeat, number)]
+    return {
+        "best_us": round(min(rounds), 3),
+        "median_us": round(statistics.median(rounds), 3),
+        "number": number,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode()
+        dirty = subprocess.call(
+            ["git", "diff", "--quiet", "HEAD"], stderr=subprocess.DEVNULL
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit.strip() + ("-dirty" if dirty else "")
+
+
+def previous_results(history: str) -> Dict[str, dict]:
+    """
+    Latest recorded result of every case.
+    """
+    latest = {}
+    try:
+        with open(history) as f:
+            for line in f:
+                latest.update(json.loads(line)["results"])
+    except FileNotFoundError:
+        pass
+    return latest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="only run cases containing this")
+    parser.add_argument("--history", default="bench/history.jsonl")
+    parser.add_argument("--label", default="", help="note stored with the run")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    previous = previous_results(args.history)
+    results = {
+        name: measure(fn, args.repeat)
+        for name, fn in cases().items()
+        if args.filter in name
+    }
+
+    print(f"{'case':<40}{'best us':>12}{'median us':>12}{'vs last':>10}")
+    for name, result in results.items():
+        change = ""
+        if name in previous:
+            ratio = result["best_us"] / previous[name]["best_us"] - 1
+            change = f"{ratio:+.1%}"
+        print(
+            f"{name:<40}{result['best_us']:>12.2f}"
+            f"{result['median_us']:>12.2f}{change:>10}"
+        )
+
+    if not args.no_save:
+        entry = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "commit": _git_commit(),
+            "label": args.label,
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "results": results,
+        }
+        with open(args.history, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+if __name__ == "__main__":
+    main()
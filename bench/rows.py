@@ -0,0 +1,94 @@
+"""
+Factories for realistic raw Mongo rows, shaped like the documents the services write.
+"""
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from slugify import slugify
+
+WORDS = (
+    "coffee roastery harbour night market rooftop garden museum trail waterfall "
+    "temple street food ramen bakery jazz bar gallery beach sunset hostel "
+    "mountain lake cabin vineyard brewery bookshop library park"
+).split()
+
+
+# (longitude, latitude) of the cities places cluster around
+CITIES = [(106.8, -6.2), (110.4, -7.8), (115.2, -8.7), (112.7, -7.3), (98.7, 3.6)]
+
+
+def make_location(rnd: random.Random) -> dict:
+    longitude, latitude = rnd.choice(CITIES)
+    return {
+        "type": "Point",
+        "coordinates": [
+            round(rnd.gauss(longitude, 0.3)),
+            round(rnd.gauss(latitude, 0.3)),
+        ],
+    }
+
+
+def _title(rnd: random.Random, words: int = 6) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _sentence(rnd: random.Random, words: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(words)) + "."
+
+
+def make_user_row(rnd: random.Random, n: int) -> dict:
+    username = f"user{n}"
+    return {
+        "_id": ObjectId(),
+        "username": username,
+        "email": f"{username}@example.com",
+        "bio": _sentence(rnd, 12),
+        "image": f"https://cdn.example.com/avatars/{username}.png",
+        "salt": "$2b$12$abcdefghijklmnopqrstuv",
+        "hashed_password": "$2b$12$" + "x" * 53,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def make_profile_row(rnd: random.Random, n: int) -> dict:
+    user = make_user_row(rnd, n)
+    return {
+        "username": user["username"],
+        "bio": user["bio"],
+        "image": user["image"],
+        "following": rnd.random() < 0.3,
+    }
+
+
+def make_place_row(rnd: random.Random, author: str) -> dict:
+    title = _title(rnd)
+    return {
+        "_id": ObjectId(),
+        "title": title,
+        "slug": slugify(title) + f"-{rnd.randrange(1 << 30):x}",
+        "description": _sentence(rnd, 20),
+        "body": " ".join(_sentence(rnd, 15) for _ in range(10)),
+        "location": make_location(rnd),
+        "capacity": rnd.randint(5, 500),
+        "time_start": {"hour": rnd.randint(6, 11), "minute": 0},
+        "time_end": {"hour": rnd.randint(17, 23), "minute": 30},
+        "tag_list": rnd.sample(WORDS, 3),
+        "author_id": author,
+        "updated_at": datetime.utcnow() - timedelta(minutes=rnd.randint(0, 10_000)),
+    }
+
+
+def make_post_row(rnd: random.Random, author: str, place_slug: str) -> dict:
+    title = _title(rnd)
+    return {
+        "_id": ObjectId(),
+        "title": title,
+        "slug": slugify(title) + f"-{rnd.randrange(1 << 30):x}",
+        "type": rnd.randint(0, 1),
+        "body": " ".join(_sentence(rnd, 15) for _ in range(20)),
+        "place": place_slug,
+        "tag_list": rnd.sample(WORDS, 3),
+        "author_id": author,
+        "updated_at": datetime.utcnow() - timedelta(minutes=rnd.randint(0, 10_000)),
+    }
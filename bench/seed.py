@@ -0,0 +1,211 @@
+"""
+Fill a database with a synthetic, reproducible dataset for load tests.
+
+    python -m bench.seed --users 200 --seed 34 --drop --manifest bench/dataset.json
+
+Documents are built with the same models and extra fields the services write, so
+the load driver exercises realistic rows. The same ``--seed`` always produces the
+same users, slugs and relations, which keeps runs comparable between commits.
+The manifest lists what was created and is read by ``bench.load``.
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime
+from typing import Iterable, List
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import (
+    MONGODB_URL,
+    comments_collection_name,
+    database_name,
+    favorites_collection_name,
+    followers_collection_name,
+    likes_collection_name,
+    place_collection_name,
+    post_collection_name,
+    tags_collection_name,
+    users_collection_name,
+)
+from app.db.indexes import create_indexes
+from app.models.comment import CommentInCreate
+from app.models.place import PlaceInCreate
+from app.models.post import PostInCreate
+from app.models.user import UserInDB
+from app.services.counters import reconcile_counters
+
+from .rows import _sentence, make_place_row, make_post_row, make_user_row
+
+PASSWORD = "bench-password"
+INSERT_BATCH_SIZE = 1000
+
+
+def build_users(rnd: random.Random, count: int) -> List[dict]:
+    # hashing is deliberately slow, every seeded user shares one password
+    template = UserInDB(username="template", email="template@example.com")
+    template.change_password(PASSWORD)
+
+    users = []
+    for n in range(count):
+        row = make_user_row(rnd, n)
+        user = UserInDB(
+            username=row["username"],
+            email=row["email"],
+            bio=row["bio"],
+            image=row["image"],
+            salt=template.salt,
+            hashed_password=template.hashed_password,
+        )
+        users.append(user.dict())
+    return users
+
+
+def build_places(rnd: random.Random, usernames: List[str], per_user: int) -> List[dict]:
+    places = []
+    for username in usernames:
+        for _ in range(per_user):
+            row = make_place_row(rnd, username)
+            doc = PlaceInCreate(**row).dict()
+            doc["slug"] = row["slug"]
+            doc["author_id"] = username
+            doc["updated_at"] = datetime.utcnow()
+            places.append(doc)
+    return places
+
+
+def build_posts(
+    rnd: random.Random, usernames: List[str], place_slugs: List[str], per_user: int
+) -> List[dict]:
+    posts = []
+    for username in usernames:
+        for _ in range(per_user):
+            row = make_post_row(rnd, username, rnd.choice(place_slugs))
+            doc = PostInCreate(**row).dict()
+            doc["slug"] = row["slug"]
+            doc["author_id"] = username
+            doc["updated_at"] = datetime.utcnow()
+            posts.append(doc)
+    return posts
+
+
+def build_comments(
+    rnd: random.Random, usernames: List[str], post_slugs: List[str], per_post: int
+) -> List[dict]:
+    comments = []
+    for slug in post_slugs:
+        for _ in range(rnd.randint(0, 2 * per_post)):
+            doc = CommentInCreate(body=_sentence(rnd, 12)).dict()
+            doc["slug"] = slug
+            doc["username"] = rnd.choice(usernames)
+            comments.append(doc)
+    return comments
+
+
+def pick_pairs(
+    rnd: random.Random, owners: List, targets: List, per_owner: int
+) -> Iterable[tuple]:
+    for owner in owners:
+        for target in rnd.sample(targets, min(per_owner, len(targets))):
+            yield owner, target
+
+
+async def insert(conn: AsyncIOMotorClient, collection_name: str, docs: List[dict]):
+    collection = conn[database_name][collection_name]
+    for start in range(0, len(docs), INSERT_BATCH_SIZE):
+        await collection.insert_many(
+            docs[start : start + INSERT_BATCH_SIZE], ordered=False
+        )
+
+
+async def seed(args: argparse.Namespace) -> dict:
+    rnd = random.Random(args.seed)
+    conn = AsyncIOMotorClient(str(MONGODB_URL))
+    if args.drop:
+        await conn.drop_database(database_name)
+
+    users = build_users(rnd, args.users)
+    usernames = [user["username"] for user in users]
+    await insert(conn, users_collection_name, users)
+    # insert_many fills in _id on the documents it was given
+    user_ids = [user["_id"] for user in users]
+
+    places = build_places(rnd, usernames, args.places_per_user)
+    await insert(conn, place_collection_name, places)
+    place_slugs = [place["slug"] for place in places]
+
+    posts = build_posts(rnd, usernames, place_slugs, args.posts_per_user)
+    await insert(conn, post_collection_name, posts)
+    post_slugs = [post["slug"] for post in posts]
+
+    favorites = [
+        {"user_id": user_id, "place_id": place["_id"]}
+        for user_id, place in pick_pairs(rnd, user_ids, places, args.favorites_per_user)
+    ]
+    likes = [
+        {"user_id": user_id, "post_id": post["_id"]}
+        for user_id, post in pick_pairs(rnd, user_ids, posts, args.likes_per_user)
+    ]
+    follows = [
+        {"follower": follower, "following": following}
+        for follower, following in pick_pairs(
+            rnd, usernames, usernames, args.follows_per_user
+        )
+        if follower != following
+    ]
+    comments = build_comments(rnd, usernames, post_slugs, args.comments_per_post)
+    tags = sorted({tag for doc in places + posts for tag in doc["tag_list"]})
+
+    await insert(conn, favorites_collection_name, favorites)
+    await insert(conn, likes_collection_name, likes)
+    await insert(conn, followers_collection_name, follows)
+    await insert(conn, comments_collection_name, comments)
+    await insert(conn, tags_collection_name, [{"tag": tag} for tag in tags])
+    await create_indexes(conn)
+    # rows are inserted directly, the counters the services keep are filled in here
+    await reconcile_counters(conn)
+    conn.close()
+
+    return {
+        "seed": args.seed,
+        "password": PASSWORD,
+        "users": usernames,
+        "places": place_slugs,
+        "posts": post_slugs,
+        "tags": tags,
+        "counts": {
+            "users": len(users),
+            "places": len(places),
+            "posts": len(posts),
+            "favorites": len(favorites),
+            "likes": len(likes),
+            "follows": len(follows),
+            "comments": len(comments),
+            "tags": len(tags),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--places-per-user", type=int, default=10)
+    parser.add_argument("--posts-per-user", type=int, default=10)
+    parser.add_argument("--favorites-per-user", type=int, default=30)
+    parser.add_argument("--likes-per-user", type=int, default=30)
+    parser.add_argument("--follows-per-user", type=int, default=20)
+    parser.add_argument("--comments-per-post", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=34)
+    parser.add_argument("--drop", action="store_true", help="drop the database first")
+    parser.add_argument("--manifest", default="bench/dataset.json")
+    args = parser.parse_args()
+
+    manifest = asyncio.run(seed(args))
+    with open(args.manifest, "w") as f:
+        json.dump(manifest, f)
+    print(json.dumps(manifest["counts"]))
+
+
+if __name__ == "__main__":
+    main()
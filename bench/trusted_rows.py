@@ -0,0 +1,104 @@
+"""
+Compare validated and trusted (``RWModel.from_db``) construction of one listing page.
+
+    python -m bench.trusted_rows --page-size 20 --number 200
+"""
+import argparse
+import random
+import timeit
+import tracemalloc
+
+from bson import ObjectId
+
+from app.models.place import PlaceInDB
+from app.models.post import PostInDB
+from app.models.profile import Profile
+from app.models.user import UserInDB
+
+from .rows import make_place_row, make_post_row, make_profile_row, make_user_row
+
+
+def _hydrated_places(rnd: random.Random, size: int):
+    rows = []
+    for n in range(size):
+        row = make_place_row(rnd, f"user{n}")
+        row["created_at"] = ObjectId(row["_id"]).generation_time
+        row["favorites_count"] = rnd.randint(0, 1000)
+        row["favorited"] = False
+        rows.append((row, make_profile_row(rnd, n)))
+    return rows
+
+
+def _hydrated_posts(rnd: random.Random, size: int):
+    rows = []
+    for n in range(size):
+        row = make_post_row(rnd, f"user{n}", "some-place")
+        row["created_at"] = ObjectId(row["_id"]).generation_time
+        row["likes_count"] = rnd.randint(0, 1000)
+        row["liked"] = False
+        rows.append((row, make_profile_row(rnd, n)))
+    return rows
+
+
+def page_builders(page_size: int, seed: int = 0):
+    rnd = random.Random(seed)
+    places = _hydrated_places(rnd, page_size)
+    posts = _hydrated_posts(rnd, page_size)
+    users = [make_user_row(rnd, n) for n in range(page_size)]
+
+    return {
+        "places/validated": lambda: [
+            PlaceInDB(**row, author=Profile(**author)) for row, author in places
+        ],
+        "places/trusted": lambda: [
+            PlaceInDB.from_db(row, author=Profile.from_db(author))
+            for row, author in places
+        ],
+        "posts/validated": lambda: [
+            PostInDB(**row, author=Profile(**author)) for row, author in posts
+        ],
+        "posts/trusted": lambda: [
+            PostInDB.from_db(row, author=Profile.from_db(author))
+            for row, author in posts
+        ],
+        "users/validated": lambda: [UserInDB(**row) for row in users],
+        "users/trusted": lambda: [UserInDB.from_db(row) for row in users],
+    }
+
+
+def measure(fn, number: int) -> dict:
+    seconds = min(timeit.repeat(fn, number=number, repeat=3)) / number
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"us_per_page": seconds * 1e6, "peak_kib_per_page": peak / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    results = {
+        name: measure(fn, args.number)
+        for name, fn in page_builders(args.page_size).items()
+    }
+
+    print(f"{'case':<20}{'us/page':>12}{'peak KiB':>12}")
+    for name, result in results.items():
+        print(
+            f"{name:<20}{result['us_per_page']:>12.1f}"
+            f"{result['peak_kib_per_page']:>12.1f}"
+        )
+    for kind in ("places", "posts", "users"):
+        validated = results[f"{kind}/validated"]["us_per_page"]
+        trusted = results[f"{kind}/trusted"]["us_per_page"]
+        print(f"{kind}: trusted construction is {validated / trusted:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import re
+
+import pytest
+from starlette.testclient import TestClient
+
+from app.core.config import API_V1_STR, MAX_BULK_SIZE
+from app.core.jwt import get_current_user_authorizer
+from app.db.repositories import counter_repository, job_repository, place_repository
+from app.main import app
+from app.models.user import User
+
+USER = User(username="importer", email="importer@example.com", token="token")
+
+
+def _item(title: str, **extra) -> dict:
+    return {
+        "title": title,
+        "description": "d",
+        "body": "b",
+        "location": {"type": "Point", "coordinates": [1, 2]},
+        "capacity": 3,
+        **extra,
+    }
+
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[get_current_user_authorizer()] = lambda: USER
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    calls = {"inserted": [], "counters": [], "jobs": []}
+
+    async def find_existing_slugs(conn, slugs):
+        return {slug for slug in slugs if slug == "taken" or slug.startswith("full")}
+
+    async def insert_places(conn, docs):
+        calls["inserted"].extend(doc["slug"] for doc in docs)
+        # the unique index rejects one of them
+        return {
+            position: "E11000 duplicate key error"
+            for position, doc in enumerate(docs)
+            if doc["slug"] == "raced"
+        }
+
+    async def increment_counters(conn, deltas, key="username"):
+        calls["counters"].append(deltas)
+
+    async def enqueue_job(conn, name, payload, run_at):
+        calls["jobs"].append((name, payload))
+
+    monkeypatch.setattr(place_repository, "find_existing_slugs", find_existing_slugs)
+    monkeypatch.setattr(place_repository, "insert_places", insert_places)
+    monkeypatch.setattr(counter_repository, "increment_counters", increment_counters)
+    monkeypatch.setattr(job_repository, "enqueue_job", enqueue_job)
+    return calls
+
+
+def test_bulk_import_reports_each_item(client, writes):
+    items = [
+        _item("Created", tagList=["beach"]),
+        {"title": "Missing fields"},
+        _item("Created"),
+        _item("Taken"),
+        _item("Raced", tagList=["night"]),
+        _item("Full"),
+    ]
+
+    response = client.post(f"{API_V1_STR}/places/bulk", json={"places": items})
+
+    body = response.json()
+    results = [(r["index"], r["status"], r["slug"]) for r in body["results"]]
+    assert results[0] == (0, "created", "created")
+    assert results[1] == (1, "failed", None)
+    assert results[5] == (5, "failed", None)
+    # collisions in the batch, with stored slugs and with concurrent writes
+    # move on to a suffixed slug, like single creates
+    for (index, status, slug), title in zip(
+        results[2:5], ["created", "taken", "raced"]
+    ):
+        assert status == "created"
+        assert re.fullmatch(f"{title}-[0-9a-z]+", slug)
+    errors = [r["error"] for r in body["results"]]
+    assert "description: field required" in errors[1]
+    assert errors[5] == "No free slug left for 'Full'"
+    assert (body["createdCount"], body["failedCount"]) == (4, 2)
+
+    # one round for the first candidates, one for the suffixed retries
+    assert writes["inserted"] == [
+        "created",
+        results[2][2],
+        "raced",
+        results[3][2],
+        results[4][2],
+    ]
+    assert writes["counters"] == [{"importer": {"places": 4}}]
+    # only the tags of what was created are added
+    assert writes["jobs"] == [("upsert_tags", {"tags": ["beach", "night"]})]
+
+
+@pytest.mark.parametrize("key", ["places", "posts"])
+def test_bulk_import_is_limited(client, writes, key):
+    items = [_item(f"Item {n}") for n in range(MAX_BULK_SIZE + 1)]
+
+    response = client.post(f"{API_V1_STR}/{key}/bulk", json={key: items})
+
+    assert response.status_code == 422
+    assert response.json() == {
+        "errors": {"body": [f"At most {MAX_BULK_SIZE} {key} can be imported at once"]}
+    }
+    assert not writes["inserted"]
@@ -0,0 +1,122 @@
+import json
+
+import pytest
+from bson import ObjectId
+from starlette.testclient import TestClient
+
+from app.api.api_v1.endpoints import place as place_endpoints
+from app.api.api_v1.endpoints import post as post_endpoints
+from app.core.config import API_V1_STR, MAX_PAGE_SIZE
+from app.core.utils import encode_cursor
+from app.main import app
+from app.models.place import PlaceInDB
+from app.models.post import PostInDB
+from app.models.profile import Profile
+
+AUTHOR = Profile(username="author")
+
+
+def _place(n: int) -> PlaceInDB:
+    return PlaceInDB(
+        id=ObjectId(),
+        slug=f"place-{n}",
+        title=f"Place {n}",
+        description="d",
+        body="b",
+        capacity=3,
+        location={"type": "Point", "coordinates": [1, 2]},
+        author=AUTHOR,
+        favorited=False,
+        favoritesCount=0,
+    )
+
+
+def _post(n: int) -> PostInDB:
+    return PostInDB(
+        id=ObjectId(),
+        slug=f"post-{n}",
+        title=f"Post {n}",
+        type=0,
+        body="b",
+        place="place-0",
+        author=AUTHOR,
+        liked=False,
+        likesCount=0,
+    )
+
+
+class Export:
+    """
+    Stands in for the export service, resuming after the id it is given.
+    """
+
+    def __init__(self, rows, batch_size: int = 2):
+        self.rows = rows
+        self.batch_size = batch_size
+        self.calls = []
+
+    async def __call__(self, conn, after=None, username=None):
+        self.calls.append(after)
+        ids = [row.id for row in self.rows]
+        rows = self.rows[ids.index(after) + 1 :] if after else self.rows
+        for start in range(0, len(rows), self.batch_size):
+            yield rows[start : start + self.batch_size]
+
+
+def _lines(response) -> list:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.mark.parametrize(
+    "path,module,service,make,key",
+    [
+        ("places", place_endpoints, "export_places", _place, "place"),
+        ("posts", post_endpoints, "export_posts", _post, "post"),
+    ],
+)
+def test_export_streams_every_row_and_resumes_from_a_cursor(
+    monkeypatch, path, module, service, make, key
+):
+    export = Export([make(n) for n in range(5)])
+    monkeypatch.setattr(module, service, export)
+    client = TestClient(app)
+
+    response = client.get(f"{API_V1_STR}/{path}/export")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = _lines(response)
+    assert [line[key]["slug"] for line in lines] == [f"{key}-{n}" for n in range(5)]
+
+    # each line carries the cursor to resume after it
+    resumed = _lines(
+        client.get(f"{API_V1_STR}/{path}/export", params={"cursor": lines[1]["cursor"]})
+    )
+    assert export.calls == [None, export.rows[1].id]
+    assert [line[key]["slug"] for line in resumed] == [
+        f"{key}-{n}" for n in range(2, 5)
+    ]
+
+
+@pytest.mark.parametrize("path", ["places", "posts"])
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor",
+        encode_cursor({"after": "place-1"}),
+        # valid base64 and JSON, but not a valid ObjectId
+        "eyJhZnRlciI6IHsiJG9pZCI6ICJ6eiJ9fQ",
+    ],
+)
+def test_malformed_cursor_is_rejected(path, cursor):
+    # no database is connected, these must fail before reaching it
+    response = TestClient(app).get(
+        f"{API_V1_STR}/{path}/export", params={"cursor": cursor}
+    )
+    assert response.json() == {"errors": ["Invalid cursor"]}
+
+
+@pytest.mark.parametrize("path", ["places", "posts"])
+def test_page_size_is_capped(path):
+    response = TestClient(app).get(
+        f"{API_V1_STR}/{path}", params={"limit": MAX_PAGE_SIZE + 1}
+    )
+    assert response.status_code == 422
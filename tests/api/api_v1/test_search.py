@@ -0,0 +1,35 @@
+import pytest
+from bson import ObjectId
+from starlette.exceptions import HTTPException
+from starlette.testclient import TestClient
+
+from app.api.api_v1.endpoints.search import _decode_position, _encode_position
+from app.core.config import API_V1_STR
+from app.core.utils import encode_cursor
+from app.main import app
+
+
+def test_cursor_keeps_score_and_id():
+    position = (1.8333333333333335, ObjectId())
+    assert _decode_position(_encode_position(position)) == position
+    assert _decode_position("") is None
+    assert _encode_position(None) is None
+
+
+def test_cursor_without_score_is_rejected():
+    with pytest.raises(HTTPException) as exc:
+        _decode_position(encode_cursor({"after": ObjectId()}))
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"q": "coffee", "lat": 3.6},
+        {"q": "coffee", "type": "posts", "lng": 98.7, "lat": 3.6},
+    ],
+)
+def test_location_filters_are_checked_before_searching(params):
+    # no database is connected, these must fail before reaching it
+    response = TestClient(app).get(f"{API_V1_STR}/search", params=params)
+    assert "errors" in response.json()
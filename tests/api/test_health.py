@@ -0,0 +1,15 @@
+from starlette.testclient import TestClient
+
+from app.core.warmup import readiness
+from app.main import app
+
+
+def test_live_does_not_need_the_database():
+    response = TestClient(app).get("/health/live")
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+
+def test_not_ready_before_warm_up():
+    assert not readiness.warm
+    assert TestClient(app).get("/health/ready").status_code == 503
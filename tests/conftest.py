@@ -1,7 +1,11 @@
 from pytest import fixture
 from starlette.config import environ
+
+# This line would raise an error if we use it after 'settings' has been imported.
+environ["TESTING"] = "TRUE"
+
 from starlette.testclient import TestClient
-from app.db.mongodb import get_database
+from app.db.mongodb import db
 from app.core.config import database_name, users_collection_name
 
 
@@ -23,13 +27,10 @@ def test_client(test_user):
     with TestClient(app) as test_client:
         yield test_client
 
-    import asyncio
+        import asyncio
 
-    db = asyncio.run(get_database())
-    db[database_name][users_collection_name].delete_one(
-        {"username": test_user["user"]["username"]}
-    )
-
-
-# This line would raise an error if we use it after 'settings' has been imported.
-environ["TESTING"] = "TRUE"
+        asyncio.get_event_loop().run_until_complete(
+            db.client[database_name][users_collection_name].delete_one(
+                {"username": test_user["user"]["username"]}
+            )
+        )
@@ -0,0 +1,98 @@
+import asyncio
+
+from bson.timestamp import Timestamp
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.testclient import TestClient
+
+from app.api.api_v1.endpoints import place as place_endpoints
+from app.core.causal import (
+    causal_consistency_middleware,
+    decode_causal_token,
+    encode_causal_token,
+)
+from app.core.config import CAUSAL_TOKEN_HEADER
+from app.db.causal import (
+    CausalState,
+    CausalToken,
+    causal_state,
+    start_causal_session,
+)
+from app.db.repositories.base import LISTING, READ, get_collection
+
+token = CausalToken(
+    operation_time=Timestamp(1589711415, 3),
+    cluster_time={"clusterTime": Timestamp(1589711415, 3), "signature": {"keyId": 0}},
+)
+
+
+def test_token_round_trip():
+    assert decode_causal_token(encode_causal_token(token)) == token
+
+
+def test_tampered_token_is_ignored():
+    payload, _, signature = encode_causal_token(token).partition(".")
+    assert decode_causal_token(f"{payload}x.{signature}") is None
+    assert decode_causal_token("garbage") is None
+
+
+def test_get_requests_read_from_secondaries():
+    conn = AsyncIOMotorClient("mongodb://localhost:27017", connect=False)
+    state = CausalState()
+    reset = causal_state.set(state)
+    try:
+        assert get_collection(conn, "places", READ).read_preference == (
+            ReadPreference.PRIMARY
+        )
+        state.secondary_reads = True
+        assert get_collection(conn, "places", READ).read_preference == (
+            ReadPreference.SECONDARY_PREFERRED
+        )
+        assert get_collection(conn, "places", LISTING).read_preference == (
+            LISTING.read_preference
+        )
+    finally:
+        causal_state.reset(reset)
+
+
+def test_sessions_are_ended_with_the_request():
+    conn = AsyncIOMotorClient("mongodb://localhost:27017", connect=False)
+    state = CausalState(token)
+    reset = causal_state.set(state)
+    try:
+        session = start_causal_session(conn)
+        assert state.sessions == [session]
+        state.end_sessions()
+    finally:
+        causal_state.reset(reset)
+    assert session.has_ended and not state.sessions
+
+
+def test_sessions_of_a_streamed_export_are_ended_after_the_body(monkeypatch):
+    conn = AsyncIOMotorClient("mongodb://localhost:27017", connect=False)
+    sessions = []
+
+    async def export_places(db, after=None, username=None):
+        # every batch reads with a session of its own, all after call_next returned
+        for _ in range(2):
+            # lets call_next return, as a read from mongo would
+            await asyncio.sleep(0.01)
+            session = start_causal_session(conn)
+            assert not any(started.has_ended for started in sessions)
+            sessions.append(session)
+            yield []
+
+    monkeypatch.setattr(place_endpoints, "export_places", export_places)
+    app = FastAPI()
+    app.add_middleware(BaseHTTPMiddleware, dispatch=causal_consistency_middleware)
+    app.include_router(place_endpoints.router)
+
+    response = TestClient(app).get(
+        "/places/export", headers={CAUSAL_TOKEN_HEADER: encode_causal_token(token)}
+    )
+
+    assert response.status_code == 200
+    assert len(sessions) == 2
+    assert all(session.has_ended for session in sessions)
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from starlette.requests import Request
+
+from app.core.http_cache import (
+    CacheValidators,
+    cache_headers,
+    is_not_modified,
+    make_etag,
+)
+
+validators = CacheValidators(
+    etag=make_etag("slug", 3), last_modified=datetime(2020, 5, 17, 10, 30, 15, 999)
+)
+
+
+def make_request(**headers) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [
+                (name.replace("_", "-").encode(), value.encode())
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+def test_cache_headers():
+    headers = cache_headers(validators)
+
+    assert headers["ETag"] == validators.etag
+    assert headers["Last-Modified"] == "Sun, 17 May 2020 10:30:15 GMT"
+    assert headers["Cache-Control"] == "private, no-cache"
+    assert headers["Vary"] == "Authorization"
+
+
+def test_if_none_match():
+    assert is_not_modified(make_request(if_none_match=validators.etag), validators)
+    assert is_not_modified(
+        make_request(if_none_match=f'"other", W/{validators.etag}'), validators
+    )
+    assert not is_not_modified(make_request(if_none_match='"other"'), validators)
+
+
+def test_if_modified_since():
+    assert is_not_modified(
+        make_request(if_modified_since="Sun, 17 May 2020 10:30:15 GMT"), validators
+    )
+    assert not is_not_modified(
+        make_request(if_modified_since="Sun, 17 May 2020 10:30:14 GMT"), validators
+    )
+    assert not is_not_modified(make_request(if_modified_since="garbage"), validators)
+
+
+def test_if_none_match_takes_precedence():
+    request = make_request(
+        if_none_match='"other"', if_modified_since="Sun, 17 May 2020 10:30:15 GMT"
+    )
+
+    assert not is_not_modified(request, validators)
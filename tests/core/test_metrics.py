@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from prometheus_client import REGISTRY
+from starlette.requests import Request
+from starlette.testclient import TestClient
+
+from app.core.metrics import UNMATCHED_ROUTE, route_template
+from app.db.monitoring import PoolMetrics
+from app.main import app
+
+
+def make_request(method: str, path: str) -> Request:
+    return Request({"type": "http", "method": method, "path": path, "app": app})
+
+
+def test_routes_are_labelled_by_template():
+    assert route_template(make_request("GET", "/api/places/some-slug")) == (
+        "/api/places/{slug}"
+    )
+    assert route_template(make_request("GET", "/nowhere")) == UNMATCHED_ROUTE
+
+
+def test_requests_are_counted_per_route():
+    client = TestClient(app)
+    status = str(client.get("/nowhere/1").status_code)
+    labels = {"method": "GET", "route": UNMATCHED_ROUTE, "status": status}
+    before = REGISTRY.get_sample_value("http_requests_total", labels)
+
+    client.get("/nowhere/2")
+    client.get("/nowhere/3")
+
+    assert REGISTRY.get_sample_value("http_requests_total", labels) == before + 2
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET"' in body
+
+
+def test_pool_checkouts_are_measured():
+    listener = PoolMetrics()
+    event = SimpleNamespace(address=("db", 27017))
+    labels = {"address": "db:27017"}
+
+    listener.connection_created(event)
+    listener.connection_check_out_started(event)
+    listener.connection_checked_out(event)
+
+    assert REGISTRY.get_sample_value("mongo_pool_connections", labels) == 1
+    assert REGISTRY.get_sample_value("mongo_pool_checked_out_connections", labels) == 1
+    assert (
+        REGISTRY.get_sample_value("mongo_pool_checkout_wait_seconds_count", labels) == 1
+    )
+
+    listener.connection_checked_in(event)
+    assert REGISTRY.get_sample_value("mongo_pool_checked_out_connections", labels) == 0
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from app.core import rate_limit
+from app.core.jwt import create_access_token
+from app.core.rate_limit import (
+    Budget,
+    MemoryStore,
+    client_key,
+    rate_limit_middleware,
+    sliding_window_retry_after,
+)
+
+
+def test_token_bucket_refuses_when_empty():
+    store, budget = MemoryStore(), Budget(limit=3, period=60)
+
+    async def hits(cost: int, times: int):
+        return [await store.hit("key", budget, cost) for _ in range(times)]
+
+    assert asyncio.run(hits(1, 3)) == [0.0, 0.0, 0.0]
+    # refilled at 3 tokens a minute, the next one is due in about 20 seconds
+    assert asyncio.run(hits(1, 1))[0] == pytest.approx(20, abs=0.1)
+    assert asyncio.run(store.hit("other", budget, 3)) == 0.0
+
+
+def test_sliding_window_retry_after():
+    assert sliding_window_retry_after(0, 5, 10, 60, 30) == 0
+    # 10 from the previous window still count for half: 5 + 6 > 10
+    assert sliding_window_retry_after(10, 6, 10, 60, 30) == pytest.approx(6)
+    assert sliding_window_retry_after(0, 20, 10, 60, 50) == pytest.approx(40)
+
+
+def make_request(headers: dict) -> Request:
+    raw = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "headers": raw, "client": ("10.0.0.1", 1234)})
+
+
+def test_clients_are_told_apart_by_token_or_address():
+    token = create_access_token(
+        data={"username": "alice"}, expires_delta=timedelta(minutes=5)
+    ).decode()
+    assert client_key(make_request({"Authorization": f"Token {token}"})) == (
+        "user:alice"
+    )
+    assert client_key(make_request({"Authorization": "Token forged"})) == (
+        "ip:10.0.0.1"
+    )
+    assert client_key(make_request({})) == "ip:10.0.0.1"
+
+
+def test_exhausted_budget_answers_429(monkeypatch):
+    monkeypatch.setattr(rate_limit, "store", MemoryStore())
+    app = Starlette()
+    app.add_middleware(BaseHTTPMiddleware, dispatch=rate_limit_middleware)
+
+    @app.route("/api/users/login", methods=["POST"])
+    async def login(request):
+        return PlainTextResponse("ok")
+
+    @app.route("/api/tags")
+    async def tags(request):
+        return PlainTextResponse("ok")
+
+    client = TestClient(app)
+    statuses = [client.post("/api/users/login").status_code for _ in range(10)]
+    assert statuses == [200] * 10
+
+    response = client.post("/api/users/login")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) == 6
+    assert all(client.get("/api/tags").status_code == 200 for _ in range(20))
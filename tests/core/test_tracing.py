@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+from app.core.tracing import (
+    Trace,
+    current_trace,
+    server_timing,
+    span,
+    to_otlp,
+    traced,
+)
+from app.db.monitoring import CommandTracer
+
+
+@traced
+def render(value):
+    return value
+
+
+def trace_request(fn):
+    trace = Trace()
+    reset = current_trace.set(trace)
+    try:
+        with span("GET /api/places") as root:
+            fn()
+    finally:
+        current_trace.reset(reset)
+    return trace, root
+
+
+def test_spans_nest_under_the_current_span():
+    def handler():
+        with span("service"):
+            render(1)
+
+    trace, root = trace_request(handler)
+    names = {item.name: item for item in trace.spans}
+    assert names["service"].parent_id == root.span_id
+    assert names["test_tracing.render"].parent_id == names["service"].span_id
+
+
+def test_nothing_is_recorded_without_a_sampled_request():
+    assert render(2) == 2
+    with span("service") as item:
+        assert item is None
+
+
+def test_server_timing_sums_spans_by_name():
+    trace, root = trace_request(lambda: [render(n) for n in range(3)])
+    header = server_timing(trace, root)
+    assert header.startswith("test_tracing.render;dur=")
+    assert 'desc="3x"' in header
+    assert header.split(", ")[-1].startswith("total;dur=")
+
+
+def test_commands_are_exported_as_child_spans():
+    tracer = CommandTracer()
+
+    def handler():
+        with span("service"):
+            command = {"find": "places", "filter": {}}
+            tracer.started(
+                SimpleNamespace(command_name="find", command=command, request_id=1)
+            )
+        tracer.succeeded(SimpleNamespace(request_id=1))
+
+    trace, root = trace_request(handler)
+    spans = to_otlp(trace, root)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    service, find = spans[1], spans[2]
+    assert find["name"] == "mongo.find"
+    assert find["parentSpanId"] == service["spanId"]
+    assert find["traceId"] == trace.trace_id
+    assert {"key": "db.mongodb.collection", "value": {"stringValue": "places"}} in (
+        find["attributes"]
+    )
+    assert int(find["endTimeUnixNano"]) >= int(find["startTimeUnixNano"])
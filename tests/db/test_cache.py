@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from app.db.cache import LocalCache, caches, evict
+from app.db.change_stream import InvalidationBus
+
+
+@pytest.fixture
+def cache():
+    cache = LocalCache("test", ["places", "tags"], maxsize=2, ttl=60)
+    cache.enabled = True
+    yield cache
+    caches.remove(cache)
+
+
+class Loader:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def by_id(row):
+    return [("places", row["_id"])]
+
+
+def load(cache: LocalCache, key, loader, depends_on=by_id):
+    return asyncio.run(cache.get_or_load(key, loader, depends_on))
+
+
+def test_disabled_cache_always_loads(cache):
+    cache.enabled = False
+    loader = Loader({"_id": ObjectId()})
+    load(cache, "a", loader)
+    load(cache, "a", loader)
+    assert loader.calls == 2
+    assert len(cache) == 0
+
+
+def test_changes_evict_dependent_entries(cache):
+    place_id = ObjectId()
+    loader = Loader({"_id": place_id})
+    load(cache, "a", loader)
+    load(cache, "a", loader)
+    assert loader.calls == 1
+    assert cache.stats() == {"enabled": True, "size": 1, "hits": 1, "misses": 1}
+
+    cache.evict("places", ObjectId())
+    load(cache, "a", loader)
+    assert loader.calls == 1
+
+    cache.evict("places", place_id)
+    load(cache, "a", loader)
+    assert loader.calls == 2
+
+
+def test_collection_dependencies_and_size_limit(cache):
+    names = Loader(["a", "b"])
+    load(cache, "names", names, lambda _: [("tags", None)])
+    load(cache, "x", Loader({"_id": 1}))
+    load(cache, "y", Loader({"_id": 2}))
+    assert len(cache) == 2
+
+    load(cache, "names", names, lambda _: [("tags", None)])
+    cache.evict("tags", ObjectId())
+    load(cache, "names", names, lambda _: [("tags", None)])
+    assert names.calls == 3
+
+
+def test_load_racing_with_a_change_is_not_stored(cache):
+    async def stale():
+        cache.evict("places", 1)
+        return {"_id": 1}
+
+    load(cache, "a", stale)
+    assert len(cache) == 0
+
+
+def test_bus_dispatches_changes_to_caches(cache):
+    bus = InvalidationBus()
+    load(cache, "a", Loader({"_id": 1}))
+    load(cache, "names", Loader([]), lambda _: [("tags", None)])
+
+    bus.dispatch({"ns": {"db": "hashtrip", "coll": "users"}, "documentKey": {"_id": 1}})
+    assert len(cache) == 2
+    bus.dispatch(
+        {"ns": {"db": "hashtrip", "coll": "places"}, "documentKey": {"_id": 1}}
+    )
+    assert len(cache) == 1
+    bus.dispatch({"operationType": "dropDatabase", "ns": {"db": "hashtrip"}})
+    assert len(cache) == 0
+    assert "tags" in bus.collections
+
+
+def test_own_writes_evict_without_the_change_stream(cache):
+    load(cache, "a", Loader({"_id": 1}))
+    load(cache, "b", Loader({"_id": 2}))
+
+    evict("places", 1)
+    assert len(cache) == 1
+    cache.forget("b")
+    assert len(cache) == 0
+
+    load(cache, "names", Loader([]), lambda _: [("tags", None)])
+    evict("tags")
+    assert len(cache) == 0
@@ -0,0 +1,114 @@
+import asyncio
+
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.db import indexes
+from app.db.indexes import INDEX_NOT_FOUND, _drop_changed_indexes, create_indexes
+
+UNIQUE = IndexModel([("slug", ASCENDING)], name="slug", unique=True)
+OTHER = IndexModel([("author_id", ASCENDING)], name="author")
+
+
+class Collection:
+    def __init__(
+        self,
+        name="places",
+        existing=None,
+        duplicates=(),
+        dropped_by_another_worker=False,
+    ):
+        self.name = name
+        self.existing = (
+            {"slug": {"key": [("slug", ASCENDING)]}} if existing is None else existing
+        )
+        self.duplicates = list(duplicates)
+        self.dropped_by_another_worker = dropped_by_another_worker
+        self.dropped = []
+        self.created = []
+
+    async def index_information(self):
+        return self.existing
+
+    async def aggregate_rows(self):
+        for row in self.duplicates:
+            yield row
+
+    def aggregate(self, pipeline, **kwargs):
+        return self.aggregate_rows()
+
+    async def drop_index(self, name):
+        if self.dropped_by_another_worker:
+            raise OperationFailure("index not found", code=INDEX_NOT_FOUND)
+        self.dropped.append(name)
+
+    async def create_indexes(self, models):
+        self.created.extend(model.document["name"] for model in models)
+
+
+def drop(collection, models=(UNIQUE, OTHER)):
+    return asyncio.run(_drop_changed_indexes(collection, list(models)))
+
+
+def test_index_that_became_unique_is_replaced():
+    collection = Collection()
+    assert drop(collection) == [UNIQUE, OTHER]
+    assert collection.dropped == ["slug"]
+
+
+def test_index_dropped_by_another_worker_is_created():
+    assert drop(Collection(dropped_by_another_worker=True)) == [UNIQUE, OTHER]
+
+
+def test_duplicates_keep_the_old_index(caplog):
+    collection = Collection(duplicates=[{"_id": {"slug": "twice"}, "count": 2}])
+
+    assert drop(collection) == [OTHER]
+    assert not collection.dropped
+    assert "Cannot make index places.slug unique" in caplog.text
+
+
+def test_any_changed_option_replaces_the_index():
+    search = IndexModel(
+        [("title", TEXT), ("body", TEXT)],
+        name="search",
+        weights={"title": 10},
+        default_language="none",
+    )
+    ttl = IndexModel([("day", ASCENDING)], name="day", expireAfterSeconds=60)
+    # as index_information() describes them
+    text_key = [("_fts", "text"), ("_ftsx", 1)]
+    same = Collection(
+        existing={
+            "search": {
+                "key": text_key,
+                "weights": {"title": 10, "body": 1},
+                "default_language": "none",
+                "textIndexVersion": 3,
+            },
+            "day": {"key": [("day", ASCENDING)], "expireAfterSeconds": 60, "v": 2},
+        }
+    )
+    changed = Collection(
+        existing={
+            "search": {"key": text_key, "weights": {"title": 5, "body": 1}},
+            "day": {"key": [("day", ASCENDING)], "expireAfterSeconds": 30},
+        }
+    )
+
+    drop(same, [search, ttl])
+    drop(changed, [search, ttl])
+
+    assert not same.dropped
+    assert changed.dropped == ["search", "day"]
+
+
+def test_blocked_unique_indexes_are_listed(monkeypatch):
+    places = Collection(duplicates=[{"_id": {"slug": "twice"}, "count": 2}])
+    monkeypatch.setattr(indexes, "INDEXES", {"places": [UNIQUE, OTHER]})
+
+    asyncio.run(create_indexes({"db": {"places": places}}, "db"))
+
+    assert indexes.blocked_indexes == ["places.slug"]
+    assert places.created == ["author"]
+    indexes.blocked_indexes.clear()
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from app.core.query_budget import check_query_log
+from app.db.monitoring import CommandRecorder, QueryLog, command_shape, query_log
+
+
+def run_command(recorder: CommandRecorder, request_id: int, command: dict):
+    name = next(iter(command))
+    recorder.started(
+        SimpleNamespace(command_name=name, command=command, request_id=request_id)
+    )
+    recorder.succeeded(SimpleNamespace(request_id=request_id, duration_micros=1500))
+
+
+def test_command_shape_ignores_literals():
+    first = command_shape("find", "places", {"filter": {"slug": "a"}})
+    second = command_shape("find", "places", {"filter": {"slug": "b"}})
+    other = command_shape("find", "places", {"filter": {"author_id": "b"}})
+    assert first == second != other
+
+
+def test_per_row_queries_are_reported():
+    log = QueryLog()
+    reset = query_log.set(log)
+    try:
+        recorder = CommandRecorder()
+        run_command(recorder, 1, {"find": "places", "filter": {}})
+        for request_id in range(2, 10):
+            run_command(
+                recorder, request_id, {"find": "users", "filter": {"_id": request_id}}
+            )
+    finally:
+        query_log.reset(reset)
+
+    assert log.count == 9
+    assert log.duration_ms == 13.5
+    assert log.records[0].collection == "places"
+    assert check_query_log(log) == ['`find users {"_id": "?"}` ran 8 times']
+
+
+def test_commands_outside_requests_are_ignored():
+    run_command(CommandRecorder(), 1, {"find": "places", "filter": {}})
+    assert query_log.get() is None
@@ -0,0 +1,859 @@
+"""
+Query-plan regression suite.
+
+Every function in app/services and app/db/repositories is run against a seeded
+mongod, the commands it sends are captured with the command listener and each
+one is explained. A plan fails on COLLSCAN, an in-memory SORT or too many
+examined documents per returned one.
+
+Set QUERY_PLAN_MONGODB_URL to point at a mongod, the suite is skipped when none
+is reachable.
+"""
+import asyncio
+import importlib
+import inspect
+import os
+import pkgutil
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Awaitable, Callable, List, Sequence, Set, Tuple
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from starlette.exceptions import HTTPException
+
+import app.db.repositories
+import app.services
+from app.core import config
+from app.db.indexes import create_indexes
+from app.db.monitoring import CommandRecorder, QueryLog, query_log
+from app.db.repositories import (
+    base,
+    comment_repository,
+    counter_repository,
+    deletion_repository,
+    favorite_repository,
+    follower_repository,
+    job_repository,
+    like_repository,
+    place_repository,
+    post_repository,
+    profile_repository,
+    rate_limit_repository,
+    search_repository,
+    tag_repository,
+    trending_repository,
+    user_repository,
+    view_repository,
+)
+from app.models.comment import CommentInCreate
+from app.models.place import PlaceFilterParams, PlaceInCreate, PlaceInUpdate
+from app.models.post import PostFilterParams, PostInCreate, PostInUpdate
+from app.models.user import User, UserInCreate, UserInLogin, UserInUpdate
+from app.services import (
+    authentication,
+    bulk,
+    comment,
+    counters,
+    deletions,
+    jobs,
+    place,
+    post,
+    profile,
+    search,
+    shortcuts,
+    slugs,
+    tag,
+    trending,
+    user,
+)
+from bench.rows import make_place_row, make_post_row, make_user_row
+
+MONGODB_URL = os.getenv("QUERY_PLAN_MONGODB_URL", "mongodb://localhost:27017")
+DATABASE_NAME = "hashtrip_query_plans"
+MAX_DOCS_EXAMINED_RATIO = 3
+
+USERS = 30
+PLACES_PER_USER = 10
+POSTS_PER_USER = 10
+FAVORITES_PER_USER = 20
+FOLLOWINGS_PER_USER = 5
+
+# fields the driver adds to a command that explain does not accept
+NOT_EXPLAINED = {"lsid", "txnNumber", "readConcern", "writeConcern", "autocommit"}
+EXPLAINABLE = {
+    "find",
+    "aggregate",
+    "count",
+    "distinct",
+    "update",
+    "delete",
+    "findAndModify",
+}
+
+
+def plan_stages(explain: dict) -> List[str]:
+    """
+    Stage names of the winning plans, including pipeline stages that were not
+    pushed down into the query layer.
+    """
+    stages = []
+
+    def walk(node, in_plan: bool):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "rejectedPlans":
+                    continue
+                if in_plan and key == "stage" and isinstance(value, str):
+                    stages.append(value)
+                if key.startswith("$") and key != "$cursor":
+                    stages.append(key)
+                walk(value, in_plan or key == "winningPlan")
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_plan)
+
+    walk(explain, False)
+    return stages
+
+
+def execution_stats(explain: dict) -> List[dict]:
+    found = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            stats = node.get("executionStats")
+            if isinstance(stats, dict) and "totalDocsExamined" in stats:
+                found.append(stats)
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    return found
+
+
+def plan_problems(
+    explain: dict, max_ratio: float = MAX_DOCS_EXAMINED_RATIO
+) -> List[str]:
+    problems = []
+    stages = plan_stages(explain)
+    if "COLLSCAN" in stages:
+        problems.append("COLLSCAN")
+    if "SORT" in stages or "$sort" in stages:
+        problems.append("in-memory SORT")
+    for stats in execution_stats(explain):
+        examined, returned = stats["totalDocsExamined"], stats["nReturned"]
+        if examined / max(returned, 1) > max_ratio:
+            problems.append(f"{examined} documents examined for {returned} returned")
+    return problems
+
+
+def test_plan_problems_flags_collection_scans_and_sorts():
+    explain = {
+        "queryPlanner": {
+            "winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}},
+            "rejectedPlans": [{"stage": "IXSCAN"}],
+        },
+        "executionStats": {"nReturned": 2, "totalDocsExamined": 300},
+    }
+    assert plan_problems(explain) == [
+        "COLLSCAN",
+        "in-memory SORT",
+        "300 documents examined for 2 returned",
+    ]
+
+
+def test_plan_problems_accepts_index_scans():
+    explain = {
+        "stages": [
+            {
+                "$cursor": {
+                    "queryPlanner": {
+                        "winningPlan": {
+                            "stage": "PROJECTION_COVERED",
+                            "inputStage": {"stage": "IXSCAN"},
+                        }
+                    },
+                    "executionStats": {"nReturned": 20, "totalDocsExamined": 0},
+                }
+            },
+            {"$group": {"_id": "$place_id"}},
+        ]
+    }
+    assert plan_problems(explain) == []
+
+
+Scenario = Callable[[AsyncIOMotorClient, SimpleNamespace], Awaitable]
+SCENARIOS: List[Tuple[str, Scenario, Sequence[str]]] = []
+COVERED: Set[str] = set()
+
+
+def case(*functions: Callable, allow: Sequence[str] = ()):
+    """
+    Register a scenario exercising the given functions. Problems starting with
+    one of `allow` are inherent to the query and not reported.
+    """
+    names = [f"{function.__module__}.{function.__name__}" for function in functions]
+
+    def register(scenario: Scenario) -> Scenario:
+        SCENARIOS.append((names[0], scenario, allow))
+        COVERED.update(names)
+        return scenario
+
+    return register
+
+
+async def _drain(iterator):
+    return [item async for item in iterator]
+
+
+def _as_user(seed, n: int) -> User:
+    return User(username=seed.users[n], email=f"{seed.users[n]}@example.com")
+
+
+@case(place_repository.get_place_row, place_repository.get_place_id)
+async def _(conn, seed):
+    await place_repository.get_place_row(conn, seed.places[0])
+    await place_repository.get_place_id(conn, seed.places[1])
+
+
+@case(place_repository.find_places, place.get_places_with_filters)
+async def _(conn, seed):
+    await place.get_places_with_filters(conn, PlaceFilterParams(), seed.users[0])
+    await place.get_places_with_filters(
+        conn, PlaceFilterParams(author=seed.users[1], offset=5), seed.users[0]
+    )
+
+
+@case(place_repository.iterate_places, place.export_places, place.hydrate_places)
+async def _(conn, seed):
+    await _drain(place.export_places(conn, username=seed.users[0], batch_size=100))
+    await _drain(place.export_places(conn, after=seed.place_ids[150], batch_size=100))
+
+
+@case(place_repository.find_existing_slugs, place.create_places_in_bulk)
+async def _(conn, seed):
+    items = [
+        {
+            "title": f"Bulk place {n}",
+            "description": "d",
+            "body": "b",
+            "location": {"type": "Point", "coordinates": [1, 2]},
+            "capacity": 3,
+            "tagList": ["bulk"],
+        }
+        for n in range(5)
+    ]
+    await place.create_places_in_bulk(conn, items + items[:1], seed.users[2])
+
+
+@case(bulk.create_by_slug_in_bulk, place_repository.insert_places)
+async def _(conn, seed):
+    items = [
+        {
+            "title": "Bulk insert",
+            "description": "d",
+            "body": "b",
+            "location": {"type": "Point", "coordinates": [1, 2]},
+            "capacity": 3,
+        }
+    ]
+    await bulk.create_by_slug_in_bulk(
+        conn,
+        PlaceInCreate,
+        items,
+        seed.users[2],
+        find_existing_slugs=place_repository.find_existing_slugs,
+        insert_all=place_repository.insert_places,
+    )
+
+
+@case(
+    place_repository.insert_place,
+    place.create_place_by_slug,
+    slugs.write_with_unique_slug,
+    counter_repository.increment_counters,
+)
+async def _(conn, seed):
+    await place.create_place_by_slug(
+        conn,
+        PlaceInCreate(
+            title="Plan place",
+            description="d",
+            body="b",
+            capacity=3,
+            location={"type": "Point", "coordinates": [1, 2]},
+            tagList=["plan"],
+        ),
+        seed.users[3],
+    )
+
+
+@case(place_repository.update_place, place.update_place_by_slug)
+async def _(conn, seed):
+    owner = seed.place_authors[2]
+    updated = await place.update_place_by_slug(
+        conn, seed.places[2], PlaceInUpdate(title="Renamed place", version=0), owner
+    )
+    # a second change made on the same version is refused
+    assert not await place.update_place_by_slug(
+        conn, updated.slug, PlaceInUpdate(body="stale", version=0), owner
+    )
+
+
+@case(deletion_repository.mark_deleted, place.delete_place_by_slug)
+async def _(conn, seed):
+    await place.delete_place_by_slug(conn, seed.places[-1], seed.place_authors[-1])
+
+
+@case(place.get_place_by_slug, place.get_place_validators, tag.get_tags)
+async def _(conn, seed):
+    validators = await place.get_place_validators(conn, seed.places[3], seed.users[0])
+    await place.get_place_by_slug(conn, seed.places[3], seed.users[0], validators)
+    await tag.get_tags(conn, seed.posts[3], doc_name=config.post_collection_name)
+
+
+@case(favorite_repository.is_favorited, place.is_place_favorited_by_user)
+async def _(conn, seed):
+    await place.is_place_favorited_by_user(conn, seed.places[4], seed.users[0])
+
+
+@case(favorite_repository.get_favorited_place_ids, place.get_favorited_place_ids)
+async def _(conn, seed):
+    ids = seed.place_ids[:20]
+    await place.get_favorited_place_ids(conn, ids, seed.users[0])
+
+
+@case(
+    favorite_repository.add_favorite,
+    favorite_repository.remove_favorite,
+    place_repository.increment_favorites_count,
+    place.add_place_to_favorites,
+    place.remove_place_from_favorites,
+)
+async def _(conn, seed):
+    added = await place.add_place_to_favorites(conn, seed.places[5], seed.users[4])
+    again = await place.add_place_to_favorites(conn, seed.places[5], seed.users[4])
+    assert again.favorites_count == added.favorites_count
+    await place.remove_place_from_favorites(conn, seed.places[5], seed.users[4])
+
+
+@case(place.get_user_places, profile_repository.get_followings)
+async def _(conn, seed):
+    await place.get_user_places(conn, seed.users[0])
+
+
+@case(post_repository.get_post_row, post_repository.get_post_id)
+async def _(conn, seed):
+    await post_repository.get_post_row(conn, seed.posts[0])
+    await post_repository.get_post_id(conn, seed.posts[1])
+
+
+@case(post_repository.find_posts, post.get_posts_with_filters)
+async def _(conn, seed):
+    await post.get_posts_with_filters(conn, PostFilterParams(), seed.users[0])
+    await post.get_posts_with_filters(conn, PostFilterParams(offset=10))
+
+
+@case(post_repository.iterate_posts, post.export_posts, post.hydrate_posts)
+async def _(conn, seed):
+    await _drain(post.export_posts(conn, username=seed.users[0], batch_size=100))
+
+
+@case(post_repository.find_existing_slugs, post.create_posts_in_bulk)
+async def _(conn, seed):
+    items = [
+        {
+            "title": f"Bulk post {n}",
+            "body": "b",
+            "place": seed.places[0],
+            "type": 0,
+            "tagList": ["bulk"],
+        }
+        for n in range(5)
+    ]
+    await post.create_posts_in_bulk(conn, items, seed.users[2])
+
+
+@case(post_repository.insert_posts)
+async def _(conn, seed):
+    await post_repository.insert_posts(
+        conn, [make_post_row(random.Random(1), seed.users[2], seed.places[0])]
+    )
+
+
+@case(post_repository.insert_post, post.create_post_by_slug)
+async def _(conn, seed):
+    await post.create_post_by_slug(
+        conn,
+        PostInCreate(
+            title="Plan post", body="b", place=seed.places[0], type=0, tagList=["plan"]
+        ),
+        seed.users[3],
+    )
+
+
+@case(post_repository.update_post, post.update_post_by_slug)
+async def _(conn, seed):
+    await post.update_post_by_slug(
+        conn, seed.posts[2], PostInUpdate(title="Renamed post"), seed.post_authors[2]
+    )
+
+
+@case(post.delete_post_by_slug)
+async def _(conn, seed):
+    await post.delete_post_by_slug(conn, seed.posts[-1], seed.post_authors[-1])
+
+
+@case(post.get_post_by_slug, post.get_post_validators)
+async def _(conn, seed):
+    validators = await post.get_post_validators(conn, seed.posts[3], seed.users[0])
+    await post.get_post_by_slug(conn, seed.posts[3], seed.users[0], validators)
+
+
+@case(like_repository.is_liked, post.is_post_liked_by_user)
+async def _(conn, seed):
+    await post.is_post_liked_by_user(conn, seed.posts[4], seed.users[0])
+
+
+@case(like_repository.get_liked_post_ids, post.get_liked_post_ids)
+async def _(conn, seed):
+    ids = seed.post_ids[:20]
+    await post.get_liked_post_ids(conn, ids, seed.users[0])
+
+
+@case(
+    like_repository.add_like,
+    like_repository.remove_like,
+    post_repository.increment_likes_count,
+    post.add_post_to_likes,
+    post.remove_post_from_likes,
+)
+async def _(conn, seed):
+    added = await post.add_post_to_likes(conn, seed.posts[5], seed.users[4])
+    again = await post.add_post_to_likes(conn, seed.posts[5], seed.users[4])
+    assert again.likes_count == added.likes_count
+    await post.remove_post_from_likes(conn, seed.posts[5], seed.users[4])
+
+
+@case(post.get_user_posts, follower_repository.find_followings)
+async def _(conn, seed):
+    await post.get_user_posts(conn, seed.users[0])
+
+
+@case(
+    comment_repository.find_comments,
+    comment_repository.insert_comment,
+    comment_repository.delete_comment,
+    comment.get_comments,
+    comment.create_comment,
+    comment.delete_comment,
+)
+async def _(conn, seed):
+    created = await comment.create_comment(
+        conn, seed.posts[6], CommentInCreate(body="nice"), seed.users[1]
+    )
+    await comment.get_comments(conn, seed.posts[6], seed.users[0])
+    await comment.delete_comment(conn, created.id, seed.users[1])
+
+
+@case(
+    tag_repository.find_tags,
+    tag_repository.get_tag_names,
+    tag.fetch_all_tags,
+    tag.fetch_all_tag_names,
+)
+async def _(conn, seed):
+    await tag.fetch_all_tags(conn)
+    await tag.fetch_all_tag_names(conn)
+
+
+@case(tag_repository.get_tag_list)
+async def _(conn, seed):
+    await tag_repository.get_tag_list(
+        conn, config.place_collection_name, seed.places[7]
+    )
+
+
+@case(tag_repository.upsert_tags, tag.create_tags_that_not_exist)
+async def _(conn, seed):
+    await tag.create_tags_that_not_exist(conn, ["coffee", "new-tag"])
+
+
+@case(
+    jobs.enqueue,
+    jobs.run_next_job,
+    jobs.measure_jobs,
+    job_repository.enqueue_job,
+    job_repository.claim_job,
+    job_repository.finish_job,
+    job_repository.retry_job,
+    job_repository.fail_job,
+    job_repository.fail_abandoned_jobs,
+    job_repository.count_pending_jobs,
+)
+async def _(conn, seed):
+    # on top of the tags the places and posts created above queued
+    await jobs.enqueue(conn, jobs.UPSERT_TAGS, {"tags": ["queued"]})
+    while await jobs.run_next_job(conn):
+        pass
+    await jobs.measure_jobs(conn)
+
+    # a job nobody handles is retried later, then given up
+    now = datetime.utcnow()
+    await job_repository.enqueue_job(conn, "unknown", {}, now)
+    assert await jobs.run_next_job(conn)
+    job = await job_repository.claim_job(
+        conn, now + timedelta(hours=1), now + timedelta(hours=2), 3
+    )
+    assert job["attempts"] == 2
+    assert await job_repository.fail_job(conn, job, "given up")
+    assert not await job_repository.count_pending_jobs(conn)
+
+    # a lease lost on the last attempt is not claimed again, but given up
+    await job_repository.enqueue_job(conn, "unknown", {}, now)
+    later = now + timedelta(hours=1)
+    assert await job_repository.claim_job(conn, now, later, 1)
+    assert not await job_repository.claim_job(conn, later, later, 1)
+    assert await job_repository.fail_abandoned_jobs(conn, later, 1) == 1
+    assert not await job_repository.count_pending_jobs(conn)
+
+
+@case(
+    user_repository.get_user_row,
+    user_repository.get_user_id,
+    user_repository.get_user,
+    user_repository.get_user_by_email,
+    user.check_free_username_and_email,
+    shortcuts.check_free_username_and_email,
+    authentication.authentication_service,
+)
+async def _(conn, seed):
+    await user.check_free_username_and_email(conn, "nobody", "nobody@example.com")
+    await shortcuts.check_free_username_and_email(conn, "nobody", "nobody@example.com")
+    await user_repository.get_user_id(conn, seed.users[0])
+    with pytest.raises(HTTPException):
+        await authentication.authentication_service(
+            UserInLogin(email=f"{seed.users[0]}@example.com", password="wrong"), conn
+        )
+
+
+@case(user_repository.find_users, profile_repository.get_profiles_by_usernames)
+async def _(conn, seed):
+    await profile_repository.get_profiles_by_usernames(
+        conn, seed.users[:10], seed.users[0]
+    )
+
+
+@case(user_repository.create_user)
+async def _(conn, seed):
+    await user_repository.create_user(
+        conn,
+        UserInCreate(username="planner", email="planner@example.com", password="pw"),
+    )
+
+
+@case(user.create_user_service)
+async def _(conn, seed):
+    if not seed.replica_set:
+        pytest.skip("create_user_service runs in a transaction")
+    await user.create_user_service(
+        UserInCreate(username="planner2", email="planner2@example.com", password="pw"),
+        conn,
+    )
+
+
+@case(user_repository.update_user)
+async def _(conn, seed):
+    await user_repository.update_user(conn, seed.users[5], UserInUpdate(bio="updated"))
+
+
+@case(
+    follower_repository.is_following,
+    follower_repository.get_followed_usernames,
+    profile_repository.get_profile_by_username,
+    profile_repository.get_profile_with_counters,
+    profile_repository.get_profile_validators,
+    profile_repository.is_following_for_user,
+    profile.get_profile_service,
+    profile.get_following_service,
+)
+async def _(conn, seed):
+    response = await profile.get_profile_service(
+        conn, username=seed.users[1], current_user=_as_user(seed, 0)
+    )
+    profile_repository.get_profile_validators(response.profile)
+    await profile.get_following_service(conn, username=seed.users[1])
+
+
+@case(
+    follower_repository.add_follower,
+    follower_repository.remove_follower,
+    profile_repository.follow_for_user,
+    profile_repository.unfollow_user,
+    profile.follow_user_service,
+    profile.unfollow_user_service,
+)
+async def _(conn, seed):
+    stranger = seed.users[-1]
+    await profile.follow_user_service(_as_user(seed, 6), stranger, conn)
+    # the follow is there once, a repeated upsert adds nothing
+    assert not await follower_repository.add_follower(conn, seed.users[6], stranger)
+    await profile.unfollow_user_service(_as_user(seed, 6), stranger, conn)
+    assert not await follower_repository.remove_follower(conn, seed.users[6], stranger)
+
+
+@case(rate_limit_repository.add_to_window, rate_limit_repository.get_window_count)
+async def _(conn, seed):
+    expires_at = datetime.utcnow() + timedelta(minutes=2)
+    for _ in range(3):
+        await rate_limit_repository.add_to_window(conn, "login user:a:1", 1, expires_at)
+    await rate_limit_repository.get_window_count(conn, "login user:a:0")
+
+
+@case(view_repository.add_views)
+async def _(conn, seed):
+    day = datetime(2026, 1, 1)
+    counts = {
+        (config.place_collection_name, place_id): 2 for place_id in seed.place_ids[:5]
+    }
+    await view_repository.add_views(conn, counts, day)
+    await view_repository.add_views(conn, counts, day)
+
+
+# scores are summed over the window before they can be ranked
+@case(
+    view_repository.get_view_scores,
+    favorite_repository.get_favorite_scores,
+    trending_repository.claim_run,
+    trending_repository.save_ranking,
+    trending_repository.get_ranking,
+    place_repository.get_places_by_ids,
+    trending.compute_trending_places,
+    trending.load_trending_places,
+    trending.refresh_trending_places,
+    trending.get_trending_places,
+    allow=("in-memory SORT",),
+)
+async def _(conn, seed):
+    await view_repository.add_views(
+        conn,
+        {(config.place_collection_name, seed.place_ids[n]): n for n in range(1, 30)},
+        datetime.utcnow() - timedelta(days=1),
+    )
+    await trending.refresh_trending_places(conn)
+    # not due again, another worker would skip the computation
+    assert not await trending.compute_trending_places(conn)
+    await trending.get_trending_places(conn, seed.users[0])
+
+
+# a repair recounts whole collections
+@case(
+    counters.reconcile_counters,
+    counter_repository.count_by,
+    counter_repository.iterate_user_counters,
+    counter_repository.set_counters,
+    counter_repository.iterate_stored_counts,
+    counter_repository.set_stored_counts,
+    allow=("COLLSCAN",),
+)
+async def _(conn, seed):
+    await counters.reconcile_counters(conn, batch_size=10)
+    assert await counters.reconcile_counters(conn) == 0
+
+
+# relevance is computed per match, ranking needs every match of the terms
+@case(
+    search_repository.search_rows,
+    search.search_places,
+    search.search_posts,
+    allow=("in-memory SORT", "documents examined"),
+)
+async def _(conn, seed):
+    places, position = await search.search_places(
+        conn, "coffee harbour", username=seed.users[0]
+    )
+    await search.search_places(conn, "coffee harbour", after=position)
+    await search.search_places(conn, "museum", tag="beach", near=(106.8, -6.2))
+    await search.search_posts(conn, "ramen", username=seed.users[0])
+
+
+@case(
+    shortcuts.get_by_slug_or_404,
+    shortcuts.check_by_slug_for_existence,
+    shortcuts.check_by_slug_for_existence_and_modifying_permissions,
+)
+async def _(conn, seed):
+    await shortcuts.get_by_slug_or_404(conn, seed.places[8], seed.users[0])
+    await shortcuts.check_by_slug_for_existence(
+        conn, seed.posts[8], fx=post_repository.get_post_row
+    )
+    await shortcuts.check_by_slug_for_existence_and_modifying_permissions(
+        conn, seed.places[8], seed.place_authors[8]
+    )
+
+
+# last, it removes a user with their places, posts and relations
+@case(
+    user.delete_user_service,
+    deletions.purge_deleted,
+    deletion_repository.claim_deleted,
+    deletion_repository.find_dependents,
+    deletion_repository.delete_by_ids,
+    deletion_repository.remove_deleted,
+    counter_repository.increment_stored_counts,
+)
+async def _(conn, seed):
+    assert await user.delete_user_service(conn, seed.users[-1]) == 1
+    # their places are gone from listings before the purge ran
+    rows = place_repository.find_places(conn, {"author_id": seed.users[-1]}, 1, 0)
+    assert not await _drain(rows)
+    assert await deletions.purge_deleted(conn) >= 1
+    assert not await user_repository.get_user_row(
+        conn, seed.users[-1], include_deleted=True
+    )
+
+
+def _query_functions() -> List[str]:
+    names = []
+    for package in (app.services, app.db.repositories):
+        for module_info in pkgutil.iter_modules(package.__path__):
+            module = importlib.import_module(f"{package.__name__}.{module_info.name}")
+            for name, function in inspect.getmembers(module, inspect.isfunction):
+                if function.__module__ == module.__name__ and not name.startswith("_"):
+                    names.append(f"{module.__name__}.{name}")
+    names.remove("app.db.repositories.base.find_options")
+    names.remove("app.db.repositories.base.command_options")
+    names.remove("app.db.repositories.base.write_options")
+    names.remove("app.db.repositories.base.session_options")
+    names.remove("app.db.repositories.base.get_collection")
+    names.remove("app.db.repositories.base.versioned_update")
+    names.remove("app.services.slugs.slug_candidates")
+    return sorted(names)
+
+
+def test_every_query_function_has_a_plan_case():
+    assert sorted(COVERED) == _query_functions()
+
+
+def _seed(db) -> SimpleNamespace:
+    rnd = random.Random(33)
+    users = [make_user_row(rnd, n) for n in range(USERS)]
+    places = [
+        make_place_row(rnd, author["username"])
+        for author in users
+        for _ in range(PLACES_PER_USER)
+    ]
+    posts = [
+        make_post_row(rnd, author["username"], rnd.choice(places)["slug"])
+        for author in users
+        for _ in range(POSTS_PER_USER)
+    ]
+    rnd.shuffle(places)
+    rnd.shuffle(posts)
+
+    db[config.users_collection_name].insert_many(users)
+    db[config.place_collection_name].insert_many(places)
+    db[config.post_collection_name].insert_many(posts)
+    db[config.favorites_collection_name].insert_many(
+        {"user_id": user["_id"], "place_id": row["_id"]}
+        for user in users
+        for row in rnd.sample(places, FAVORITES_PER_USER)
+    )
+    db[config.likes_collection_name].insert_many(
+        {"user_id": user["_id"], "post_id": row["_id"]}
+        for user in users
+        for row in rnd.sample(posts, FAVORITES_PER_USER)
+    )
+    db[config.followers_collection_name].insert_many(
+        {"follower": user["username"], "following": other["username"]}
+        for user in users[:-1]
+        for other in rnd.sample(users[:-1], FOLLOWINGS_PER_USER)
+    )
+    db[config.comments_collection_name].insert_many(
+        {"slug": row["slug"], "username": users[0]["username"], "body": "seeded"}
+        for row in posts
+    )
+    db[config.tags_collection_name].insert_many(
+        {"tag": tag_name}
+        for tag_name in sorted({t for row in places for t in row["tag_list"]})
+    )
+
+    return SimpleNamespace(
+        users=[row["username"] for row in users],
+        places=[row["slug"] for row in places],
+        place_ids=[row["_id"] for row in places],
+        place_authors=[row["author_id"] for row in places],
+        posts=[row["slug"] for row in posts],
+        post_ids=[row["_id"] for row in posts],
+        post_authors=[row["author_id"] for row in posts],
+    )
+
+
+@pytest.fixture(scope="module")
+def plan_db():
+    sync_client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=500)
+    try:
+        hello = sync_client.admin.command("ismaster")
+    except PyMongoError:
+        pytest.skip(f"no mongod at {MONGODB_URL}")
+
+    patch = pytest.MonkeyPatch()
+    patch.setattr(base, "database_name", DATABASE_NAME)
+    sync_client.drop_database(DATABASE_NAME)
+    db = sync_client[DATABASE_NAME]
+    seed = _seed(db)
+    seed.replica_set = "setName" in hello
+
+    loop = asyncio.new_event_loop()
+    conn = AsyncIOMotorClient(MONGODB_URL, event_listeners=[CommandRecorder()])
+    loop.run_until_complete(create_indexes(conn, DATABASE_NAME))
+
+    yield SimpleNamespace(db=db, conn=conn, loop=loop, seed=seed)
+
+    conn.close()
+    loop.close()
+    sync_client.drop_database(DATABASE_NAME)
+    sync_client.close()
+    patch.undo()
+
+
+def _explain(db, command: dict) -> dict:
+    command = {
+        key: value
+        for key, value in command.items()
+        if key not in NOT_EXPLAINED and not key.startswith("$")
+    }
+    return db.command({"explain": command, "verbosity": "executionStats"})
+
+
+@pytest.mark.parametrize(
+    "scenario,allow",
+    [pytest.param(scenario, allow, id=name) for name, scenario, allow in SCENARIOS],
+)
+def test_query_plan(plan_db, scenario, allow):
+    log = QueryLog()
+
+    async def run():
+        query_log.set(log)
+        await scenario(plan_db.conn, plan_db.seed)
+
+    plan_db.loop.run_until_complete(run())
+
+    problems = []
+    for record in log.records:
+        if record.name not in EXPLAINABLE:
+            continue
+        explain = _explain(plan_db.db, record.command)
+        problems.extend(
+            f"{record.shape}: {problem}"
+            for problem in plan_problems(explain)
+            if not problem.startswith(tuple(allow))
+        )
+    assert not problems, "\n".join(problems)
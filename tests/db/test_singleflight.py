@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+from bson.timestamp import Timestamp
+
+from app.db.causal import CausalState, CausalToken, causal_state
+from app.db.monitoring import QueryLog, query_log
+from app.db.singleflight import SingleFlight, shared_loads
+
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return {"calls": self.calls}
+
+
+def test_concurrent_loads_share_one_call():
+    async def main():
+        shared_loads.set(True)
+        flights, load = SingleFlight(), Loader()
+        waiting = [asyncio.ensure_future(flights.do("a", load)) for _ in range(5)]
+        other = asyncio.ensure_future(flights.do("b", load))
+        await asyncio.sleep(0)
+        load.release.set()
+        results = await asyncio.gather(*waiting, other)
+        assert load.calls == 2
+        assert results[0] is results[4]
+        assert len(flights) == 0
+
+        assert await flights.do("a", load) == {"calls": 3}
+
+    asyncio.run(main())
+
+
+def test_errors_reach_every_caller():
+    async def fail():
+        await asyncio.sleep(0)
+        raise LookupError("gone")
+
+    async def main():
+        flights = SingleFlight()
+        results = await asyncio.gather(
+            flights.do("a", fail), flights.do("a", fail), return_exceptions=True
+        )
+        assert [type(result) for result in results] == [LookupError, LookupError]
+        assert len(flights) == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_caller_does_not_cancel_the_load():
+    async def main():
+        shared_loads.set(True)
+        flights, load = SingleFlight(), Loader()
+        first = asyncio.ensure_future(flights.do("a", load))
+        second = asyncio.ensure_future(flights.do("a", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        load.release.set()
+        assert await second == {"calls": 1}
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(main())
+
+
+def test_reads_after_a_write_are_not_shared():
+    token = CausalToken(Timestamp(1589711415, 3), {})
+
+    async def main():
+        shared_loads.set(True)
+        flights, load = SingleFlight(), Loader()
+
+        async def after_write():
+            causal_state.set(CausalState(token))
+            return await flights.do("a", load)
+
+        waiting = asyncio.gather(flights.do("a", load), after_write())
+        await asyncio.sleep(0)
+        load.release.set()
+        await waiting
+        assert load.calls == 2
+
+    asyncio.run(main())
+
+
+def test_only_get_requests_share_loads():
+    async def main():
+        flights, load = SingleFlight(), Loader()
+
+        async def get():
+            shared_loads.set(True)
+            return await flights.do("a", load)
+
+        # a PUT may read what it just wrote, without a token to tell
+        waiting = asyncio.gather(get(), get(), flights.do("a", load))
+        await asyncio.sleep(0)
+        load.release.set()
+        await waiting
+        assert load.calls == 2
+
+    asyncio.run(main())
+
+
+def test_secondary_reads_are_not_shared_with_primary_reads():
+    async def main():
+        shared_loads.set(True)
+        flights, load = SingleFlight(), Loader()
+
+        async def secondary():
+            state = CausalState()
+            state.secondary_reads = True
+            causal_state.set(state)
+            return await flights.do("a", load)
+
+        waiting = asyncio.gather(flights.do("a", load), secondary())
+        await asyncio.sleep(0)
+        load.release.set()
+        await waiting
+        assert load.calls == 2
+
+    asyncio.run(main())
+
+
+def test_shared_load_is_not_charged_to_the_first_caller():
+    async def main():
+        shared_loads.set(True)
+        log, seen = QueryLog(), []
+        query_log.set(log)
+
+        async def load():
+            seen.append(query_log.get())
+
+        await SingleFlight().do("a", load)
+        assert seen == [None]
+        assert query_log.get() is log
+
+    asyncio.run(main())
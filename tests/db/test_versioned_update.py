@@ -0,0 +1,16 @@
+from app.db.repositories.base import versioned_update
+
+
+def test_without_version_only_bumps_it():
+    query, update = versioned_update({"slug": "a"}, {"body": "b"})
+
+    assert query == {"slug": "a"}
+    assert update == {"$set": {"body": "b"}, "$inc": {"version": 1}}
+
+
+def test_version_zero_matches_documents_without_one():
+    query, _ = versioned_update({"slug": "a"}, {"body": "b"}, 0)
+    assert query == {"slug": "a", "version": {"$in": [0, None]}}
+
+    query, _ = versioned_update({"slug": "a"}, {"body": "b"}, 3)
+    assert query == {"slug": "a", "version": 3}
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect
+
+from app.core.scheduler import PeriodicTask
+from app.db.repositories import view_repository
+from app.db.view_buffer import ViewBuffer
+
+
+class Writes:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+
+    async def __call__(self, conn, counts, day):
+        self.calls.append((dict(counts), day))
+        if self.fail:
+            raise AutoReconnect("down")
+
+
+def test_flush_writes_aggregated_counts_once(monkeypatch):
+    writes = Writes()
+    monkeypatch.setattr(view_repository, "add_views", writes)
+    buffer, place_id, post_id = ViewBuffer(), ObjectId(), ObjectId()
+    for _ in range(3):
+        buffer.add("places", place_id)
+    buffer.add("posts", post_id)
+
+    asyncio.run(buffer.flush(None))
+    asyncio.run(buffer.flush(None))
+
+    assert len(writes.calls) == 1
+    counts, day = writes.calls[0]
+    assert counts == {("places", place_id): 3, ("posts", post_id): 1}
+    assert (day.hour, day.minute, day.second) == (0, 0, 0)
+    assert len(buffer) == 0
+
+
+def test_failed_flush_keeps_the_counts(monkeypatch):
+    writes = Writes(fail=True)
+    monkeypatch.setattr(view_repository, "add_views", writes)
+    buffer, place_id = ViewBuffer(), ObjectId()
+    buffer.add("places", place_id)
+
+    with pytest.raises(AutoReconnect):
+        asyncio.run(buffer.flush(None))
+    buffer.add("places", place_id)
+    writes.fail = False
+    asyncio.run(buffer.flush(None))
+
+    assert writes.calls[-1][0] == {("places", place_id): 2}
+
+
+def test_periodic_task_runs_again_on_stop():
+    runs = []
+
+    async def run(conn):
+        runs.append(conn)
+        raise AutoReconnect("down")
+
+    async def start_and_stop():
+        task = PeriodicTask("test", 60, run, run_on_stop=True)
+        task.start("conn")
+        await asyncio.sleep(0)
+        # failures are logged, neither the loop nor the shutdown stops on them
+        await task.stop("conn")
+
+    asyncio.run(start_and_stop())
+    assert runs == ["conn", "conn"]
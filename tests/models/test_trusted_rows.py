@@ -0,0 +1,26 @@
+from bson import ObjectId
+from pydantic import ValidationError
+from pytest import raises
+
+from app.models.profile import Profile
+from app.models.user import UserInCreate, UserInDB
+
+
+def test_from_db_maps_aliases_and_defaults():
+    oid = ObjectId()
+    user = UserInDB.from_db({"_id": oid, "username": "u", "email": "u@example.com"})
+
+    assert user.id == oid
+    assert user.bio == ""
+    assert user.hashed_password == ""
+
+
+def test_from_db_matches_validated_model():
+    row = {"username": "u", "bio": "hi", "image": "https://example.com/u.png"}
+
+    assert Profile.from_db(row).dict() == Profile(**row).dict()
+
+
+def test_request_bodies_are_still_validated():
+    with raises(ValidationError):
+        UserInCreate(email="not-an-email", password="p", username="u")
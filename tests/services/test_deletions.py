@@ -0,0 +1,47 @@
+import asyncio
+
+from bson import ObjectId
+
+from app.db.repositories import deletion_repository
+from app.services import deletions
+
+
+def _install(monkeypatch, batches, deleted_counts):
+    async def find_dependents(conn, collection_name, query, limit, projection=None):
+        return batches.pop(0) if batches else []
+
+    async def delete_by_ids(conn, collection_name, ids):
+        return deleted_counts.pop(0)
+
+    monkeypatch.setattr(deletion_repository, "find_dependents", find_dependents)
+    monkeypatch.setattr(deletion_repository, "delete_by_ids", delete_by_ids)
+    monkeypatch.setattr(deletions, "DELETION_BATCH_PAUSE", 0)
+
+
+def test_removed_batches_are_uncounted(monkeypatch):
+    rows = [{"_id": ObjectId()}, {"_id": ObjectId()}]
+    _install(monkeypatch, [rows], [2])
+    uncounted = []
+
+    async def on_removed(batch):
+        uncounted.extend(batch)
+
+    removed = asyncio.run(deletions._purge(None, "favorites", {}, None, on_removed))
+
+    assert removed == 2
+    assert uncounted == rows
+
+
+def test_batch_removed_in_part_by_someone_else_is_not_uncounted(monkeypatch):
+    rows = [{"_id": ObjectId()}, {"_id": ObjectId()}]
+    _install(monkeypatch, [rows], [1])
+    uncounted = []
+
+    async def on_removed(batch):
+        uncounted.extend(batch)
+
+    removed = asyncio.run(deletions._purge(None, "favorites", {}, None, on_removed))
+
+    # counts stay too high rather than too low, reconcile_counters repairs them
+    assert removed == 1
+    assert not uncounted
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.core.scheduler import JobWorkers
+from app.db.repositories import job_repository
+from app.services import jobs
+
+
+class Queue:
+    def __init__(self, *names: str):
+        now = datetime.utcnow()
+        self.jobs = [
+            {
+                "_id": ObjectId(),
+                "name": name,
+                "payload": {},
+                "due_at": now,
+                "attempts": 0,
+            }
+            for name in names
+        ]
+        self.finished, self.retried, self.failed = [], [], []
+
+    def install(self, monkeypatch):
+        async def claim_job(conn, now, lease_until, max_attempts):
+            assert max_attempts == jobs.JOB_MAX_ATTEMPTS
+            if self.jobs:
+                job = self.jobs.pop(0)
+                return {**job, "attempts": job["attempts"] + 1}
+
+        async def finish_job(conn, job):
+            self.finished.append(job)
+
+        async def retry_job(conn, job, run_at, error):
+            self.retried.append((job, run_at, error))
+            self.jobs.append(job)
+
+        async def fail_job(conn, job, error):
+            self.failed.append((job, error))
+
+        for function in (claim_job, finish_job, retry_job, fail_job):
+            monkeypatch.setattr(job_repository, function.__name__, function)
+
+
+def test_job_runs_once_and_is_finished(monkeypatch):
+    runs = []
+
+    async def handler(conn, payload):
+        runs.append(conn)
+
+    monkeypatch.setitem(jobs._HANDLERS, "test", handler)
+    queue = Queue("test")
+    queue.install(monkeypatch)
+
+    assert asyncio.run(jobs.run_next_job("conn"))
+    assert not asyncio.run(jobs.run_next_job("conn"))
+    assert runs == ["conn"]
+    assert [job["attempts"] for job in queue.finished] == [1]
+
+
+def test_failing_job_backs_off_until_it_ran_out_of_attempts(monkeypatch):
+    async def handler(conn, payload):
+        raise ValueError("broken")
+
+    monkeypatch.setitem(jobs._HANDLERS, "test", handler)
+    monkeypatch.setattr(jobs, "JOB_MAX_ATTEMPTS", 3)
+    queue = Queue("test")
+    queue.install(monkeypatch)
+
+    async def drain():
+        while await jobs.run_next_job("conn"):
+            pass
+
+    start = datetime.utcnow()
+    asyncio.run(drain())
+
+    delays = [run_at - start for _, run_at, _ in queue.retried]
+    assert len(delays) == 2
+    assert timedelta(seconds=jobs.JOB_RETRY_BACKOFF) <= delays[0] < delays[1]
+    assert [(job["attempts"], error) for job, error in queue.failed] == [
+        (3, "ValueError: broken")
+    ]
+    assert not queue.finished
+
+
+def test_workers_finish_the_running_job_on_stop(monkeypatch):
+    done = []
+
+    async def run_next_job(conn):
+        await asyncio.sleep(0.01)
+        done.append(conn)
+        return True
+
+    monkeypatch.setattr("app.core.scheduler.run_next_job", run_next_job)
+
+    async def start_and_stop():
+        workers = JobWorkers(2, poll_interval=60)
+        workers.start("conn")
+        await asyncio.sleep(0)
+        await workers.stop(timeout=1)
+        return len(done)
+
+    # each worker finished the job it had, none took another
+    assert asyncio.run(start_and_stop()) == 2
+
+
+def test_measuring_gives_up_jobs_abandoned_on_their_last_attempt(monkeypatch):
+    calls = []
+
+    async def fail_abandoned_jobs(conn, now, max_attempts):
+        calls.append(max_attempts)
+        return 1
+
+    async def count_pending_jobs(conn):
+        return {}
+
+    monkeypatch.setattr(job_repository, "fail_abandoned_jobs", fail_abandoned_jobs)
+    monkeypatch.setattr(job_repository, "count_pending_jobs", count_pending_jobs)
+
+    asyncio.run(jobs.measure_jobs("conn"))
+
+    assert calls == [jobs.JOB_MAX_ATTEMPTS]
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from app.db.repositories import (
+    counter_repository,
+    favorite_repository,
+    place_repository,
+)
+from app.models.profile import Profile
+from app.services import place
+
+
+@pytest.fixture
+def row(monkeypatch):
+    row = {
+        "_id": ObjectId(),
+        "slug": "beach",
+        "title": "Beach",
+        "description": "d",
+        "body": "b",
+        "capacity": 3,
+        "location": {"type": "Point", "coordinates": [1, 2]},
+        "author_id": "author",
+        "favorites_count": 0,
+    }
+
+    async def get_place_row(conn, slug, projection=None):
+        return dict(row)
+
+    async def get_place_id(conn, slug):
+        return row["_id"]
+
+    async def get_user_id(conn, username):
+        return ObjectId()
+
+    async def get_user_row(conn, username, projection=None):
+        return {"bio": "author bio"}
+
+    async def add_favorite(conn, user_id, place_id):
+        return True
+
+    async def increment_favorites_count(conn, place_id, delta):
+        row["favorites_count"] += delta
+        return dict(row)
+
+    async def increment_counters(conn, deltas, key="username"):
+        pass
+
+    async def get_profile_by_username(conn, target_username, current_username=None):
+        return Profile(username=target_username, bio="author bio")
+
+    monkeypatch.setattr(place_repository, "get_place_row", get_place_row)
+    monkeypatch.setattr(place_repository, "get_place_id", get_place_id)
+    monkeypatch.setattr(
+        place_repository, "increment_favorites_count", increment_favorites_count
+    )
+    monkeypatch.setattr(favorite_repository, "add_favorite", add_favorite)
+    monkeypatch.setattr(counter_repository, "increment_counters", increment_counters)
+    monkeypatch.setattr(place, "get_user_id", get_user_id)
+    monkeypatch.setattr(place, "get_user_row", get_user_row)
+    monkeypatch.setattr(place, "get_profile_by_username", get_profile_by_username)
+    monkeypatch.setattr(place._place_rows, "enabled", True)
+    yield row
+    place._place_rows.clear()
+
+
+def test_favorite_is_served_by_the_worker_that_wrote_it(row):
+    async def favorite_between_reads():
+        before = await place.get_place_by_slug(None, "beach")
+        await place.add_place_to_favorites(None, "beach", "reader")
+        return before, await place.get_place_by_slug(None, "beach")
+
+    before, after = asyncio.run(favorite_between_reads())
+
+    # no change stream runs here, the write itself evicted the cached row
+    assert (before.favorites_count, after.favorites_count) == (0, 1)
+
+
+def test_body_is_the_one_the_validators_describe(row):
+    async def read_after_another_workers_write():
+        await place.get_place_by_slug(None, "beach")
+        # written elsewhere, the cached row is not evicted
+        row["favorites_count"] = 5
+        validators = await place.get_place_validators(None, "beach")
+        served = await place.get_place_by_slug(None, "beach", validators=validators)
+        return validators, served
+
+    validators, served = asyncio.run(read_after_another_workers_write())
+
+    assert served.favorites_count == 5
+    assert place._served_etag(served) == validators.etag
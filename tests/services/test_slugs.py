@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+from starlette.exceptions import HTTPException
+
+from app.services.slugs import SLUG_ATTEMPTS, slug_candidates, write_with_unique_slug
+
+
+class Writes:
+    def __init__(self, taken: int):
+        self.taken = taken
+        self.slugs = []
+
+    async def __call__(self, slug):
+        self.slugs.append(slug)
+        if len(self.slugs) <= self.taken:
+            raise DuplicateKeyError("E11000 duplicate key error")
+
+
+def test_candidates_start_with_the_plain_slug():
+    candidates = list(slug_candidates("Hello World"))
+
+    assert candidates[0] == "hello-world"
+    assert len(candidates) == SLUG_ATTEMPTS
+    assert all(slug.startswith("hello-world-") for slug in candidates[1:])
+
+
+def test_taken_slug_gets_a_suffix():
+    writes = Writes(taken=1)
+
+    slug = asyncio.run(write_with_unique_slug("Hello World", writes))
+
+    assert writes.slugs[0] == "hello-world"
+    assert slug == writes.slugs[1] != "hello-world"
+
+
+def test_gives_up_after_the_last_candidate():
+    writes = Writes(taken=SLUG_ATTEMPTS)
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(write_with_unique_slug("Hello World", writes))
+
+    assert exc_info.value.status_code == 422
+    assert len(writes.slugs) == SLUG_ATTEMPTS